@@ -0,0 +1,98 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import make_parser
+from benchmarks.common import report
+
+
+DESCRIPTION = 'Runs all benchmarks and writes their results as one JSON'
+
+# NOTE(albartash): Arguments keep the whole suite within a few minutes,
+#                  run benchmarks separately for larger sizes.
+SUITE = (
+    ('import_time', []),
+    ('latency', []),
+    ('completion', []),
+    ('streaming', ['--sizes', '64K,1M,16M']),
+    ('capture', ['--sizes', '1K,64K,1M,16M,256M']),
+    ('parallel', ['--commands', '32']),
+    ('spawn', ['--sizes', '0,256M', '--number', '20']),
+    ('forkserver', ['--sizes', '0,256M', '--number', '20']),
+)
+
+
+def run_benchmark(name, arguments, repeat):  # -> (dict, int)
+    """Runs benchmark in a fresh interpreter, returns results and code"""
+
+    handle, path = tempfile.mkstemp(suffix='.json')
+    os.close(handle)
+    try:
+        code = subprocess.call(
+            [sys.executable, '-m', 'benchmarks.' + name,
+             '--repeat', str(repeat), '--output', path] + arguments)
+        with open(path) as f:
+            content = f.read()
+        return (json.loads(content) if content else None), code
+    finally:
+        os.remove(path)
+
+
+def main():
+    parser = make_parser(DESCRIPTION)
+    parser.add_argument('--only', default=None,
+                        help='comma-separated names of benchmarks to run')
+    options = parser.parse_args()
+
+    names = [name for name, _ in SUITE]
+    selected = options.only.split(',') if options.only else names
+    unknown = set(selected) - set(names)
+    if unknown:
+        parser.error('unknown benchmarks: ' + ', '.join(sorted(unknown)))
+
+    results = {}
+    failed = []
+    for name, arguments in SUITE:
+        if name not in selected:
+            continue
+        sys.stderr.write('Running {}...\n'.format(name))
+        document, code = run_benchmark(name, arguments, options.repeat)
+        results[name] = document['results'] if document else None
+        if code:
+            failed.append(name)
+
+    report('suite', {
+        'benchmarks': results,
+        'failed': failed,
+    }, output=options.output)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+from python_shell import Shell
+
+from benchmarks.common import make_parser
+from benchmarks.common import measure
+from benchmarks.common import parse_size
+from benchmarks.common import report
+
+
+DESCRIPTION = 'Throughput of capturing output of synchronous commands'
+DEFAULT_SIZES = '1K,64K,1M,16M,256M,1G'
+
+
+def run_case(size):
+    """Runs a command producing size bytes and reads its output"""
+
+    command = Shell.head('-c', size, '/dev/zero')
+    return sum(map(len, command.output))
+
+
+def main():
+    parser = make_parser(DESCRIPTION)
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help='comma-separated output sizes')
+    options = parser.parse_args()
+
+    results = []
+    for size_name in options.sizes.split(','):
+        size = parse_size(size_name)
+        timing = measure(lambda: run_case(size), repeat=options.repeat)
+        timing.update({
+            'size': size_name,
+            'bytes': size,
+            'throughput_mb_s': size / timing['median'] / 1024 ** 2,
+        })
+        results.append(timing)
+
+    report('capture', results, output=options.output)
+
+
+if __name__ == '__main__':
+    main()
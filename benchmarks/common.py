@@ -0,0 +1,147 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+
+__all__ = (
+    'get_package_version',
+    'make_parser',
+    'measure',
+    'measure_memory',
+    'parse_size',
+    'report',
+)
+
+
+_SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(value):  # -> int
+    """Converts a size like "64K" or "1G" into bytes"""
+
+    value = value.strip().upper()
+    unit = value[-1:] if value[-1:] in _SIZE_UNITS else ''
+    return int(value[:len(value) - len(unit)]) * _SIZE_UNITS[unit]
+
+
+def make_parser(description):
+    """Returns an argument parser with options common for benchmarks"""
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of measurements per case')
+    parser.add_argument('--output', default=None,
+                        help='file to write JSON results (default: stdout)')
+    return parser
+
+
+def measure(func, repeat=5, number=1):  # -> dict
+    """Measures execution time of func and returns statistics in seconds
+
+    Each of repeat measurements runs func number times, and the time
+    is reported per single run.
+    """
+
+    timings = sorted(
+        t / number for t in timeit.repeat(func, repeat=repeat, number=number)
+    )
+    return {
+        'min': timings[0],
+        'median': timings[len(timings) // 2],
+        'max': timings[-1],
+        'repeat': repeat,
+        'number': number,
+    }
+
+
+def measure_memory(func, number=100):  # -> dict
+    """Measures Python memory allocated by func with tracemalloc
+
+    Returns median bytes per single run: peak is the maximum of memory
+    allocated during a run, and retained is memory still allocated
+    after it. Returns None if tracemalloc is not available.
+    """
+
+    if tracemalloc is None:
+        return None
+
+    func()  # NOTE(albartash): Warm up caches, so they're not counted.
+    peaks = []
+    retained = []
+    for _ in range(number):
+        tracemalloc.start()
+        try:
+            func()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        peaks.append(peak)
+        retained.append(current)
+
+    peaks.sort()
+    retained.sort()
+    return {
+        'peak': peaks[number // 2],
+        'retained': retained[number // 2],
+        'number': number,
+    }
+
+
+def get_package_version():  # -> str
+    """Returns version of python_shell being benchmarked"""
+
+    try:
+        import python_shell
+        return python_shell.__version__
+    except Exception:  # Not installed, e.g. run from the source tree
+        return 'unknown'
+
+
+def report(benchmark, results, output=None):
+    """Writes benchmark results as JSON"""
+
+    document = {
+        'benchmark': benchmark,
+        'version': get_package_version(),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if output is None:
+        json.dump(document, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    else:
+        with open(output, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
@@ -0,0 +1,98 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os
+import shutil
+import tempfile
+
+from python_shell import Shell
+from python_shell.util import command_index
+from python_shell.util.command_index import CommandIndex
+
+from benchmarks.common import make_parser
+from benchmarks.common import measure
+from benchmarks.common import report
+
+
+DESCRIPTION = 'Cost of dir(Shell), used for autocompletion of commands'
+
+
+def use_index(index):
+    """Makes dir(Shell) use the index instead of the shared one"""
+    command_index._command_index = index
+
+
+def run_cold():
+    """Scans $PATH without any cache, like the first run ever"""
+
+    use_index(CommandIndex(cache_path=False))
+    return len(dir(Shell))
+
+
+def make_disk_case(cache_path):
+    """Returns a case with the on-disk cache, like a new interpreter"""
+
+    CommandIndex(cache_path=cache_path).refresh()
+
+    def run_disk():
+        use_index(CommandIndex(cache_path=cache_path))
+        return len(dir(Shell))
+    return run_disk
+
+
+def run_warm():
+    """Uses the index already built in this process"""
+    return len(dir(Shell))
+
+
+def main():
+    parser = make_parser(DESCRIPTION)
+    parser.add_argument('--number', type=int, default=20,
+                        help='number of calls per measurement')
+    options = parser.parse_args()
+
+    cache_folder = tempfile.mkdtemp()
+    shared_index = command_index._command_index
+    try:
+        cases = (
+            ('cold', run_cold),
+            ('disk_cache', make_disk_case(
+                os.path.join(cache_folder, 'commands.json'))),
+            ('warm', run_warm),
+        )
+        results = []
+        for name, func in cases:
+            timing = measure(func, repeat=options.repeat,
+                             number=options.number)
+            timing.update({'case': name, 'commands': func()})
+            results.append(timing)
+    finally:
+        use_index(shared_index)
+        shutil.rmtree(cache_folder)
+
+    report('completion', results, output=options.output)
+
+
+if __name__ == '__main__':
+    main()
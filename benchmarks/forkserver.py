@@ -0,0 +1,128 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import subprocess
+import threading
+
+from python_shell.shell.processing.forkserver import ForkServerPopen
+from python_shell.shell.processing.forkserver import get_fork_server
+
+from benchmarks.common import make_parser
+from benchmarks.common import measure
+from benchmarks.common import parse_size
+from benchmarks.common import report
+from benchmarks.spawn import allocate
+from benchmarks.spawn import get_max_rss
+
+
+DESCRIPTION = 'Latency and throughput of fork server against direct Popen'
+DEFAULT_SIZES = '0,1G'
+DEFAULT_THREADS = '1,4'
+ARGV = ['true']
+
+
+def run_popen():
+    subprocess.Popen(ARGV, stdout=subprocess.PIPE).wait()
+
+
+def run_popen_fork():
+    # NOTE(albartash): preexec_fn makes Popen use fork instead of vfork
+    subprocess.Popen(ARGV, stdout=subprocess.PIPE,
+                     preexec_fn=lambda: None).wait()
+
+
+def run_fork_server():
+    ForkServerPopen(ARGV, stdout=subprocess.PIPE).wait()
+
+
+SPAWNERS = (
+    ('popen', run_popen),
+    ('popen_fork', run_popen_fork),
+    ('fork_server', run_fork_server),
+)
+
+
+def run_threads(func, threads, number):
+    """Runs func number times in each of threads, waits for all of them"""
+
+    def worker():
+        for _ in range(number):
+            func()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+
+def main():
+    parser = make_parser(DESCRIPTION)
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help='comma-separated sizes of extra parent memory')
+    parser.add_argument('--threads', default=DEFAULT_THREADS,
+                        help='comma-separated numbers of spawning threads')
+    parser.add_argument('--number', type=int, default=50,
+                        help='number of commands per measurement')
+    options = parser.parse_args()
+
+    # NOTE(albartash): The server is started before the parent grows,
+    #                  which is the way it's supposed to be used.
+    get_fork_server().start()
+
+    results = []
+    for size_name in options.sizes.split(','):
+        memory = allocate(parse_size(size_name))
+        for name, func in SPAWNERS:
+            timing = measure(func, repeat=options.repeat,
+                             number=options.number)
+            timing.update({
+                'case': 'latency',
+                'spawner': name,
+                'extra_memory': size_name,
+                'max_rss': get_max_rss(),
+            })
+            results.append(timing)
+
+            for threads in options.threads.split(','):
+                threads = int(threads)
+                timing = measure(
+                    lambda: run_threads(func, threads, options.number),
+                    repeat=options.repeat)
+                timing.update({
+                    'case': 'throughput',
+                    'spawner': name,
+                    'extra_memory': size_name,
+                    'threads': threads,
+                    'commands_per_second':
+                        threads * options.number / timing['median'],
+                })
+                results.append(timing)
+        del memory
+
+    report('forkserver', results, output=options.output)
+
+
+if __name__ == '__main__':
+    main()
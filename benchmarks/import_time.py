@@ -0,0 +1,111 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import re
+import subprocess
+import sys
+
+from benchmarks.common import make_parser
+from benchmarks.common import report
+
+
+DESCRIPTION = 'Time of importing the package ("python -X importtime")'
+DEFAULT_MODULE = 'python_shell'
+DEFAULT_BUDGET = 80  # milliseconds
+
+_IMPORT_TIME_LINE = re.compile(
+    r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+
+def parse_import_times(output):  # -> dict
+    """Parses output of "-X importtime" into cumulative times in seconds"""
+
+    timings = {}
+    for line in output.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match:
+            timings[match.group(4)] = int(match.group(2)) / 1e6
+    return timings
+
+
+def measure_import(module):  # -> dict
+    """Imports module in a fresh interpreter and returns its import times"""
+
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+    _, errors = process.communicate()
+    if process.returncode:
+        raise RuntimeError(errors)
+    return parse_import_times(errors)
+
+
+def main():
+    parser = make_parser(DESCRIPTION)
+    parser.add_argument('--module', default=DEFAULT_MODULE,
+                        help='module to import')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        help='maximum median import time in milliseconds')
+    parser.add_argument('--top', type=int, default=10,
+                        help='number of slowest modules to report')
+    options = parser.parse_args()
+
+    runs = [measure_import(options.module) for _ in range(options.repeat)]
+    timings = sorted(run[options.module] for run in runs)
+    median = timings[len(timings) // 2]
+
+    # NOTE(albartash): The fastest run is the least affected by noise,
+    #                  so it's used to show where the time is spent.
+    fastest = min(runs, key=lambda run: run[options.module])
+    slowest_modules = sorted(
+        fastest.items(), key=lambda item: item[1], reverse=True
+    )[:options.top]
+
+    report('import_time', {
+        'module': options.module,
+        'min': timings[0],
+        'median': median,
+        'max': timings[-1],
+        'repeat': options.repeat,
+        'budget': options.budget / 1000,
+        'within_budget': median * 1000 <= options.budget,
+        'slowest_modules': [
+            {'module': name, 'cumulative': cumulative}
+            for name, cumulative in slowest_modules
+        ],
+    }, output=options.output)
+
+    if median * 1000 > options.budget:
+        sys.stderr.write(
+            'Import of {} takes {:.1f}ms, which exceeds budget of {:.1f}ms\n'
+            .format(options.module, median * 1000, options.budget))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
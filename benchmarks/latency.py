@@ -0,0 +1,84 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import subprocess
+
+from python_shell import Shell
+
+from benchmarks.common import make_parser
+from benchmarks.common import measure
+from benchmarks.common import measure_memory
+from benchmarks.common import report
+
+
+DESCRIPTION = 'Round-trip latency of Shell.true() compared to raw subprocess'
+
+
+def run_subprocess():
+    """Runs "true" with subprocess, capturing output like Shell does"""
+
+    # NOTE(albartash): subprocess.run is not available on Python 2
+    process = subprocess.Popen(['true'],
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    process.communicate()
+    return process.returncode
+
+
+def run_shell():
+    """Runs "true" via Shell"""
+    return Shell.true().return_code
+
+
+CASES = (
+    ('subprocess', run_subprocess),
+    ('shell', run_shell),
+)
+
+
+def main():
+    parser = make_parser(DESCRIPTION)
+    parser.add_argument('--number', type=int, default=200,
+                        help='number of commands per measurement')
+    options = parser.parse_args()
+
+    results = []
+    for name, func in CASES:
+        timing = measure(func, repeat=options.repeat, number=options.number)
+        timing.update({
+            'case': name,
+            'memory': measure_memory(func, number=options.number),
+        })
+        results.append(timing)
+
+    baseline = results[0]['median']
+    for result in results:
+        result['overhead'] = result['median'] - baseline
+        result['relative'] = result['median'] / baseline
+
+    report('latency', results, output=options.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+from python_shell import Shell
+
+from benchmarks.common import make_parser
+from benchmarks.common import measure
+from benchmarks.common import report
+
+
+DESCRIPTION = 'Scaling of Shell.run_many with the level of parallelism'
+DEFAULT_PARALLELISM = '1,2,4,8,16'
+
+
+def run_batch(commands, parallelism):
+    """Runs all commands and waits for them"""
+
+    for _ in Shell.run_many(commands, parallelism=parallelism):
+        pass
+
+
+def main():
+    parser = make_parser(DESCRIPTION)
+    parser.add_argument('--parallelism', default=DEFAULT_PARALLELISM,
+                        help='comma-separated levels of parallelism')
+    parser.add_argument('--commands', type=int, default=64,
+                        help='number of commands in a batch')
+    parser.add_argument('--sleep', type=float, default=0.05,
+                        help='duration of each command in seconds')
+    options = parser.parse_args()
+
+    # NOTE(albartash): Commands which sleep show how well waiting
+    #                  is overlapped, and "true" shows the overhead
+    #                  of spawning from many threads.
+    workloads = (
+        ('sleep', Shell.sleep, (str(options.sleep),)),
+        ('true', Shell.true, ()),
+    )
+
+    results = []
+    for workload, command, arguments in workloads:
+        baseline = None
+        for level in options.parallelism.split(','):
+            level = int(level)
+            timing = measure(
+                lambda: run_batch(
+                    (command.bind(*arguments)
+                     for _ in range(options.commands)),
+                    level),
+                repeat=options.repeat
+            )
+            baseline = baseline or timing['median']
+            timing.update({
+                'workload': workload,
+                'parallelism': level,
+                'commands': options.commands,
+                'commands_per_second': options.commands / timing['median'],
+                'speedup': baseline / timing['median'],
+            })
+            results.append(timing)
+
+    report('parallel', results, output=options.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import resource
+
+from python_shell import Shell
+from python_shell.util import Subprocess
+
+from benchmarks.common import make_parser
+from benchmarks.common import measure
+from benchmarks.common import parse_size
+from benchmarks.common import report
+
+
+DESCRIPTION = 'Latency of spawning commands depending on parent RSS'
+DEFAULT_SIZES = '0,256M,1G,2G'
+PAGE_SIZE = resource.getpagesize()
+
+
+def allocate(size):
+    """Allocates and touches size bytes, so they're counted in RSS"""
+
+    memory = bytearray(size)
+    memory[::PAGE_SIZE] = b'\1' * len(range(0, size, PAGE_SIZE))
+    return memory
+
+
+def get_max_rss():  # -> int
+    """Returns maximum RSS of the current process in bytes"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def main():
+    parser = make_parser(DESCRIPTION)
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help='comma-separated sizes of extra parent memory')
+    parser.add_argument('--number', type=int, default=50,
+                        help='number of commands per measurement')
+    options = parser.parse_args()
+
+    strategies = (Subprocess.SPAWN_AUTO,
+                  Subprocess.SPAWN_POSIX,
+                  Subprocess.SPAWN_FORK,
+                  Subprocess.SPAWN_SERVER)
+
+    results = []
+    for size_name in options.sizes.split(','):
+        memory = allocate(parse_size(size_name))
+        for strategy in strategies:
+            timing = measure(
+                lambda: Shell.true(spawn=strategy),
+                repeat=options.repeat,
+                number=options.number
+            )
+            timing.update({
+                'strategy': strategy,
+                'extra_memory': size_name,
+                'max_rss': get_max_rss(),
+            })
+            results.append(timing)
+        del memory
+
+    report('spawn', results, output=options.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import io
+
+from python_shell.shell.processing.process import StreamIterator
+from python_shell.util.streaming import decode_stream
+
+from benchmarks.common import make_parser
+from benchmarks.common import measure
+from benchmarks.common import parse_size
+from benchmarks.common import report
+
+
+DESCRIPTION = 'Throughput of reading streams by lines, chunks and as text'
+DEFAULT_SIZES = '64K,1M,16M,128M'
+LINE = b'x' * 79 + b'\n'
+
+
+def make_data(size):  # -> bytes
+    """Returns size bytes of 80-byte lines"""
+    return (LINE * (size // len(LINE) + 1))[:size]
+
+
+def read_lines(data):
+    """Iterates over lines of the stream"""
+
+    count = 0
+    for _ in StreamIterator(stream=io.BytesIO(data)):
+        count += 1
+    return count
+
+
+def read_chunks(data):
+    """Iterates over raw chunks of the stream"""
+    return sum(map(len, StreamIterator(stream=io.BytesIO(data)).iter_chunks()))
+
+
+def read_text(data):
+    """Decodes the whole stream into a string"""
+    return len(decode_stream(StreamIterator(stream=io.BytesIO(data))))
+
+
+# NOTE(albartash): Streams are read from memory, so the results show
+#                  the cost of Python code without the cost of pipes.
+CASES = (
+    ('lines', read_lines),
+    ('chunks', read_chunks),
+    ('decode', read_text),
+)
+
+
+def main():
+    parser = make_parser(DESCRIPTION)
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help='comma-separated stream sizes')
+    options = parser.parse_args()
+
+    results = []
+    for size_name in options.sizes.split(','):
+        size = parse_size(size_name)
+        data = make_data(size)
+        for name, func in CASES:
+            timing = measure(lambda: func(data), repeat=options.repeat)
+            timing.update({
+                'case': name,
+                'size': size_name,
+                'bytes': size,
+                'throughput_mb_s': size / timing['median'] / 1024 ** 2,
+            })
+            results.append(timing)
+        data = None
+
+    report('streaming', results, output=options.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -77,7 +77,10 @@ setup(
     packages=find_packages(where='src', exclude=['tests']),
     package_dir={'': 'src'},
     python_requires='>2.7.*, !=3.0.*, !=3.1.*, !=3.2.*, !=3.3.*, !=3.4.*, <4',
-    install_requires=['six>=1.14.0'],
+    install_requires=[
+        'six>=1.14.0',
+        'futures>=3.3.0; python_version < "3"',
+    ],
     project_urls={
         'Source': 'https://github.com/bart-tools/python-shell',
     },
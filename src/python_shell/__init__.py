@@ -23,9 +23,18 @@ THE SOFTWARE.
 """
 
 from .shell import Shell
+from .util.lazy import set_lazy_attributes
 from .version import get_version
 
 
-__all__ = ('Shell',)
+# NOTE(albartash): Some names are set lazily, which pylint doesn't see.
+# pylint: disable=undefined-all-variable
+__all__ = ('Shell', 'ShellSession')
+# pylint: enable=undefined-all-variable
 
-__version__ = get_version()
+# NOTE(albartash): Version lookup and sessions are not needed by most of
+#                  short-living scripts, so don't pay for them on import.
+set_lazy_attributes(globals(), {
+    '__version__': get_version,
+    'ShellSession': 'python_shell.shell.session',
+})
@@ -22,11 +22,33 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+from python_shell.util.lazy import set_lazy_attributes
+
+from .base import *
 from .command import *
 from .interfaces import *
+from .pipeline import *
 
 
+# NOTE(albartash): Some names are set lazily, which pylint doesn't see.
+# pylint: disable=undefined-all-variable
 __all__ = (
+    'BaseCommand',
+    'BoundCommand',
     'Command',
-    'ICommand'
+    'CommandResult',
+    'CommandView',
+    'get_last_command',
+    'get_result_cache',
+    'ICommand',
+    'Pipeline',
+    'PipelineResult',
+    'ResultCache'
 )
+# pylint: enable=undefined-all-variable
+
+# NOTE(albartash): hashlib is needed only when results are cached
+set_lazy_attributes(globals(), {
+    'ResultCache': 'python_shell.command.cache',
+    'get_result_cache': 'python_shell.command.cache',
+})
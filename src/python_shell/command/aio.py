@@ -0,0 +1,52 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+from python_shell.exceptions import RunProcessError
+from python_shell.exceptions import ShellException
+from python_shell.shell.processing.process import Subprocess
+from python_shell.util import hooks
+
+
+__all__ = ('execute_command_async',)
+
+
+async def execute_command_async(result):
+    """Runs the process of command result within event loop
+
+    Returns the result when the process is completed.
+    """
+
+    try:
+        await result._process.execute()
+    except RunProcessError as e:
+        result._command._check_run_process_error(e)
+        raise
+    except Subprocess.CalledProcessError as e:
+        error = ShellException(result, stdout_tail=e.stdout,
+                               stderr_tail=e.stderr)
+        if hooks.enabled:
+            result._command._emit_error(error, result._process)
+        raise error
+
+    return result
@@ -0,0 +1,100 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import json
+
+from python_shell.command.interfaces import ICommand
+from python_shell.util.streaming import decode_stream
+from python_shell.util.streaming import DEFAULT_ENCODING
+
+
+__all__ = ('BaseCommand',)
+
+
+class BaseCommand(ICommand):
+    """Base class for commands
+
+    Provides decoded output of the command. It's decoded once, on first
+    access, and cached until the command is run again.
+    """
+
+    _encoding = DEFAULT_ENCODING
+    _encoding_errors = 'strict'
+    _text = None
+    _lines = None
+
+    def _set_encoding(self, encoding=None, errors=None):
+        """Sets encoding of the output and drops decoded output"""
+
+        self._encoding = encoding or DEFAULT_ENCODING
+        self._encoding_errors = errors or 'strict'
+        self._text = None
+        self._lines = None
+
+    @property
+    def text(self):
+        """Returns output of the command decoded as a single string"""
+
+        if self._text is None:
+            self._text = decode_stream(
+                self.output,
+                encoding=self._encoding,
+                errors=self._encoding_errors
+            )
+        return self._text
+
+    @property
+    def lines(self):
+        """Returns a list of decoded output lines without line endings
+
+        Lines are split by "\\n" (and "\\r\\n") only, unlike
+        str.splitlines(), which splits by form feeds and the like.
+        """
+
+        if self._lines is None:
+            lines = self.text.split('\n')
+            if not lines[-1]:
+                lines.pop()  # Text ends with a line ending, or it's empty
+            self._lines = [line[:-1] if line.endswith('\r') else line
+                           for line in lines]
+        return self._lines
+
+    @property
+    def resource_usage(self):
+        """Returns ResourceUsage of the completed command
+
+        If it's not available, it returns None.
+        """
+        return None
+
+    def json(self, **kwargs):
+        """Returns output of the command parsed as JSON
+
+        Keyword arguments are passed to json.loads().
+        """
+        return json.loads(self.text, **kwargs)
+
+    def __str__(self):
+        """Returns command's execution string"""
+        return repr(self)
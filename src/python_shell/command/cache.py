@@ -0,0 +1,316 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import six
+
+
+__all__ = ('ResultCache', 'get_result_cache')
+
+
+_DISK_FORMAT_VERSION = 1
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+# NOTE(albartash): The cache folder can be shared with other files,
+#                  so only entries and their temporary files are removed.
+_DISK_NAME_PATTERN = re.compile(r'^[0-9a-f]{64}(\.\d+\.\d+\.tmp)?$')
+
+_Entry = collections.namedtuple(
+    '_Entry', ('expires_at', 'returncode', 'stdout', 'stderr'))
+
+
+def _get_default_cache_path():
+    """Returns a folder of the on-disk cache of command results"""
+
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'python-shell', 'results')
+
+
+def _get_file_state(path, hash_contents):
+    """Returns a JSON-serializable state of the file, which changes
+    whenever the file content changes. For missing files, it's None."""
+
+    try:
+        if hash_contents:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+                    digest.update(block)
+            return digest.hexdigest()
+        stat = os.stat(path)
+    except (IOError, OSError):
+        return None
+    return [stat.st_size, getattr(stat, 'st_mtime_ns', stat.st_mtime)]
+
+
+def make_key(executable, args, env=None, cwd=None, inputs=(),
+             hash_inputs=False, data=None, merge_stderr=False):  # -> str
+    """Returns a key identifying a run of the command
+
+    The key covers the executable, arguments, environment and working
+    directory of the process, data written into its stdin and whether
+    its stderr is merged into stdout (merge_stderr). It also
+    covers states of the input files, which are modification times and
+    sizes, or hashes of their content when hash_inputs is True.
+    """
+
+    if data is not None:
+        if isinstance(data, six.text_type):
+            data = data.encode('utf-8')
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            raise ValueError(
+                "Only bytes or text input can be used with cache")
+        data = hashlib.sha256(data).hexdigest()
+
+    data = {
+        'executable': executable,
+        'args': list(map(str, args)),
+        'env': sorted((os.environ if env is None else env).items()),
+        'cwd': os.path.abspath(cwd or os.curdir),
+        'inputs': [
+            [os.path.abspath(path), _get_file_state(path, hash_inputs)]
+            for path in inputs
+        ],
+        'input': data,
+        'merge_stderr': bool(merge_stderr),
+    }
+    return hashlib.sha256(
+        json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ResultCache(object):
+    """Cache of results of successful commands
+
+    Results are kept in memory in LRU order, bounded by the number
+    of entries and their total size, and expire in ttl seconds.
+    With path, they're stored on disk as well, so they outlive
+    the current process.
+    """
+
+    def __init__(self, max_entries=256, max_size=64 * 1024 * 1024,
+                 ttl=None, path=None):
+        """Initialize cache
+
+        ttl is a default time to live of entries in seconds, None means
+        they never expire. If path is True, the default on-disk location
+        is used, if it's None, results are kept in memory only.
+        """
+
+        if path is True:
+            path = _get_default_cache_path()
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.ttl = ttl
+        self._path = path
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # key -> _Entry
+        self._size = 0  # total size of output in memory
+        self.hits = 0
+        self.misses = 0
+
+    make_key = staticmethod(make_key)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get_disk_path(self, key):  # -> str
+        return os.path.join(self._path, key)
+
+    def _read_disk(self, key):  # -> Union[_Entry, None]
+        """Reads an entry from the on-disk cache"""
+
+        path = self._get_disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline().decode('utf-8'))
+                if header.get('version') != _DISK_FORMAT_VERSION:
+                    return None
+                entry = _Entry(header['expires_at'], header['returncode'],
+                               f.read(header['stdout']),
+                               f.read(header['stderr']))
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+
+        if self._is_expired(entry):
+            self._remove_disk(key)
+            return None
+        return entry
+
+    def _write_disk(self, key, entry):
+        """Writes an entry to the on-disk cache"""
+
+        path = self._get_disk_path(key)
+        header = json.dumps({
+            'version': _DISK_FORMAT_VERSION,
+            'expires_at': entry.expires_at,
+            'returncode': entry.returncode,
+            'stdout': len(entry.stdout),
+            'stderr': len(entry.stderr),
+        })
+        temporary_path = '{}.{}.{}.tmp'.format(
+            path, os.getpid(), threading.current_thread().ident)
+        try:
+            if not os.path.isdir(self._path):
+                os.makedirs(self._path, 0o700)
+            # NOTE(albartash): Outputs may be sensitive, so files are
+            #                  readable by the owner only, and O_EXCL
+            #                  doesn't follow a planted symlink.
+            fd = os.open(temporary_path,
+                         os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except (IOError, OSError):
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header.encode('utf-8') + b'\n')
+                f.write(entry.stdout)
+                f.write(entry.stderr)
+            os.rename(temporary_path, path)
+        except (IOError, OSError):
+            try:
+                os.remove(temporary_path)
+            except (IOError, OSError):
+                pass
+
+    def _remove_disk(self, key):
+        try:
+            os.remove(self._get_disk_path(key))
+        except (IOError, OSError):
+            pass
+
+    @staticmethod
+    def _is_expired(entry):  # -> bool
+        expires_at = entry.expires_at
+        return expires_at is not None and expires_at <= time.time()
+
+    def _store(self, key, entry):
+        """Puts entry into memory and evicts least recently used ones"""
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous.stdout) + len(previous.stderr)
+            self._entries[key] = entry
+            self._size += len(entry.stdout) + len(entry.stderr)
+
+            while self._size > self.max_size or \
+                    len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.stdout) + len(evicted.stderr)
+
+    def get(self, key):
+        """Returns a cached entry, or None if it's missing or expired
+
+        Entry has fields returncode, stdout and stderr.
+        """
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                if self._is_expired(entry):
+                    self._size -= len(entry.stdout) + len(entry.stderr)
+                    entry = None
+                else:
+                    # NOTE(albartash): Re-inserted entry becomes the most
+                    #                  recently used one.
+                    self._entries[key] = entry
+
+        if entry is None and self._path:
+            entry = self._read_disk(key)
+            if entry is not None:
+                self._store(key, entry)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def put(self, key, returncode, stdout, stderr, ttl=None):
+        """Stores output of the command
+
+        ttl overrides the default time to live of the cache. Outputs
+        larger than max_size are not stored.
+        """
+
+        if len(stdout) + len(stderr) > self.max_size:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        entry = _Entry(expires_at, returncode, stdout, stderr)
+
+        self._store(key, entry)
+        if self._path:
+            self._write_disk(key, entry)
+
+    def invalidate(self, key=None):
+        """Drops the entry for key, or all entries if key is None
+
+        Other files in the folder of the on-disk cache are kept.
+        """
+
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._size = 0
+            else:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._size -= len(entry.stdout) + len(entry.stderr)
+
+        if not self._path:
+            return
+        keys = [key]
+        if key is None:
+            try:
+                keys = [name for name in os.listdir(self._path)
+                        if _DISK_NAME_PATTERN.match(name)]
+            except (IOError, OSError):
+                keys = []
+        for name in keys:
+            self._remove_disk(name)
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():  # -> ResultCache
+    """Returns the in-memory cache shared by the whole process"""
+
+    global _result_cache
+
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache()
+    return _result_cache
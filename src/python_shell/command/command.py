@@ -22,67 +22,458 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+import errno
+import threading
+
 from python_shell.exceptions import CommandDoesNotExist
+from python_shell.exceptions import RunProcessError
 from python_shell.exceptions import ShellException
-from python_shell.command.interfaces import ICommand
-from python_shell.util import AsyncProcess
-from python_shell.util import SyncProcess
-from python_shell.util import Subprocess
+from python_shell.command.base import BaseCommand
+from python_shell.shell.processing.process import AsyncProcess
+from python_shell.shell.processing.process import CompletedProcess
+from python_shell.shell.processing.process import SyncProcess
+from python_shell.shell.processing.process import Subprocess
+from python_shell.util import find_executable
+from python_shell.util import forget_executable
+from python_shell.util.context import ContextLocal
+from python_shell.util import hooks
+from python_shell.util import is_python2_running
+
+
+__all__ = ('BoundCommand', 'Command', 'CommandResult', 'CommandView',
+           'get_last_command')
+
+
+# NOTE(albartash): The last command is tracked per thread and asyncio task,
+#                  so concurrent callers don't see each other's commands.
+_last_command = ContextLocal('python_shell_last_command')
+
+# NOTE(albartash): Only the last result is kept per context, so recording
+#                  it costs the same for any number of commands, and asyncio
+#                  tasks never see results of each other. Last results
+#                  of other commands are kept by the commands per thread.
+#                  A ContextVar for every command would be kept by contexts
+#                  forever.
+_last_result = ContextLocal('python_shell_last_result')
+
+_future_lock = threading.Lock()  # guards creating futures of results
+
+
+def get_last_command():
+    """Returns the last command run or accessed in the current context"""
+    return _last_command.get()
+
+
+def set_last_command(command):
+    """Sets the last command for the current context"""
+    _last_command.set(command)
+
 
+def _record_result(owner, result):
+    """Makes result the last one of its command (or pipeline)
+    and in the context"""
 
-__all__ = ('Command',)
+    owner._thread_results.last = result
+    _last_result.set(result)
+    set_last_command(result)
 
 
-class Command(ICommand):
-    """Simple decorator for shell commands"""
+def _get_recorded_result(owner):
+    """Returns the last result of the command (or pipeline)
+
+    It's the last result in the current context, if the command was
+    the last one run there, otherwise the last one in the current thread.
+    """
+
+    result = _last_result.get()
+    if result is not None and result._command is owner:
+        return result
+    return getattr(owner._thread_results, 'last', None)
+
+
+class Command(BaseCommand):
+    """Simple decorator for shell commands
+
+    Every call of the command returns a new CommandResult, so the same
+    command can be run from many threads at once. Properties of the
+    command itself refer to its last result in the current asyncio task,
+    if it's the last command run there, otherwise in the current thread.
+    """
 
-    _process = None
     _command = None
 
-    def _validate_command(self, command_name):
-        try:
-            SyncProcess(
-                "which",
-                command_name,
-                check=True,
-                stdout=Subprocess.DEVNULL
-            ).execute()
-        except Subprocess.CalledProcessError:
-            raise CommandDoesNotExist(self)
+    def _resolve_command(self, command_name):
+        """Returns an absolute path to the command executable"""
+
+        if hooks.enabled:
+            hooks.emit(hooks.EVENT_RESOLVE_START, command=command_name)
+
+        executable = find_executable(command_name)
+
+        if hooks.enabled:
+            hooks.emit(hooks.EVENT_RESOLVE_END, command=command_name,
+                       executable=executable)
+
+        if executable is None:
+            error = CommandDoesNotExist(self)
+            if hooks.enabled:
+                self._emit_error(error)
+            raise error
+        return executable
+
+    def _emit_error(self, error, process=None):
+        """Passes an event of the command failure to hooks"""
+
+        if process is not None and not process.is_undefined:
+            process._emit(hooks.EVENT_ERROR, exception=error)
+        else:
+            hooks.emit(hooks.EVENT_ERROR, command=self._command,
+                       exception=error)
 
     def __init__(self, command_name):
         self._command = command_name
+        self._thread_results = threading.local()
+
+    def _create_process(self, process_cls, args, kwargs):
+        """Returns a process instance for running the command"""
+
+        executable = self._resolve_command(self._command)
+        return process_cls(
+            self._command, *args, executable=executable, **kwargs)
+
+    def _check_run_process_error(self, error):
+        """Raises CommandDoesNotExist if the process failed to be run
+        because its executable is missing"""
+
+        # NOTE(albartash): The executable could disappear after it was
+        #                  resolved, so the cached path is stale now.
+        if getattr(error.error, 'errno', None) == errno.ENOENT:
+            forget_executable(self._command)
+            raise CommandDoesNotExist(self)
+
+    def _execute_process(self, process):
+        """Runs the process created for the command"""
+
+        try:
+            process.execute()
+        except RunProcessError as e:
+            self._check_run_process_error(e)
+            raise
+
+    def _make_result(self, process_cls, args, kwargs):
+        """Returns a result with the process, which is not run yet"""
+
+        encoding = kwargs.pop('encoding', None)
+        encoding_errors = kwargs.pop('encoding_errors', None)
+        process = self._create_process(process_cls, args, kwargs)
+
+        result = CommandResult(self, args, process,
+                               encoding=encoding,
+                               encoding_errors=encoding_errors)
+        _record_result(self, result)
+        return result
+
+    def _execute_result(self, result):
+        """Runs the process of result and returns the result"""
+
+        try:
+            self._execute_process(result._process)
+        except Subprocess.CalledProcessError as e:
+            error = ShellException(result, stdout_tail=e.stdout,
+                                   stderr_tail=e.stderr)
+            if hooks.enabled:
+                self._emit_error(error, result._process)
+            raise error
+        return result
 
     def __call__(self, *args, **kwargs):
         """Executes the command with passed arguments
-           and returns a Command instance"""
+           and returns a CommandResult instance
+
+        With run_async=True, the command is run within asyncio event loop,
+        and an awaitable object is returned instead. On Python 2, which has
+        no asyncio, it's concurrent.futures.Future of the command run
+        in background.
+
+        Options encoding and encoding_errors define how the output is
+        decoded for properties text and lines.
+
+        Option input is written into stdin of the command. It can be bytes
+        or text, a file object or descriptor (passed to the command as is,
+        without copying data), or an iterable of chunks. Without input,
+        stdin of the command is /dev/null.
+
+        With cache option (True for the shared cache, or a ResultCache),
+        output of successful runs is reused by calls with the same
+        arguments, environment and working directory. See _call_cached
+        for related options.
+        """
+
+        if kwargs.get('cache') not in (None, False):
+            return self._call_cached(args, kwargs)
+        kwargs.pop('cache', None)
 
-        self._validate_command(self._command)
+        if kwargs.pop('run_async', False):
+            return self._call_async(args, kwargs)
 
         wait = kwargs.pop('wait', True)
 
         process_cls = SyncProcess if wait else AsyncProcess
 
-        self._arguments = args
+        result = self._make_result(process_cls, args, kwargs)
+        return self._execute_result(result)
 
-        self._process = process_cls(
-            self._command,
-            *args,
-            **kwargs
-        )
+    def _call_cached(self, args, kwargs):
+        """Returns a cached result, or runs the command and caches it
 
+        Options:
+            cache_ttl: time to live of the result in seconds, overrides
+                       the default one of the cache
+            cache_inputs: paths of files, which are read by the command,
+                          so changing them makes the cached result stale
+            cache_hash_inputs: if True, input files are compared by hashes
+                               of their content instead of modification
+                               time and size
+        """
+
+        # NOTE(albartash): Hashing is not needed by most of the calls
+        from python_shell.command.cache import get_result_cache
+
+        cache = kwargs.pop('cache')
+        if cache is True:
+            cache = get_result_cache()
+        ttl = kwargs.pop('cache_ttl', None)
+        inputs = kwargs.pop('cache_inputs', ())
+        hash_inputs = kwargs.pop('cache_hash_inputs', False)
+        if kwargs.pop('run_async', False) or not kwargs.pop('wait', True):
+            raise ValueError("Option cache requires waiting for the command")
+        for name in ('stdout', 'stderr'):
+            if kwargs.get(name, Subprocess.PIPE) not in (Subprocess.PIPE,
+                                                         Subprocess.STDOUT):
+                # NOTE(albartash): Cached output can't be written
+                #                  to the files instead of the command.
+                raise ValueError(
+                    "Option cache cannot be used with redirected output")
+        if kwargs.get('tee_stdout') or kwargs.get('tee_stderr'):
+            raise ValueError(
+                "Option cache cannot be used with consumers of output")
+
+        key = cache.make_key(
+            self._resolve_command(self._command), args,
+            env=kwargs.get('env'), cwd=kwargs.get('cwd'),
+            inputs=inputs, hash_inputs=hash_inputs,
+            data=kwargs.get('input'),
+            merge_stderr=kwargs.get('stderr') == Subprocess.STDOUT)
+
+        entry = cache.get(key)
+        if entry is not None:
+            process = CompletedProcess(self._command, args, entry.returncode,
+                                       entry.stdout, entry.stderr)
+            result = CommandResult(
+                self, args, process,
+                encoding=kwargs.get('encoding', None),
+                encoding_errors=kwargs.get('encoding_errors', None))
+            _record_result(self, result)
+            return result
+
+        result = self._execute_result(
+            self._make_result(SyncProcess, args, kwargs))
+        if result.return_code == 0:
+            output = result._process.get_output(limit=cache.max_size)
+            if output is not None:
+                cache.put(key, result.return_code, *output, ttl=ttl)
+        return result
+
+    def transform(self, iterable, *args, **kwargs):
+        """Streams iterable through the command and yields its output
+
+        Chunks of iterable (bytes or text) are written into stdin of the
+        command while its stdout is read, so data of any size can be
+        streamed through it:
+
+            for chunk in Shell.gzip.transform(read_chunks(), '-c'):
+                upload(chunk)
+
+        Chunks of output are yielded as soon as they are read. Input is
+        taken from iterable only when the command reads it, so neither
+        side piles data up in memory. Stopping the iteration terminates
+        the command. ShellException is raised when the command fails.
+        """
+
+        kwargs['input'] = iterable
+        result = self._make_result(SyncProcess, args, kwargs)
+        chunks = result._process.iter_output()
         try:
-            self._process.execute()
-        except Subprocess.CalledProcessError:
-            raise ShellException(self)
+            for chunk in chunks:
+                yield chunk
+        except RunProcessError as e:
+            self._check_run_process_error(e)
+            raise
+        except Subprocess.CalledProcessError as e:
+            error = ShellException(result, stdout_tail=e.stdout,
+                                   stderr_tail=e.stderr)
+            if hooks.enabled:
+                self._emit_error(error, result._process)
+            raise error
+        finally:
+            chunks.close()
 
-        return self
+    def _call_async(self, args, kwargs):
+        """Returns a coroutine executing the command within event loop"""
+
+        if is_python2_running():
+            return self._call_future(args, kwargs)
+
+        # NOTE(albartash): asyncio is imported only when it's really used
+        from python_shell.command.aio import execute_command_async
+        from python_shell.shell.processing.aio import AsyncioProcess
+
+        result = self._make_result(AsyncioProcess, args, kwargs)
+        return execute_command_async(result)
+
+    def _call_future(self, args, kwargs):
+        """Returns a future of the command run in background
+
+        It's used instead of asyncio on Python 2. With wait=False,
+        the future is completed as soon as the command is started.
+        """
+
+        from concurrent import futures
+
+        wait = kwargs.pop('wait', True)
+        future = futures.Future()
+        try:
+            result = self._execute_result(
+                self._make_result(AsyncProcess, args, kwargs))
+        except Exception as e:
+            future.set_exception(e)
+            return future
+
+        if wait:
+            return result.future
+        future.set_result(result)
+        return future
+
+    def bind(self, *args, **kwargs):
+        """Returns the command with bound arguments, which is not run yet
+
+        Bound commands can be run later or combined into pipelines:
+
+            Shell.cat.bind('file.log') | Shell.grep.bind('ERROR')
+        """
+        return BoundCommand(self, *args, **kwargs)
+
+    @property
+    def last_result(self):
+        """Returns the last result of the command in the current asyncio
+        task, if it's the last command run there, otherwise in the current
+        thread"""
+        return _get_recorded_result(self)
+
+    def _get_last_result(self):
+        """Returns the last result or raises an error if there's none"""
+
+        result = self.last_result
+        if result is None:
+            raise AttributeError(
+                'Command "{}" has not been run yet'.format(self._command))
+        return result
 
     @property
     def command(self):
         """Returns a string with the command"""
         return self._command
 
+    @property
+    def arguments(self):
+        """Returns a string with the arguments passed to the command"""
+
+        result = self.last_result
+        return result.arguments if result is not None else ''
+
+    @property
+    def return_code(self):
+        """Returns an integer code returned by the invoked command"""
+        return self._get_last_result().return_code
+
+    @property
+    def output(self):
+        """Returns an iterable object with output of the command"""
+        return self._get_last_result().output
+
+    @property
+    def errors(self):
+        """Returns an iterable object with output of the command
+           from stderr
+        """
+        return self._get_last_result().errors
+
+    @property
+    def output_view(self):
+        """Returns captured output of the command as a buffer"""
+        return self._get_last_result().output_view
+
+    @property
+    def errors_view(self):
+        """Returns captured stderr output of the command as a buffer"""
+        return self._get_last_result().errors_view
+
+    @property
+    def text(self):
+        """Returns output of the command decoded as a single string"""
+        return self._get_last_result().text
+
+    @property
+    def lines(self):
+        """Returns a list of decoded output lines without line endings"""
+        return self._get_last_result().lines
+
+    @property
+    def resource_usage(self):
+        """Returns ResourceUsage of the completed command"""
+        return self._get_last_result().resource_usage
+
+    def json(self, **kwargs):
+        """Returns output of the command parsed as JSON"""
+        return self._get_last_result().json(**kwargs)
+
+    def release(self):
+        """Releases captured output of the last result"""
+
+        result = self.last_result
+        if result is not None:
+            result.release()
+
+    def __repr__(self):
+        """Returns command's execution string"""
+        return ' '.join(filter(None, (self.command, self.arguments)))
+
+
+class CommandResult(BaseCommand):
+    """Result of a single run of the command
+
+    The result is never changed after it's created: running the command
+    again creates a new result.
+    """
+
+    _future = None
+
+    def __init__(self, command, arguments, process,
+                 encoding=None, encoding_errors=None):
+        self._set_encoding(encoding, encoding_errors)
+        self._command = command
+        self._arguments = arguments
+        self._process = process
+
+    def __call__(self, *args, **kwargs):
+        """Runs the same command again and returns a new result"""
+        return self._command(*args, **kwargs)
+
+    @property
+    def command(self):
+        """Returns a string with the command"""
+        return self._command.command
+
     @property
     def arguments(self):
         """Returns a string with the arguments passed to the command"""
@@ -105,10 +496,162 @@ class Command(ICommand):
         """
         return self._process.stderr
 
-    def __str__(self):
+    @property
+    def output_view(self):
+        """Returns captured output of the command as a buffer
+
+        Large outputs spilled to disk are returned as a read-only mmap,
+        so they can be searched, sliced or hashed without loading them
+        into memory.
+        """
+        return self._process.stdout_view
+
+    @property
+    def errors_view(self):
+        """Returns captured stderr output of the command as a buffer"""
+        return self._process.stderr_view
+
+    @property
+    def resource_usage(self):
+        """Returns ResourceUsage of the completed command
+
+        Wall time, CPU time, memory, page faults and context switches
+        are collected when the process is reaped. For running commands,
+        or when it's not supported by the platform, it returns None.
+        """
+        return self._process.resource_usage
+
+    @property
+    def future(self):
+        """Returns concurrent.futures.Future completed with the command
+
+        The future gets this result when the process is completed,
+        or ShellException if it returns non-zero code (unless the command
+        is run with check=False). Completion of commands run with
+        wait=False is tracked by a single thread, so thousands of them
+        can be waited for with concurrent.futures.wait() or as_completed()
+        without polling.
+        """
+
+        with _future_lock:
+            created = self._future is None
+            if created:
+                # NOTE(albartash): It's imported here, as it's slow
+                #                  to import and rarely used.
+                from concurrent import futures
+                self._future = futures.Future()
+                self._future.set_running_or_notify_cancel()
+
+        if created:
+            self._process.add_done_callback(self._complete_future)
+        return self._future
+
+    def _complete_future(self, process):
+        """Sets result of the future when the process is completed"""
+
+        if process.returncode and process._kwargs.get('check', True):
+            stdout_tail, stderr_tail = process.get_tails()
+            self._future.set_exception(ShellException(
+                self, stdout_tail=stdout_tail, stderr_tail=stderr_tail))
+        else:
+            self._future.set_result(self)
+
+    def release(self):
+        """Releases captured output of the command"""
+        self._process.release()
+
+    def close(self):
+        """Terminates the command, if it's running, and closes its pipes
+
+        Output captured before stays available until release().
+        """
+        self._process.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __repr__(self):
         """Returns command's execution string"""
-        return repr(self)
+        return ' '.join(filter(None, (self.command, self.arguments)))
+
+
+class CommandView(object):
+    """Command with default options for every call
+
+    It's used for views of Shell, like Shell.cached(): options passed
+    to a call override the default ones.
+    """
+
+    def __init__(self, command, **options):
+        self._command = command
+        self._options = options
+
+    @property
+    def command(self):
+        """Returns a Command instance"""
+        return self._command
+
+    def _merge_options(self, kwargs):  # -> dict
+        options = dict(self._options)
+        options.update(kwargs)
+        return options
+
+    def __call__(self, *args, **kwargs):
+        """Runs the command with default options"""
+        return self._command(*args, **self._merge_options(kwargs))
+
+    def bind(self, *args, **kwargs):
+        """Returns the command with bound arguments and default options"""
+        return BoundCommand(self._command, *args,
+                            **self._merge_options(kwargs))
+
+    def __getattr__(self, item):
+        return getattr(self._command, item)
+
+    def __repr__(self):
+        return repr(self._command)
+
+
+class BoundCommand(object):
+    """Command with bound arguments, which is not run yet"""
+
+    def __init__(self, command, *args, **kwargs):
+        self._command = command
+        self._args = args
+        self._kwargs = kwargs
+
+    @property
+    def command(self):
+        """Returns a Command instance"""
+        return self._command
+
+    @property
+    def args(self):
+        """Returns a tuple of bound arguments"""
+        return self._args
+
+    @property
+    def kwargs(self):
+        """Returns a dictionary of bound keyword arguments"""
+        return self._kwargs
+
+    def __call__(self):
+        """Runs the command with bound arguments"""
+        return self._command(*self._args, **self._kwargs)
+
+    def transform(self, iterable):
+        """Streams iterable through the command, see Command.transform"""
+        return self._command.transform(iterable, *self._args, **self._kwargs)
+
+    def __or__(self, other):
+        """Returns a pipeline with the other command"""
+
+        from python_shell.command.pipeline import Pipeline
+        return Pipeline(self) | other
 
     def __repr__(self):
         """Returns command's execution string"""
-        return ' '.join((self.command, self.arguments))
+        return ' '.join((self._command.command,) + tuple(map(str, self._args)))
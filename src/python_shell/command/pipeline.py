@@ -0,0 +1,352 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os
+import threading
+
+from python_shell.command.command import _get_recorded_result
+from python_shell.command.command import _record_result
+from python_shell.command.command import BoundCommand
+from python_shell.command.command import Command
+from python_shell.command.base import BaseCommand
+from python_shell.exceptions import ShellException
+from python_shell.shell.processing.capture import get_tail
+from python_shell.shell.processing.ioloop import get_io_loop
+from python_shell.shell.processing.process import AsyncProcess
+from python_shell.shell.processing.process import get_tail_size
+from python_shell.shell.processing.process import make_output_buffer
+from python_shell.shell.processing.process import StreamIterator
+from python_shell.shell.processing.process import SyncProcess
+from python_shell.shell.processing.usage import ResourceUsage
+
+
+__all__ = ('Pipeline', 'PipelineResult')
+
+
+class Pipeline(BaseCommand):
+    """Chain of commands connected by OS pipes
+
+    Stdout of every command is connected directly to stdin of the next
+    one, so data never passes through Python. Stderr of all commands
+    is collected together, like a terminal does, and it's captured
+    with options of the last command (spill_threshold, capture_stderr,
+    tail_size).
+
+    Every run of the pipeline returns a new PipelineResult, so the same
+    pipeline can be run from many threads at once. Properties of the
+    pipeline itself refer to the last result, like ones of Command do.
+    """
+
+    def __init__(self, *stages):
+        self._stages = tuple(map(self._make_stage, stages))
+        self._thread_results = threading.local()
+
+    @staticmethod
+    def _make_stage(stage):
+        """Converts passed object into a pipeline stage"""
+
+        if isinstance(stage, BoundCommand):
+            return stage
+        if isinstance(stage, Command):
+            return stage.bind()
+        raise TypeError(
+            "Cannot use {!r} as a pipeline stage".format(stage))
+
+    def __or__(self, other):
+        """Returns a new pipeline extended with other command(s)"""
+
+        if isinstance(other, Pipeline):
+            return Pipeline(*(self._stages + other._stages))
+        return Pipeline(*(self._stages + (other,)))
+
+    @property
+    def stages(self):
+        """Returns a tuple of pipeline commands"""
+        return self._stages
+
+    def _make_result(self, pipefail=False, encoding=None,
+                     encoding_errors=None):
+        """Returns a result of the pipeline, which is not run yet"""
+
+        result = PipelineResult(self, pipefail=pipefail, encoding=encoding,
+                                encoding_errors=encoding_errors)
+        _record_result(self, result)
+        return result
+
+    def __call__(self, check=True, pipefail=False, timeout=None,
+                 encoding=None, encoding_errors=None, input=None):
+        """Runs the pipeline and returns a PipelineResult instance
+
+        With check=True, ShellException is raised when the pipeline
+        returns non-zero code. With pipefail=True, the return code is
+        the last non-zero code of all commands, like "set -o pipefail"
+        does in Bash. input is written into stdin of the first command,
+        see Command.__call__ for supported values.
+        """
+
+        result = self._make_result(pipefail, encoding, encoding_errors)
+        return result._execute(check=check, timeout=timeout, input=input)
+
+    @property
+    def last_result(self):
+        """Returns the last result of the pipeline in the current asyncio
+        task, if it's the last command run there, otherwise in the current
+        thread"""
+        return _get_recorded_result(self)
+
+    def _get_last_result(self):
+        """Returns the last result or raises an error if there's none"""
+
+        result = self.last_result
+        if result is None:
+            raise AttributeError(
+                'Pipeline "{}" has not been run yet'.format(self.command))
+        return result
+
+    @property
+    def command(self):
+        """Returns a string with the pipeline"""
+        return ' | '.join(map(repr, self._stages))
+
+    @property
+    def arguments(self):
+        """Returns a string with the arguments passed to the pipeline
+
+        All arguments are a part of the pipeline string,
+        so it's always empty.
+        """
+        return ''
+
+    @property
+    def resource_usage(self):
+        """Returns total ResourceUsage of all commands of the pipeline"""
+        return self._get_last_result().resource_usage
+
+    @property
+    def return_codes(self):
+        """Returns a list of codes returned by each command,
+        like $PIPESTATUS in Bash"""
+        return self._get_last_result().return_codes
+
+    @property
+    def return_code(self):
+        """Returns an integer code returned by the pipeline"""
+        return self._get_last_result().return_code
+
+    @property
+    def output(self):
+        """Returns an iterable object with output of the last command"""
+        return self._get_last_result().output
+
+    @property
+    def errors(self):
+        """Returns an iterable object with stderr output of all commands"""
+        return self._get_last_result().errors
+
+    @property
+    def text(self):
+        """Returns output of the last command decoded as a single string"""
+        return self._get_last_result().text
+
+    @property
+    def lines(self):
+        """Returns a list of decoded output lines without line endings"""
+        return self._get_last_result().lines
+
+    def json(self, **kwargs):
+        """Returns output of the last command parsed as JSON"""
+        return self._get_last_result().json(**kwargs)
+
+    def release(self):
+        """Releases captured output of the last result"""
+
+        result = self.last_result
+        if result is not None:
+            result.release()
+
+    def __repr__(self):
+        """Returns pipeline's execution string"""
+        return self.command
+
+
+class PipelineResult(BaseCommand):
+    """Result of a single run of the pipeline
+
+    The result is never changed after the pipeline is completed:
+    running the pipeline again creates a new result.
+    """
+
+    _processes = None
+    _errors_buffer = None
+
+    def __init__(self, pipeline, pipefail=False, encoding=None,
+                 encoding_errors=None):
+        self._set_encoding(encoding, encoding_errors)
+        self._command = pipeline
+        self._pipefail = pipefail
+
+    def __call__(self, *args, **kwargs):
+        """Runs the same pipeline again and returns a new result"""
+        return self._command(*args, **kwargs)
+
+    def _terminate(self):
+        """Terminates all running processes of pipeline"""
+
+        for process in self._processes or ():
+            if not process.is_undefined and process.returncode is None:
+                process.terminate()
+
+    def _spawn(self, errors, timeout, input):
+        """Creates and runs pipeline processes"""
+
+        stages = self._command.stages
+
+        # NOTE(albartash): Resolve all commands before running anything,
+        #                  so missing commands don't leave a half-started
+        #                  pipeline.
+        for stage in stages:
+            stage.command._resolve_command(stage.command.command)
+
+        self._processes = []
+        stdin = None
+        for index, stage in enumerate(stages):
+            is_last = index == len(stages) - 1
+
+            kwargs = dict(stage.kwargs, check=False, timeout=timeout)
+            kwargs.pop('wait', None)
+            kwargs.setdefault('stderr', errors)
+            if stdin is not None:
+                kwargs['stdin'] = stdin
+            elif input is not None:
+                kwargs['input'] = input
+
+            process = stage.command._create_process(
+                SyncProcess if is_last else AsyncProcess,
+                stage.args,
+                kwargs
+            )
+            self._processes.append(process)
+            try:
+                stage.command._execute_process(process)
+            finally:
+                if stdin is not None:
+                    # NOTE(albartash): Only the child must keep the pipe
+                    #                  open, otherwise the previous command
+                    #                  never gets SIGPIPE.
+                    stdin.close()
+
+            if not is_last:
+                stdin = process.detach_stdout()
+
+    def _execute(self, check=True, timeout=None, input=None):
+        """Runs processes of the pipeline and returns the result"""
+
+        options = self._command.stages[-1].kwargs
+        buffer = make_output_buffer(options, 'stderr')
+        errors_done = threading.Event()
+
+        # NOTE(albartash): Stderr of all commands is read by the IO loop
+        #                  while they run, so none of them blocks on a full
+        #                  pipe.
+        read_fd, write_fd = os.pipe()
+        get_io_loop().register(os.fdopen(read_fd, 'rb', 0), buffer,
+                               on_close=errors_done.set)
+        try:
+            try:
+                self._spawn(write_fd, timeout, input)
+            finally:
+                os.close(write_fd)  # Commands have their own copies
+            for process in self._processes[:-1]:
+                process.wait()
+        except BaseException:
+            self._terminate()
+            raise
+
+        errors_done.wait()
+        self._errors_buffer = buffer
+
+        if check and self.return_code:
+            limit = get_tail_size(options)
+            raise ShellException(self, stderr_tail=get_tail(
+                buffer, limit) if limit else None)
+
+        return self
+
+    @property
+    def command(self):
+        """Returns a string with the pipeline"""
+        return self._command.command
+
+    @property
+    def arguments(self):
+        """Returns a string with the arguments passed to the pipeline,
+        which is always empty"""
+        return ''
+
+    @property
+    def resource_usage(self):
+        """Returns total ResourceUsage of all commands of the pipeline"""
+
+        return ResourceUsage.aggregate(
+            process.resource_usage for process in self._processes or ())
+
+    @property
+    def return_codes(self):
+        """Returns a list of codes returned by each command,
+        like $PIPESTATUS in Bash"""
+
+        return [process.returncode for process in self._processes]
+
+    @property
+    def return_code(self):
+        """Returns an integer code returned by the pipeline"""
+
+        return_codes = self.return_codes
+        if self._pipefail:
+            return next(
+                (code for code in reversed(return_codes) if code), 0)
+        return return_codes[-1]
+
+    @property
+    def output(self):
+        """Returns an iterable object with output of the last command"""
+        return self._processes[-1].stdout
+
+    @property
+    def errors(self):
+        """Returns an iterable object with stderr output of all commands"""
+        return StreamIterator(stream=self._errors_buffer.open())
+
+    def release(self):
+        """Releases captured output of the pipeline, including
+        temporary files"""
+
+        if self._processes:
+            self._processes[-1].release()
+        if self._errors_buffer is not None:
+            self._errors_buffer.release()
+
+    def __repr__(self):
+        """Returns pipeline's execution string"""
+        return self.command
@@ -29,6 +29,7 @@ from .shell import *
 __all__ = (
     'CommandDoesNotExist',
     'RunProcessError',
+    'SessionTerminated',
     'ShellException',
     'UndefinedProcess'
 )
@@ -45,11 +45,18 @@ class RunProcessError(Exception):
     def __init__(self,
                  cmd,
                  process_args=None,
-                 process_kwargs=None):
+                 process_kwargs=None,
+                 error=None):
 
         self._cmd = cmd
         self._args = process_args
         self._kwargs = process_kwargs
+        self._error = error
+
+    @property
+    def error(self):
+        """Returns an original exception caused the failure, if any"""
+        return self._error
 
     def __str__(self):
         return "Fail to run '{cmd} {args}'".format(
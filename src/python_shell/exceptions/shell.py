@@ -22,27 +22,58 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+import six
+
 from .base import BaseShellException
 
 
-__all__ = ('CommandDoesNotExist', 'ShellException')
+__all__ = ('CommandDoesNotExist', 'SessionTerminated', 'ShellException')
 
 
 class ShellException(BaseShellException):
-    """Defines any exception caused by commands run in Shell"""
+    """Defines any exception caused by commands run in Shell
+
+    Tails of output of the failed command (bytes or None) are kept
+    for diagnostics, and stderr tail is a part of the message.
+    """
 
     _command = None
 
-    def __init__(self, command):
+    def __init__(self, command, stdout_tail=None, stderr_tail=None):
         super(ShellException, self).__init__()
         self._command = command
+        self._stdout_tail = stdout_tail
+        self._stderr_tail = stderr_tail
+
+    @property
+    def command(self):
+        """Returns the command caused the exception"""
+        return self._command
+
+    @property
+    def stdout_tail(self):  # -> Union[bytes, None]
+        """Returns the last bytes of stdout of the command, if kept"""
+        return self._stdout_tail
+
+    @property
+    def stderr_tail(self):  # -> Union[bytes, None]
+        """Returns the last bytes of stderr of the command, if kept"""
+        return self._stderr_tail
 
     def __str__(self):
-        return 'Shell command "{} {}" failed with return code {}'.format(
-            self._command.command,
-            self._command.arguments,
+        message = 'Shell command "{}" failed with return code {}'.format(
+            ' '.join(filter(None, (self._command.command,
+                                   self._command.arguments))),
             self._command.return_code)
 
+        tail = (self._stderr_tail or b'').rstrip()
+        if tail:
+            # NOTE(albartash): Python 2 needs bytes for str()
+            if not six.PY2:
+                tail = tail.decode('utf-8', 'replace')
+            message += '\n' + tail
+        return message
+
 
 class CommandDoesNotExist(ShellException):
     """Defines an exception when command does not exist in the environment"""
@@ -51,3 +82,20 @@ class CommandDoesNotExist(ShellException):
 
     def __str__(self):
         return 'Command "{}" does not exist'.format(self._command.command)
+
+
+class SessionTerminated(BaseShellException):
+    """Defines an exception when shell session process has terminated"""
+
+    def __init__(self, return_code):
+        super(SessionTerminated, self).__init__()
+        self._return_code = return_code
+
+    @property
+    def return_code(self):
+        """Returns a code returned by the shell session process"""
+        return self._return_code
+
+    def __str__(self):
+        return 'Shell session terminated with return code {}'.format(
+            self._return_code)
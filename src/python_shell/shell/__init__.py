@@ -22,6 +22,16 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+from python_shell.util.lazy import set_lazy_attributes
+
 from .core import Shell
 
-__all__ = ('Shell',)
+
+# NOTE(albartash): Some names are set lazily, which pylint doesn't see.
+# pylint: disable=undefined-all-variable
+__all__ = ('Shell', 'ShellSession')
+# pylint: enable=undefined-all-variable
+
+set_lazy_attributes(globals(), {
+    'ShellSession': 'python_shell.shell.session',
+})
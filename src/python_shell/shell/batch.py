@@ -0,0 +1,268 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import collections
+import multiprocessing
+import threading
+
+from concurrent import futures
+
+from python_shell.command import BoundCommand
+from python_shell.command import Command
+from python_shell.command import Pipeline
+from python_shell.command import PipelineResult
+from python_shell.exceptions import CommandDoesNotExist
+from python_shell.exceptions import ShellException
+from python_shell.shell.processing.process import AsyncProcess
+from python_shell.shell.processing.process import Subprocess
+from python_shell.shell.processing.process import SyncProcess
+
+
+__all__ = ('as_completed', 'map_command', 'run_many', 'wait_any')
+
+
+def _make_invocation(item):
+    """Converts passed object into a command which is not run yet"""
+
+    if isinstance(item, (BoundCommand, Pipeline)):
+        return item
+    if isinstance(item, Command):
+        return item.bind()
+    raise TypeError("Cannot run {!r} as a command".format(item))
+
+
+def _terminate(result):
+    """Terminates the processes of command result if they're still running"""
+
+    if isinstance(result, PipelineResult):
+        result._terminate()
+        return
+    process = result._process
+    if process and not process.is_undefined and process.returncode is None:
+        process.terminate()
+
+
+class _RunningCommands(object):
+    """Results of commands being run by a batch
+
+    Once the batch is stopped, they're terminated, and no new ones
+    are started.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results = set()
+        self._is_stopped = False
+
+    def add(self, result):  # -> bool
+        """Adds the result, unless the batch is stopped"""
+
+        with self._lock:
+            if self._is_stopped:
+                return False
+            self._results.add(result)
+            return True
+
+    def discard(self, result):
+        with self._lock:
+            self._results.discard(result)
+
+    def stop(self):
+        """Terminates all running commands"""
+
+        with self._lock:
+            self._is_stopped = True
+            results = list(self._results)
+        for result in results:
+            _terminate(result)
+
+
+def _make_result(invocation, timeout):
+    """Returns a result of the bound command, which is not run yet"""
+
+    kwargs = dict(invocation.kwargs)
+    if timeout is not None:
+        kwargs.setdefault('timeout', timeout)
+
+    process_cls = SyncProcess if kwargs.pop('wait', True) else AsyncProcess
+    return invocation.command._make_result(
+        process_cls, invocation.args, kwargs)
+
+
+def _run_invocation(invocation, timeout, fail_fast, running):
+    """Runs a single command and returns the result"""
+
+    if isinstance(invocation, Pipeline):
+        result = invocation._make_result()
+    else:
+        result = _make_result(invocation, timeout)
+
+    if not running.add(result):
+        return None  # The batch is stopped, nobody needs the result
+    try:
+        if isinstance(result, PipelineResult):
+            return result._execute(timeout=timeout)
+        return invocation.command._execute_result(result)
+    except CommandDoesNotExist:
+        raise
+    except Subprocess.TimeoutExpired:
+        _terminate(result)
+        if fail_fast:
+            raise
+    except ShellException:
+        if fail_fast:
+            raise
+    finally:
+        running.discard(result)
+    return result
+
+
+def run_many(commands, parallelism=None, ordered=True, fail_fast=True,
+             timeout=None):
+    """Runs many commands in parallel and yields them when completed
+
+    commands is an iterable of commands with bound arguments, pipelines
+    or commands without arguments. It is consumed lazily, so it can be
+    a generator of any size.
+
+    At most parallelism commands are run at the same time (by default,
+    the number of CPUs). With ordered=True, commands are yielded in the
+    same order as they were passed, otherwise as soon as they complete.
+
+    With fail_fast=True, the first failed command stops the whole batch
+    and its exception is raised. Otherwise, failed commands are yielded
+    as well, and their return_code should be checked. Missing commands
+    always stop the batch. When the batch is stopped (or the generator
+    is closed), commands still running are terminated.
+
+    timeout is applied to each command separately. It's ignored
+    on Python 2, where timeouts of processes are not supported.
+    """
+
+    parallelism = parallelism or multiprocessing.cpu_count()
+    invocations = (_make_invocation(item) for item in commands)
+
+    # NOTE(albartash): Only a window of commands is submitted at once,
+    #                  so huge batches don't occupy memory with futures.
+    window = parallelism * 2
+    executor = futures.ThreadPoolExecutor(max_workers=parallelism)
+    pending = collections.deque()
+    running = _RunningCommands()
+
+    def submit(count):
+        for invocation in invocations:
+            pending.append(executor.submit(
+                _run_invocation, invocation, timeout, fail_fast, running))
+            count -= 1
+            if not count:
+                break
+
+    try:
+        submit(window)
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = futures.wait(
+                    pending, return_when=futures.FIRST_COMPLETED)
+                future = next(iter(done))
+                pending.remove(future)
+
+            result = future.result()
+            submit(1)
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
+        running.stop()
+        executor.shutdown(wait=False)
+
+
+def _make_arguments(item):
+    """Returns a tuple of command arguments for map_command"""
+
+    if isinstance(item, (tuple, list)):
+        return tuple(item)
+    return (item,)
+
+
+def map_command(command, iterable, **options):
+    """Runs command for each item of iterable in parallel
+
+    Each item is either a single argument or a tuple of arguments.
+    Accepts the same options as run_many.
+    """
+
+    return run_many(
+        (command.bind(*_make_arguments(item)) for item in iterable),
+        **options
+    )
+
+
+def _get_futures(commands):  # -> dict
+    """Returns a dict of futures of command results to the results"""
+
+    results = {}
+    for result in commands:
+        if result._process._uses_event_loop:
+            # NOTE(albartash): Waiting would block the event loop, which
+            #                  is the one to complete the commands.
+            raise TypeError(
+                "Results of commands run with run_async=True can't be "
+                "waited for here; await asyncio.wrap_future(result.future)")
+        results[result.future] = result
+    return results
+
+
+def as_completed(commands, timeout=None):
+    """Yields results of commands as soon as they are completed
+
+    commands are results of commands run with wait=False (or completed
+    ones, which are yielded first). Failed commands are yielded as well,
+    and their return_code should be checked. Raises TimeoutError
+    of concurrent.futures if not all commands are completed in timeout
+    seconds, and TypeError for commands run with run_async=True.
+    """
+
+    results = _get_futures(commands)
+    for future in futures.as_completed(results, timeout=timeout):
+        yield results[future]
+
+
+def wait_any(commands, timeout=None):
+    """Waits until any of command results is completed and returns it
+
+    If none of them is completed in timeout seconds, returns None.
+    Commands run with run_async=True are rejected with TypeError.
+    For waiting for many commands one by one, as_completed() is cheaper.
+    """
+
+    commands = list(commands)
+    done, _ = futures.wait(_get_futures(commands),
+                           timeout=timeout,
+                           return_when=futures.FIRST_COMPLETED)
+    for result in commands:
+        if result.future in done:
+            return result
+    return None
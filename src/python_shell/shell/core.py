@@ -25,16 +25,32 @@ THE SOFTWARE.
 from six import with_metaclass
 
 from python_shell.command import Command
-from python_shell.shell.terminal import TERMINAL_INTEGRATION_MAP
-from python_shell.util.terminal import get_current_terminal_name
+from python_shell.command import CommandView
+from python_shell.command.command import get_last_command
+from python_shell.command.command import set_last_command
+from python_shell.util.command_index import get_command_index
 
 
-__all__ = ('Shell',)
+__all__ = ('Shell', 'ShellView')
+
+
+def _get_command(shell, item):
+    """Returns shell command object, even if it's named as own field"""
+
+    command = shell._commands.get(item)
+    if command is None:
+        command = shell._commands[item] = Command(item)
+
+    set_last_command(command)
+    return command
 
 
 class MetaShell(type):
 
-    __own_fields__ = ('last_command',)
+    # NOTE(albartash): Own fields shadow shell commands with the same names,
+    #                  which are still available via Shell('map') and alike.
+    __own_fields__ = ('as_completed', 'cached', 'last_command', 'map',
+                      'run_many', 'wait_any')
 
     def __getattr__(cls, item):
         """Returns either own field or shell command object"""
@@ -46,33 +62,95 @@ class MetaShell(type):
         if item in cls.__own_fields__:
             return cls.__dict__[item]
 
-        cls._last_command = Command(item)
-        return cls._last_command
+        return _get_command(cls, item)
 
     def __dir__(cls):
         """Return list of available shell commands + own fields"""
-        name = get_current_terminal_name()
-        commands = TERMINAL_INTEGRATION_MAP[name]().available_commands
-        return sorted(
-            list(cls.__own_fields__) + commands
-        )
+        commands = get_command_index().commands
+        return sorted(set(cls.__own_fields__).union(commands))
+
+    def run_many(cls, commands, **options):
+        """Runs many commands in parallel and yields them when completed
+
+        See python_shell.shell.batch.run_many for available options.
+        """
+        from python_shell.shell import batch
+        return batch.run_many(commands, **options)
+
+    def map(cls, command, iterable, **options):
+        """Runs command for each item of iterable in parallel
+
+        See python_shell.shell.batch.map_command for available options.
+        """
+        from python_shell.shell import batch
+        return batch.map_command(command, iterable, **options)
+
+    def as_completed(cls, commands, timeout=None):
+        """Yields results of commands run with wait=False once they complete
+
+        See python_shell.shell.batch.as_completed for details.
+        """
+        from python_shell.shell import batch
+        return batch.as_completed(commands, timeout=timeout)
+
+    def wait_any(cls, commands, timeout=None):
+        """Waits for any of commands run with wait=False to complete
+
+        See python_shell.shell.batch.wait_any for details.
+        """
+        from python_shell.shell import batch
+        return batch.wait_any(commands, timeout=timeout)
+
+    def cached(cls, ttl=None, cache=True):
+        """Returns a view of Shell caching results of commands
+
+        Successful runs with the same arguments, environment and working
+        directory are reused for ttl seconds (forever, if it's None).
+        By default, the in-memory cache shared by the whole process
+        is used, another ResultCache can be passed with cache.
+        """
+        return ShellView(cache=cache, cache_ttl=ttl)
 
     @property
     def last_command(cls):
-        """Returns last executed command"""
-        return cls._last_command
+        """Returns last executed command
+
+        The command is tracked separately for every thread and asyncio
+        task, so it's the result of the last call made in the current one.
+        """
+        return get_last_command()
 
 
 class Shell(with_metaclass(MetaShell)):
     """Simple decorator for Terminal using Subprocess"""
 
-    _last_command = None
+    _commands = {}  # Command instances, reused between attribute accesses
 
     def __new__(cls, command_name):
         """Returns an ICommand instance for specified command_name.
         This is useful for shell commands which names are not valid
         in Python terms as identifier.
 
+        It also gives commands named as own fields of Shell
+        (e.g. "map" or "cached").
+
         NOTE: This is not a constructor, as it could seem to be.
         """
-        return getattr(cls, command_name)
+        return _get_command(cls, command_name)
+
+
+class ShellView(object):
+    """Shell with default options for every command, see Shell.cached()"""
+
+    def __init__(self, **options):
+        self._options = options
+
+    def __getattr__(self, item):
+        return CommandView(Shell(item), **self._options)
+
+    def __call__(self, command_name):
+        """Returns a view of the command, like Shell() does"""
+        return getattr(self, command_name)
+
+    def __dir__(self):
+        return dir(Shell)
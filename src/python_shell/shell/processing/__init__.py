@@ -22,11 +22,29 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+from python_shell.util.lazy import set_lazy_attributes
+from python_shell.util.version import is_python2_running
+
 from .process import AsyncProcess
+from .process import CompletedProcess
 from .process import SyncProcess
+from .usage import ResourceUsage
 
 
+# NOTE(albartash): Some names are set lazily, which pylint doesn't see.
+# pylint: disable=undefined-all-variable
 __all__ = (
+    'AsyncioProcess',
     'AsyncProcess',
+    'CompletedProcess',
+    'ResourceUsage',
     'SyncProcess'
 )
+# pylint: enable=undefined-all-variable
+
+# NOTE(albartash): Importing asyncio takes more time than all the other
+#                  modules of the package, so it's loaded on demand.
+if not is_python2_running():
+    set_lazy_attributes(globals(), {
+        'AsyncioProcess': 'python_shell.shell.processing.aio',
+    })
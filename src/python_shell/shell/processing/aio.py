@@ -0,0 +1,301 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import asyncio
+import signal
+
+from python_shell.exceptions import UndefinedProcess
+from python_shell.shell.processing.capture import encode_chunk
+from python_shell.shell.processing.capture import READ_SIZE
+from python_shell.shell.processing.process import Process
+from python_shell.shell.processing.process import StreamIterator
+from python_shell.shell.processing.process import Subprocess
+from python_shell.shell.processing.tee import Tee
+from python_shell.util import hooks
+
+
+__all__ = ('AsyncioProcess', 'AsyncStreamIterator')
+
+
+class AsyncStreamIterator(StreamIterator):
+    """A wrapper for retrieving data from asyncio subprocess streams
+
+    Supports "async for" for both running and completed processes.
+    For completed processes, regular iteration is supported as well.
+    """
+
+    def __init__(self, stream=None, reader=None):
+        super(AsyncStreamIterator, self).__init__(stream=stream)
+        self._reader = reader
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """Returns next available line from passed stream"""
+
+        if self._reader is None:
+            try:
+                return next(self)
+            except StopIteration:
+                raise StopAsyncIteration
+
+        line = await self._reader.readline()
+        if line:
+            return line
+        raise StopAsyncIteration
+
+
+class AsyncioProcess(Process):
+    """Process subclass for running process within asyncio event loop
+
+    Methods execute(), wait() and terminate() are coroutines.
+    When the coroutine is cancelled (e.g. by asyncio.wait_for),
+    the process is killed.
+    """
+
+    _feeder = None  # task writing input of the process not waited for
+    _completion = None  # task reading output of the process not waited for
+    _uses_event_loop = True
+
+    def _make_stream_iterator(self, buffer, reader):
+        """Returns iterator over either captured or live stream"""
+
+        if buffer is not None:
+            return AsyncStreamIterator(stream=buffer.open())
+        return AsyncStreamIterator(reader=reader)
+
+    @property
+    def stderr(self):
+        """Returns stderr output of process"""
+
+        return self._make_stream_iterator(
+            self._stderr_buffer,
+            self._process and self._process.stderr or None
+        )
+
+    @property
+    def stdout(self):
+        """Returns stdout output of process"""
+
+        return self._make_stream_iterator(
+            self._stdout_buffer,
+            self._process and self._process.stdout or None
+        )
+
+    @property
+    def returncode(self):  # -> Union[int, None]
+        """Returns returncode of process
+
+        For undefined process, it returns None
+        """
+
+        if self._process:
+            return self._process.returncode
+        return None
+
+    def add_done_callback(self, fn):
+        """Calls fn(process) when the process is completed
+
+        It must be called in the thread of the event loop running
+        the process. For processes run with wait=False, a task of the loop
+        reads their output (like execute() does otherwise) and calls fn
+        once they exit.
+        """
+
+        if not self._process:
+            raise UndefinedProcess
+        if self._completion is None:
+            if self._kwargs.get('wait', True):
+                return fn(self)  # Completed by execute()
+            self._completion = asyncio.ensure_future(self._complete())
+        self._completion.add_done_callback(lambda _: fn(self))
+
+    async def _complete(self):
+        """Reads output of the process run with wait=False until it exits"""
+
+        self._stdout_buffer, self._stderr_buffer = await self._communicate(
+            None)
+        if hooks.enabled:
+            self._emit_exit()
+
+    async def _kill_on_cancel(self, awaitable):
+        """Awaits awaitable and kills the process if cancelled"""
+
+        try:
+            return await awaitable
+        except asyncio.CancelledError:
+            if self._process.returncode is None:
+                self._signal(signal.SIGKILL)
+                await self._process.wait()
+            raise
+
+    async def _feed_input(self):
+        """Writes input into stdin of the process and closes it"""
+
+        stdin = self._process.stdin
+        if stdin is None:
+            return
+
+        chunks = self._input_chunks or ()
+        try:
+            if hasattr(chunks, '__aiter__'):
+                async for chunk in chunks:
+                    stdin.write(encode_chunk(chunk))
+                    await stdin.drain()
+            else:
+                for chunk in chunks:
+                    stdin.write(encode_chunk(chunk))
+                    await stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The process has exited or closed its stdin
+        finally:
+            stdin.close()
+
+    async def _communicate(self, consumers):
+        """Writes input and reads output of the process until it exits
+
+        Returns a tuple (stdout, stderr) of buffers, where None stands
+        for a non-piped stream. Data is passed to consumers of a stream
+        as soon as it's read.
+        """
+
+        async def read(name, stream):
+            if stream is None:
+                return None
+
+            buffer = self._make_buffer(name)
+            sink = buffer
+            if consumers and consumers[name]:
+                sink = Tee([buffer] + consumers[name])
+                self._tees += (sink,)
+            while True:
+                data = await stream.read(READ_SIZE)
+                if not data:
+                    break
+                sink.write(data)
+            sink.close()
+            return buffer
+
+        # NOTE(albartash): Input of the process run with wait=False
+        #                  is written by its own task already.
+        _, stdout, stderr = await asyncio.gather(
+            self._feeder if self._feeder is not None else self._feed_input(),
+            read('stdout', self._process.stdout),
+            read('stderr', self._process.stderr)
+        )
+        await self._process.wait()
+        return stdout, stderr
+
+    async def execute(self):
+        """Run a process within event loop
+
+        Unless wait=False is passed, the process output is captured
+        and the coroutine completes when the process is finished.
+        """
+
+        strategy = self._kwargs.get('spawn', Subprocess.spawn_strategy)
+        if strategy == Subprocess.SPAWN_SERVER:
+            raise ValueError(
+                "Fork server cannot be used within asyncio event loop")
+
+        arguments = self._make_command_execution_list(self._args)
+        consumers = self._make_consumers()
+        if consumers is not None and not self._kwargs.get('wait', True):
+            # NOTE(albartash): Output of such processes is read by
+            #                  the caller within its event loop.
+            raise ValueError(
+                "Consumers of output require waiting for the process")
+        kwargs = self._make_popen_kwargs()
+        self._arguments = arguments
+
+        try:
+            self._process = await asyncio.create_subprocess_exec(
+                *arguments, **kwargs)
+        except (OSError, ValueError) as e:
+            error = self._make_run_process_error(arguments, kwargs, e)
+            if hooks.enabled:
+                self._emit(hooks.EVENT_ERROR, exception=error)
+            raise error
+        finally:
+            self._close_opened_descriptors()
+        self._process_group = self._uses_process_group()
+
+        if hooks.enabled:
+            self._emit(hooks.EVENT_SPAWN, executable=kwargs['executable'])
+
+        if not self._kwargs.get('wait', True):
+            if self._input_chunks is not None:
+                self._feeder = asyncio.ensure_future(self._feed_input())
+            return
+
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                self._kill_on_cancel(self._communicate(consumers)),
+                self._kwargs.get('timeout', None)
+            )
+        except BaseException as e:
+            if hooks.enabled:
+                self._emit(hooks.EVENT_ERROR, exception=e)
+            raise
+        self._stdout_buffer, self._stderr_buffer = stdout, stderr
+
+        if hooks.enabled:
+            self._emit_exit()
+
+        self._raise_consumer_error()
+        if self._process.returncode and self._kwargs.get('check', True):
+            raise self._make_called_process_error(arguments)
+
+    async def wait(self):
+        """Wait until process is completed"""
+
+        if not self._process:
+            return super(AsyncioProcess, self).wait()
+        await self._kill_on_cancel(self._process.wait())
+
+        if hooks.enabled:
+            self._emit_exit()
+
+    async def terminate(self, grace_period=None):
+        """Terminates process if it's defined
+
+        See Process.terminate() for details.
+        """
+
+        if not self._process:
+            return super(AsyncioProcess, self).terminate()
+
+        self._signal(signal.SIGTERM)
+        if grace_period is not None:
+            try:
+                await asyncio.wait_for(self._process.wait(), grace_period)
+            except asyncio.TimeoutError:
+                pass
+            if self._process_group or self._process.returncode is None:
+                self._signal(signal.SIGKILL)
+        await self._process.wait()
+
+        if hooks.enabled:
+            self._emit_exit()
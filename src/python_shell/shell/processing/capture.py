@@ -0,0 +1,569 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import collections
+import io
+import mmap
+import os
+import subprocess
+import threading
+import time
+
+import six
+
+from python_shell.util.streaming import DEFAULT_ENCODING
+from python_shell.util.version import is_python2_running
+
+from .tee import Tee
+
+if not is_python2_running():
+    import selectors
+
+
+__all__ = (
+    'IdleTimeoutExpired',
+    'InputWriter',
+    'OutputBuffer',
+    'RingBuffer',
+    'SpillBuffer',
+    'communicate',
+    'encode_chunk',
+    'feed_input',
+    'get_tail',
+    'iter_communicate',
+)
+
+
+READ_SIZE = 64 * 1024  # bytes read from a pipe at once
+
+
+if is_python2_running():
+    class IdleTimeoutExpired(Exception):
+        """A stub for Python 2, where process timeouts are not supported"""
+
+else:
+    class IdleTimeoutExpired(subprocess.TimeoutExpired):
+        """Raised when the process produces no output for too long"""
+
+        def __str__(self):
+            return "Command '{}' produced no output for {} seconds".format(
+                self.cmd, self.timeout)
+
+
+class OutputBuffer(object):
+    """In-memory storage for data read from a process stream"""
+
+    def __init__(self):
+        self._chunks = []
+        self._size = 0
+
+    @property
+    def size(self):  # -> int
+        """Returns amount of stored bytes"""
+        return self._size
+
+    def write(self, data):
+        """Stores a chunk of data"""
+        self._chunks.append(data)
+        self._size += len(data)
+
+    def close(self):
+        """Notifies buffer that no more data will be written"""
+
+    def getvalue(self):  # -> bytes
+        """Returns all stored data as a single bytes object"""
+
+        if len(self._chunks) != 1:
+            self._chunks = [b''.join(self._chunks)]
+        return self._chunks[0]
+
+    def open(self):
+        """Returns a new file-like object for reading stored data"""
+        return io.BytesIO(self.getvalue())
+
+    def view(self):
+        """Returns stored data as a buffer, without copying it"""
+        return memoryview(self.getvalue())
+
+    def release(self):
+        """Drops stored data"""
+        self._chunks = []
+
+
+class SpillBuffer(OutputBuffer):
+    """Storage which moves data to a temporary file above the threshold
+
+    Stored data is read through mmap, so it doesn't have to be loaded
+    into memory.
+    """
+
+    _file = None  # temporary file, when data has been spilled
+    _mmap = None  # mapping returned by view()
+
+    def __init__(self, threshold):
+        super(SpillBuffer, self).__init__()
+        self._threshold = threshold
+
+    @property
+    def is_spilled(self):  # -> bool
+        """Returns whether data has been moved to a temporary file"""
+        return self._file is not None
+
+    def write(self, data):
+        """Stores a chunk of data"""
+
+        if self._file is None:
+            if self._size + len(data) <= self._threshold:
+                return super(SpillBuffer, self).write(data)
+
+            # NOTE(albartash): tempfile is imported here, as it's slow to
+            #                  import and needed for huge outputs only.
+            import tempfile
+            self._file = tempfile.TemporaryFile()
+            self._file.write(b''.join(self._chunks))
+            self._chunks = []
+
+        self._file.write(data)
+        self._size += len(data)
+
+    def close(self):
+        """Notifies buffer that no more data will be written"""
+
+        if self._file is not None:
+            self._file.flush()
+
+    def _map(self):
+        """Returns a new read-only mapping of the temporary file"""
+        return mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def getvalue(self):  # -> bytes
+        """Returns all stored data as a single bytes object"""
+
+        if self._file is None:
+            return super(SpillBuffer, self).getvalue()
+        return self.view()[:]
+
+    def open(self):
+        """Returns a new file-like object for reading stored data"""
+
+        if self._file is None:
+            return super(SpillBuffer, self).open()
+        return self._map()
+
+    def view(self):
+        """Returns stored data as a buffer, without copying it
+
+        For spilled data, it's a read-only mmap of the temporary file.
+        """
+
+        if self._file is None:
+            return super(SpillBuffer, self).view()
+        if self._mmap is None:
+            self._mmap = self._map()
+        return self._mmap
+
+    def release(self):
+        """Drops stored data and removes the temporary file"""
+
+        super(SpillBuffer, self).release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # NOTE(albartash): The mapping is still exported via
+                #                  memoryview, so it's closed by GC.
+                pass
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class RingBuffer(OutputBuffer):
+    """Storage keeping only the last limit bytes of data
+
+    Memory used by it never exceeds the limit by more than one chunk,
+    no matter how much data is written.
+    """
+
+    def __init__(self, limit):
+        super(RingBuffer, self).__init__()
+        self._limit = limit
+        self._chunks = collections.deque()
+        self._truncated = False
+
+    @property
+    def is_truncated(self):  # -> bool
+        """Returns whether the beginning of data has been dropped"""
+        return self._truncated
+
+    def write(self, data):
+        """Stores a chunk of data, dropping the oldest ones"""
+
+        self._chunks.append(data)
+        self._size += len(data)
+        while self._size - len(self._chunks[0]) >= self._limit:
+            self._size -= len(self._chunks.popleft())
+            self._truncated = True
+            if not self._chunks:
+                break
+
+    def getvalue(self):  # -> bytes
+        """Returns the last limit bytes of data"""
+
+        data = b''.join(self._chunks)
+        if len(data) > self._limit:
+            data = data[len(data) - self._limit:]
+            self._truncated = True
+        self._chunks = collections.deque([data])
+        self._size = len(data)
+        return data
+
+    def release(self):
+        """Drops stored data"""
+
+        self._chunks = collections.deque()
+        self._size = 0
+
+
+def get_tail(buffer, limit):  # -> bytes
+    """Returns the last limit bytes of data stored in buffer
+
+    When the beginning of data is cut off, the tail starts from
+    the first complete line, if there's one.
+    """
+
+    view = buffer.view()
+    tail = view[len(view) - min(limit, len(view)):]
+    if isinstance(tail, memoryview):
+        tail = tail.tobytes()  # Slices of mmap are bytes already
+    if len(view) <= limit and not getattr(buffer, 'is_truncated', False):
+        return tail
+
+    start = tail.find(b'\n') + 1
+    if 0 < start < len(tail):
+        tail = tail[start:]
+    return tail
+
+
+def encode_chunk(chunk):
+    """Returns chunk of input as bytes, encoding text if needed"""
+
+    if isinstance(chunk, six.text_type):
+        return chunk.encode(DEFAULT_ENCODING)
+    return chunk
+
+
+class InputWriter(object):
+    """Writes chunks of data into a pipe without blocking
+
+    Chunks are taken from the iterable only when the previous ones
+    are written, so the whole input is never kept in memory.
+    """
+
+    def __init__(self, pipe, chunks):
+        self._pipe = pipe
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b'')  # data of a chunk not written yet
+        os.set_blocking(pipe.fileno(), False)
+
+    def write(self):  # -> bool
+        """Writes as much data as the pipe accepts now
+
+        Returns False when there's nothing more to write, either because
+        input is exhausted or because the process has closed its stdin.
+        """
+
+        while True:
+            if not self._pending:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    return False
+                self._pending = memoryview(encode_chunk(chunk)).cast('B')
+                continue
+            try:
+                written = os.write(self._pipe.fileno(), self._pending)
+            except BlockingIOError:
+                return True
+            except BrokenPipeError:
+                # NOTE(albartash): The process doesn't need the rest of
+                #                  input, like "head" does.
+                return False
+            self._pending = self._pending[written:]
+
+    def close(self):
+        """Closes the pipe, so the process gets EOF"""
+
+        try:
+            self._pipe.close()
+        except BrokenPipeError:
+            pass
+
+
+def feed_input(pipe, chunks):
+    """Writes chunks into a blocking pipe and closes it
+
+    It's used by a background thread for processes which are not waited
+    for, so their input is written while the caller reads their output.
+    """
+
+    try:
+        for chunk in chunks:
+            pipe.write(encode_chunk(chunk))
+    except (IOError, OSError):
+        pass  # The process has exited or closed its stdin
+    finally:
+        try:
+            pipe.close()
+        except (IOError, OSError):
+            pass
+
+
+def _make_sinks(buffers, consumers):
+    """Returns objects which data of every stream is written into
+
+    Streams with consumers get a Tee passing data to the buffer and to
+    the consumers, other streams are written into buffers directly.
+    """
+
+    sinks = dict(buffers)
+    for name, buffer in buffers.items():
+        if buffer is not None and consumers and consumers.get(name):
+            sinks[name] = Tee([buffer] + list(consumers[name]))
+    return sinks
+
+
+def _raise_consumer_error(sinks):
+    """Raises exception of a failed consumer, if any"""
+
+    for name in ('stdout', 'stderr'):
+        if isinstance(sinks[name], Tee):
+            sinks[name].raise_error()
+
+
+def _communicate_python2(process, make_buffer, input_chunks, consumers):
+    """Fallback for Python 2, where selectors are not available
+
+    Consumers get the output when the process is completed.
+    """
+
+    if process.stdin and input_chunks is not None:
+        # NOTE(albartash): Input may be endless, so it's written by
+        #                  a thread instead of being passed at once.
+        stdin, process.stdin = process.stdin, None
+        feeder = threading.Thread(target=feed_input,
+                                  args=(stdin, input_chunks))
+        feeder.daemon = True
+        feeder.start()
+    stdout, stderr = process.communicate()
+    buffers = {}
+    for name, data in (('stdout', stdout), ('stderr', stderr)):
+        buffers[name] = make_buffer(name) if data is not None else None
+
+    sinks = _make_sinks(buffers, consumers)
+    for name, data in (('stdout', stdout), ('stderr', stderr)):
+        if data is not None:
+            if data:
+                sinks[name].write(data)
+            sinks[name].close()
+    _raise_consumer_error(sinks)
+    return buffers['stdout'], buffers['stderr']
+
+
+def _iter_communicate_python2(process, input_chunks, on_first_byte):
+    """Fallback of iter_communicate for Python 2, where selectors
+    are not available
+
+    Input is written and stderr is read by threads, while stdout is read
+    by the caller. Stderr is yielded when stdout is finished.
+    """
+
+    if process.stdin:
+        stdin, process.stdin = process.stdin, None
+        if input_chunks is None:
+            stdin.close()
+        else:
+            feeder = threading.Thread(target=feed_input,
+                                      args=(stdin, input_chunks))
+            feeder.daemon = True
+            feeder.start()
+
+    errors = []
+
+    def read_errors():
+        while True:
+            data = os.read(process.stderr.fileno(), READ_SIZE)
+            if not data:
+                return
+            errors.append(data)
+
+    reader = None
+    if process.stderr is not None:
+        reader = threading.Thread(target=read_errors)
+        reader.daemon = True
+        reader.start()
+
+    if process.stdout is not None:
+        while True:
+            data = os.read(process.stdout.fileno(), READ_SIZE)
+            if data and on_first_byte is not None:
+                on_first_byte('stdout')
+                on_first_byte = None
+            yield 'stdout', data
+            if not data:
+                process.stdout.close()
+                break
+
+    if reader is not None:
+        reader.join()
+        process.stderr.close()
+        for data in errors:
+            yield 'stderr', data
+        yield 'stderr', b''
+    process.wait()
+
+
+def iter_communicate(process, input_chunks=None, timeout=None,
+                     idle_timeout=None, on_first_byte=None):
+    """Writes input into the process and reads its output until it exits
+
+    Writing and reading are done at the same time, so neither the process
+    nor the caller block on full pipes. Yields tuples (name, data), where
+    name is "stdout" or "stderr", and empty data means the end of stream.
+    Output is read only when the caller asks for it, and input is written
+    only when the process reads it, so a slow consumer slows down the
+    whole chain instead of piling data up in memory.
+
+    Raises TimeoutExpired if the process is not completed in timeout
+    seconds, and IdleTimeoutExpired if it writes nothing to its pipes
+    for idle_timeout seconds. on_first_byte is called with a name of
+    the stream which the process has written into first.
+
+    The process is not stopped on errors, it's up to the caller.
+    Timeouts are not supported on Python 2.
+    """
+
+    if is_python2_running():
+        for item in _iter_communicate_python2(process, input_chunks,
+                                              on_first_byte):
+            yield item
+        return
+
+    writer = None
+    if process.stdin:
+        if input_chunks is None:
+            process.stdin.close()
+        else:
+            writer = InputWriter(process.stdin, input_chunks)
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    idle_deadline = None
+
+    with selectors.DefaultSelector() as selector:
+        if writer is not None:
+            selector.register(process.stdin, selectors.EVENT_WRITE)
+        for name, stream in (('stdout', process.stdout),
+                             ('stderr', process.stderr)):
+            if stream is not None:
+                selector.register(stream, selectors.EVENT_READ, name)
+
+        while selector.get_map():
+            now = time.monotonic()
+            if idle_timeout is not None and idle_deadline is None:
+                idle_deadline = now + idle_timeout
+
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(process.args, timeout)
+            if idle_deadline is not None:
+                idle_remaining = idle_deadline - now
+                if idle_remaining <= 0:
+                    raise IdleTimeoutExpired(process.args, idle_timeout)
+                if remaining is None or idle_remaining < remaining:
+                    remaining = idle_remaining
+
+            for key, _ in selector.select(remaining):
+                if key.fileobj is process.stdin:
+                    if not writer.write():
+                        selector.unregister(key.fileobj)
+                        writer.close()
+                    continue
+
+                data = os.read(key.fd, READ_SIZE)
+                if data:
+                    idle_deadline = None
+                    if on_first_byte is not None:
+                        on_first_byte(key.data)
+                        on_first_byte = None
+                else:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                yield key.data, data
+
+    remaining = None
+    if deadline is not None:
+        remaining = max(deadline - time.monotonic(), 0)
+    process.wait(timeout=remaining)
+
+
+def _make_output_buffer(name):  # -> OutputBuffer
+    return OutputBuffer()
+
+
+def communicate(process, timeout=None, make_buffer=_make_output_buffer,
+                idle_timeout=None, on_first_byte=None, input_chunks=None,
+                consumers=None):
+    """Writes input into the process and drains its stdout and stderr
+    until it is completed
+
+    Returns a tuple (stdout, stderr) of buffers created by make_buffer
+    for every stream name, where None stands for a non-piped stream.
+    input_chunks is an iterable of data written into stdin, if it's piped.
+    consumers maps a stream name to a list of consumers getting its data
+    as soon as it's read; if any of them fails, its exception is raised
+    once the process is completed. See iter_communicate for other arguments.
+    """
+
+    if is_python2_running():
+        return _communicate_python2(process, make_buffer, input_chunks,
+                                    consumers)
+
+    buffers = {}
+    for name, stream in (('stdout', process.stdout),
+                         ('stderr', process.stderr)):
+        buffers[name] = make_buffer(name) if stream is not None else None
+    sinks = _make_sinks(buffers, consumers)
+
+    for name, data in iter_communicate(
+            process, input_chunks=input_chunks, timeout=timeout,
+            idle_timeout=idle_timeout, on_first_byte=on_first_byte):
+        if data:
+            sinks[name].write(data)
+        else:
+            sinks[name].close()
+
+    _raise_consumer_error(sinks)
+    return buffers['stdout'], buffers['stderr']
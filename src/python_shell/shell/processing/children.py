@@ -0,0 +1,244 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os
+import signal
+import threading
+import time
+
+from python_shell.shell.processing.completion import get_completion_tracker
+from python_shell.shell.processing.ioloop import get_io_loop
+from python_shell.shell.processing.tee import Consumer
+
+
+__all__ = ('ChildRegistry', 'close_pipes', 'count_open_fds',
+           'get_child_registry', 'has_inheritable_fds')
+
+
+_clock = getattr(time, 'monotonic', time.time)
+
+POLL_INTERVAL = 0.01  # seconds between checks of children being terminated
+
+
+def _list_open_fds():  # -> Union[list, None]
+    """Returns file descriptors open in the current process, or None
+    if the platform doesn't list them (neither /proc/self/fd
+    nor /dev/fd exists)
+
+    NOTE(albartash): The descriptor of the listed directory is open
+                     while listing it, so it's in the list, but closed.
+    """
+
+    for path in ('/proc/self/fd', '/dev/fd'):
+        try:
+            return [int(name) for name in os.listdir(path)]
+        except OSError:
+            continue
+    return None
+
+
+def count_open_fds():  # -> Union[int, None]
+    """Returns the number of file descriptors open in the current process
+
+    If the platform doesn't list them, it returns None.
+    """
+
+    fds = _list_open_fds()
+    return len(fds) - 1 if fds is not None else None
+
+
+def has_inheritable_fds():  # -> bool
+    """Returns whether children would inherit descriptors other than
+    stdin, stdout and stderr, unless they're closed on spawning
+
+    Python creates non-inheritable descriptors (PEP 446), but ones
+    inherited at startup or created by C extensions may be inheritable.
+    If descriptors can't be listed, it returns True.
+    """
+
+    fds = _list_open_fds()
+    if fds is None or not hasattr(os, 'get_inheritable'):
+        return True
+    for fd in fds:
+        if fd > 2:
+            try:
+                if os.get_inheritable(fd):
+                    return True
+            except OSError:
+                pass  # It's closed already
+    return False
+
+
+def _signal(popen, process_group, signal_number):
+    """Sends the signal to the process group or to the process only"""
+
+    try:
+        if process_group:
+            os.killpg(popen.pid, signal_number)
+        else:
+            popen.send_signal(signal_number)
+    except OSError:
+        pass  # The process and its group have gone already
+
+
+def close_pipes(popen):
+    """Closes pipes connected to the process"""
+
+    for name in ('stdin', 'stdout', 'stderr'):
+        stream = getattr(popen, name)
+        if stream is not None:
+            try:
+                stream.close()
+            except (IOError, OSError):
+                pass  # Broken stdin pipe can't be flushed
+
+
+class ChildRegistry(object):
+    """Keeps track of child processes which have not been reaped yet
+
+    Every process spawned by Subprocess is added here, so running children
+    can be counted, terminated at exit, and reaped in background when
+    the process objects owning them are garbage collected.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._children = {}  # popen -> whether it leads a process group
+        self._pid = None
+
+    def _get_children(self):  # -> dict
+        """Returns children of the current process, must be called locked"""
+
+        # NOTE(albartash): A forked process doesn't own children
+        #                  of its parent.
+        if self._pid != os.getpid():
+            self._children = {}
+            self._pid = os.getpid()
+        return self._children
+
+    def add(self, popen, process_group=False):
+        """Starts tracking the spawned process"""
+
+        with self._lock:
+            self._get_children()[popen] = process_group
+
+    def discard(self, popen):
+        """Stops tracking the process, e.g. when it's reaped"""
+
+        with self._lock:
+            self._get_children().pop(popen, None)
+
+    def abandon(self, popen):
+        """Reaps the process in background, as nobody is going to wait for it
+
+        Its output is read and discarded by IO loop, so the process keeps
+        running as usual instead of blocking on a full pipe or getting
+        SIGPIPE.
+        """
+
+        for name in ('stdout', 'stderr'):
+            stream = getattr(popen, name)
+            if stream is not None and not stream.closed:
+                setattr(popen, name, None)
+                get_io_loop().register(stream, Consumer())
+        if popen.poll() is not None:
+            return self.discard(popen)
+        get_completion_tracker().watch(popen, lambda: self.discard(popen))
+
+    def _get_running(self):  # -> list
+        """Returns (popen, process_group) pairs of running children"""
+
+        with self._lock:
+            children = self._get_children()
+            for popen in [p for p in children if p.returncode is not None]:
+                del children[popen]
+            return list(children.items())
+
+    @property
+    def count(self):  # -> int
+        """Returns the number of running (or not reaped) children"""
+        return len(self._get_running())
+
+    @property
+    def pids(self):  # -> list
+        """Returns a sorted list of PIDs of running children"""
+        return sorted(popen.pid for popen, _ in self._get_running())
+
+    @property
+    def open_pipes(self):  # -> int
+        """Returns the number of pipes still open for running children"""
+
+        count = 0
+        for popen, _ in self._get_running():
+            for name in ('stdin', 'stdout', 'stderr'):
+                stream = getattr(popen, name)
+                if stream is not None and not stream.closed:
+                    count += 1
+        return count
+
+    def terminate_all(self, grace_period):
+        """Terminates all running children and reaps them
+
+        SIGTERM is sent to all of them at once. Children still running
+        after grace_period seconds are killed, as well as the rest of their
+        process groups.
+        """
+
+        children = self._get_running()
+        for popen, process_group in children:
+            _signal(popen, process_group, signal.SIGTERM)
+
+        deadline = _clock() + grace_period
+        running = children
+        while running and _clock() < deadline:
+            time.sleep(POLL_INTERVAL)
+            running = [(popen, process_group)
+                       for popen, process_group in running
+                       if popen.poll() is None]
+
+        for popen, process_group in children:
+            if process_group or popen.returncode is None:
+                _signal(popen, process_group, signal.SIGKILL)
+        for popen, _ in children:
+            close_pipes(popen)
+            try:
+                popen.wait()
+            except OSError:
+                pass  # Reaped by someone else
+            self.discard(popen)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_child_registry():  # -> ChildRegistry
+    """Returns a registry of children shared by all processes"""
+
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ChildRegistry()
+    return _registry
@@ -0,0 +1,281 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import errno
+import os
+import threading
+import time
+
+from python_shell.util.version import is_python2_running
+
+if not is_python2_running():
+    import selectors
+
+
+__all__ = ('CompletionTracker', 'get_completion_tracker')
+
+
+POLL_INTERVAL = 0.05  # seconds between checks of processes without pidfd
+
+
+def _notify(popen, callback):
+    """Reaps the exited process and calls callback"""
+
+    try:
+        popen.wait()
+    except Exception:
+        pass  # The callback finds out what's happened
+    try:
+        callback()
+    except Exception:
+        # NOTE(albartash): A failed callback must not stop tracking
+        #                  other processes.
+        pass
+
+
+class CompletionTracker(object):
+    """Notifies about completion of processes in a single thread
+
+    On Linux, every process is watched via its pidfd, so thousands
+    of processes are tracked by one select() call. Elsewhere, the thread
+    waits for any child with waitid(), without reaping it, and checks
+    whether it's a tracked one. Without waitid() (Python 2), tracked
+    processes are polled.
+
+    Processes spawned by the fork server are not children of the current
+    process, so the server notifies about them itself.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._thread = None
+        self._pid = None
+        self._use_pidfd = None
+        self._selector = None
+        self._wakeup = None  # pipe (read fd, write fd) interrupting select
+        self._pending = []  # processes to be registered by the thread
+        self._polled = {}  # pid -> (popen, callback), checked periodically
+
+    def _ensure_thread(self):
+        """Starts the thread, unless it's running in the current process"""
+
+        # NOTE(albartash): Threads don't survive fork, so the child process
+        #                  needs its own thread and no inherited processes.
+        if self._pid != os.getpid():
+            self._pending = []
+            self._polled = {}
+            self._thread = None
+            self._pid = os.getpid()
+
+        if self._thread is not None:
+            return
+
+        if self._use_pidfd is None:
+            self._use_pidfd = self._is_pidfd_supported()
+        if self._use_pidfd:
+            self._selector = selectors.DefaultSelector()
+            self._wakeup = os.pipe()
+            for fd in self._wakeup:
+                os.set_blocking(fd, False)
+            self._selector.register(self._wakeup[0], selectors.EVENT_READ)
+            target = self._run_pidfd
+        elif hasattr(os, 'waitid'):
+            target = self._run_waitid
+        else:
+            target = self._run_polling
+
+        self._thread = threading.Thread(
+            target=target, name='python-shell-completion')
+        self._thread.daemon = True
+        self._thread.start()
+
+    @staticmethod
+    def _is_pidfd_supported():  # -> bool
+        if not hasattr(os, 'pidfd_open'):
+            return False
+        try:
+            os.close(os.pidfd_open(os.getpid()))
+        except OSError:
+            return False  # Kernel older than 5.3
+        return True
+
+    def watch(self, popen, callback):
+        """Calls callback() once the process is completed
+
+        The process is reaped before that. callback is called from
+        the tracker thread, so it must be quick and never block.
+        """
+
+        if hasattr(popen, 'add_exit_callback'):
+            return popen.add_exit_callback(
+                lambda: _notify(popen, callback))
+
+        with self._lock:
+            self._ensure_thread()
+            if self._use_pidfd:
+                self._pending.append((popen, callback))
+                try:
+                    os.write(self._wakeup[1], b'\0')
+                except BlockingIOError:
+                    pass  # The thread is going to be woken up anyway
+                return
+
+            self._polled[popen.pid] = (popen, callback)
+            self._condition.notify()
+
+        # NOTE(albartash): The process might be reaped by someone else
+        #                  already, then waitid() never reports it.
+        if popen.poll() is not None:
+            self._notify_polled(popen.pid)
+
+    @property
+    def active(self):  # -> int
+        """Returns the number of processes being tracked"""
+
+        with self._lock:
+            if self._pid != os.getpid():
+                return 0
+            count = len(self._polled) + len(self._pending)
+            if self._selector is not None:
+                # NOTE(albartash): The wakeup pipe is registered as well.
+                count += len(self._selector.get_map()) - 1
+            return count
+
+    def _notify_polled(self, pid):
+        """Notifies about the process, unless it's been done already"""
+
+        with self._lock:
+            entry = self._polled.pop(pid, None)
+        if entry is not None:
+            _notify(*entry)
+
+    def _check_polled(self):
+        """Notifies about all completed processes checked periodically"""
+
+        with self._lock:
+            entries = list(self._polled.values())
+        for popen, _ in entries:
+            if popen.poll() is not None:
+                self._notify_polled(popen.pid)
+
+    def _register_pending(self):
+        """Adds processes passed to watch() to the selector"""
+
+        try:
+            while os.read(self._wakeup[0], 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for popen, callback in pending:
+            try:
+                fd = os.pidfd_open(popen.pid)
+            except OSError as e:
+                if e.errno == errno.ESRCH:
+                    _notify(popen, callback)  # Reaped already
+                else:
+                    # NOTE(albartash): E.g. EMFILE, when there are too many
+                    #                  open files, so it's checked later.
+                    with self._lock:
+                        self._polled[popen.pid] = (popen, callback)
+                continue
+            # NOTE(albartash): If the process was reaped before pidfd_open,
+            #                  its pid could be reused by another process,
+            #                  which the pidfd refers to then. Unreaped
+            #                  processes keep their pids, so the pidfd is
+            #                  theirs if they're not reaped after opening.
+            if popen.poll() is not None:
+                os.close(fd)
+                _notify(popen, callback)
+                continue
+            self._selector.register(fd, selectors.EVENT_READ,
+                                    (popen, callback))
+
+    def _run_pidfd(self):
+        """Waits for pidfds of processes to become readable"""
+
+        selector = self._selector
+        while True:
+            timeout = POLL_INTERVAL if self._polled else None
+            for key, _ in selector.select(timeout):
+                if key.fd == self._wakeup[0]:
+                    self._register_pending()
+                    continue
+                with self._lock:
+                    selector.unregister(key.fd)
+                os.close(key.fd)
+                _notify(*key.data)
+            if self._polled:
+                self._check_polled()
+
+    def _run_polling(self):
+        """Checks tracked processes periodically, for Python 2"""
+
+        while True:
+            with self._condition:
+                while not self._polled:
+                    self._condition.wait()
+            self._check_polled()
+            time.sleep(POLL_INTERVAL)
+
+    def _run_waitid(self):
+        """Waits for any child process and checks whether it's tracked"""
+
+        while True:
+            with self._condition:
+                while not self._polled:
+                    self._condition.wait()
+
+            try:
+                info = os.waitid(os.P_ALL, 0, os.WEXITED | os.WNOWAIT)
+            except ChildProcessError:
+                info = None  # Tracked processes are reaped by someone else
+
+            with self._lock:
+                tracked = info is not None and info.si_pid in self._polled
+            if tracked:
+                self._notify_polled(info.si_pid)
+            else:
+                # NOTE(albartash): The child is not tracked, and it stays
+                #                  reported until its owner reaps it.
+                self._check_polled()
+                time.sleep(POLL_INTERVAL)
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_completion_tracker():  # -> CompletionTracker
+    """Returns a completion tracker shared by all processes"""
+
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = CompletionTracker()
+    return _tracker
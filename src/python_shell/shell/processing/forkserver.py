@@ -0,0 +1,676 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import array
+import collections
+import errno
+import io
+import itertools
+import json
+import os
+import select
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+
+__all__ = ('ForkServer', 'ForkServerPopen', 'get_fork_server')
+
+# NOTE(albartash): The module is run as a script by the fork server process,
+#                  so it must import nothing but the standard library.
+
+_HEADER = struct.Struct('!I')  # size of a message following it
+_FD_SIZE = array.array('i').itemsize
+_SIGNALS_IGNORED = (signal.SIGINT, signal.SIGTERM, signal.SIGHUP)
+
+_clock = getattr(time, 'monotonic', time.time)
+
+_POSIX_SPAWN_SUPPORTED = (
+    hasattr(os, 'POSIX_SPAWN_DUP2') and sys.version_info >= (3, 8))
+
+# Resource usage of a process reaped by the fork server
+_Rusage = collections.namedtuple('_Rusage', (
+    'ru_utime', 'ru_stime', 'ru_maxrss', 'ru_minflt', 'ru_majflt',
+    'ru_nvcsw', 'ru_nivcsw'))
+
+
+def _receive_exactly(sock, size):  # -> Union[bytes, None]
+    """Reads size bytes from the socket, or returns None on EOF"""
+
+    chunks = []
+    while size:
+        data = sock.recv(size)
+        if not data:
+            return None
+        chunks.append(data)
+        size -= len(data)
+    return b''.join(chunks)
+
+
+def _receive(sock, max_fds=0):  # -> Union[tuple, None]
+    """Reads a message with file descriptors passed along with it
+
+    Returns a tuple (message, fds), or None when the peer has gone.
+    """
+
+    fds = array.array('i')
+    if max_fds:
+        data, ancdata, _, _ = sock.recvmsg(
+            _HEADER.size, socket.CMSG_SPACE(max_fds * _FD_SIZE))
+        for level, kind, payload in ancdata:
+            if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                size = len(payload) - len(payload) % _FD_SIZE
+                fds.frombytes(payload[:size])
+        if data and len(data) < _HEADER.size:
+            rest = _receive_exactly(sock, _HEADER.size - len(data))
+            data = data + rest if rest is not None else b''
+    else:
+        data = _receive_exactly(sock, _HEADER.size)
+    if not data:
+        return None
+
+    body = _receive_exactly(sock, _HEADER.unpack(data)[0])
+    if body is None:
+        return None
+    return json.loads(body.decode('utf-8')), list(fds)
+
+
+def _send(sock, message, fds=()):
+    """Writes a message, passing file descriptors along with it"""
+
+    body = json.dumps(message).encode('utf-8')
+    data = _HEADER.pack(len(body)) + body
+    if not fds:
+        return sock.sendall(data)
+
+    sent = sock.sendmsg([data], [(socket.SOL_SOCKET, socket.SCM_RIGHTS,
+                                  array.array('i', fds))])
+    if sent < len(data):
+        sock.sendall(data[sent:])
+
+
+def _exec_child(request, fds, error_pipe):
+    """Runs the requested program in the forked child of the server"""
+
+    try:
+        for number in _SIGNALS_IGNORED + (signal.SIGCHLD,):
+            signal.signal(number, signal.SIG_DFL)
+        signal.set_wakeup_fd(-1)
+        if request['process_group']:
+            os.setpgid(0, 0)
+
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+        for fd in set(fds):
+            if fd > 2:
+                os.close(fd)
+
+        if request['cwd'] is not None:
+            os.chdir(request['cwd'])
+        if request['executable'] is not None:
+            os.execve(request['executable'], request['argv'],
+                      request['env'])
+        os.execvpe(request['argv'][0], request['argv'], request['env'])
+    except BaseException as e:
+        report = {'errno': getattr(e, 'errno', None) or 0,
+                  'message': getattr(e, 'strerror', None) or str(e)}
+        os.write(error_pipe, json.dumps(report).encode('utf-8'))
+    finally:
+        os._exit(255)
+
+
+def _find_program(name, env):  # -> str
+    """Returns path of the program, searching it in PATH of env"""
+
+    if os.sep in name:
+        return name
+    for folder in env.get('PATH', os.defpath).split(os.pathsep):
+        path = os.path.join(folder or os.curdir, name)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    raise OSError(errno.ENOENT, os.strerror(errno.ENOENT))
+
+
+def _posix_spawn_child(request, fds):  # -> dict
+    """Executes the requested program with posix_spawn, returns a reply"""
+
+    try:
+        actions = []
+        for target, fd in enumerate(fds):
+            os.set_inheritable(fd, False)
+            actions.append((os.POSIX_SPAWN_DUP2, fd, target))
+
+        env = request['env']
+        options = {'setpgroup': 0} if request['process_group'] else {}
+        pid = os.posix_spawn(
+            request['executable'] or _find_program(request['argv'][0], env),
+            request['argv'], env, file_actions=actions,
+            setsigdef=_SIGNALS_IGNORED, **options)
+    except OSError as e:
+        return {'id': request['id'], 'errno': e.errno or 0,
+                'message': e.strerror or str(e)}
+    finally:
+        for fd in set(fds):
+            os.close(fd)
+    return {'id': request['id'], 'pid': pid}
+
+
+def _is_current_directory(path):  # -> bool
+    """Returns whether path is the current directory of the server"""
+
+    try:
+        return path == os.getcwd()
+    except OSError:
+        return False  # The directory is removed
+
+
+def _spawn_child(request, fds):  # -> dict
+    """Forks and executes the requested program, returns a reply"""
+
+    # NOTE(albartash): posix_spawn is twice as fast as os.fork(),
+    #                  which runs Python code before exec. But os has
+    #                  no file action for changing directory, and the
+    #                  server must keep its own one, so processes run
+    #                  in other directories are forked.
+    if _POSIX_SPAWN_SUPPORTED and _is_current_directory(request['cwd']):
+        return _posix_spawn_child(request, fds)
+
+    error_read, error_write = os.pipe()  # closed on exec
+    try:
+        pid = os.fork()
+        if not pid:
+            os.close(error_read)
+            _exec_child(request, fds, error_write)
+    finally:
+        os.close(error_write)
+        for fd in set(fds):
+            os.close(fd)
+
+    with io.open(error_read, 'rb') as pipe:
+        report = pipe.read()
+    if not report:
+        return {'id': request['id'], 'pid': pid}
+
+    os.waitpid(pid, 0)
+    reply = json.loads(report.decode('utf-8'))
+    reply['id'] = request['id']
+    return reply
+
+
+def _reap_children(sock):
+    """Reports exit status of all completed children"""
+
+    while True:
+        try:
+            pid, status, rusage = os.wait4(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if not pid:
+            return
+        _send(sock, {
+            'pid': pid,
+            'status': status,
+            'rusage': [getattr(rusage, name) for name in _Rusage._fields]
+        })
+
+
+def serve(fd):
+    """Runs the fork server on the connected socket fd
+
+    Every request spawns a process, and the server replies with its pid
+    (or errno of the failure). Exit status and resource usage of every
+    process are reported when it's reaped. The server exits when
+    the other end of the socket is closed.
+    """
+
+    # NOTE(albartash): The server shares the process group with its parent,
+    #                  so it must survive signals sent from the terminal.
+    #                  Children get the default handlers back.
+    for number in _SIGNALS_IGNORED:
+        signal.signal(number, signal.SIG_IGN)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM, fileno=fd)
+    sock.set_inheritable(False)
+
+    wakeup_read, wakeup_write = os.pipe()
+    for pipe in (wakeup_read, wakeup_write):
+        os.set_blocking(pipe, False)
+    signal.set_wakeup_fd(wakeup_write)
+    signal.signal(signal.SIGCHLD, lambda number, frame: None)
+
+    while True:
+        readable, _, _ = select.select([sock, wakeup_read], [], [])
+        if wakeup_read in readable:
+            try:
+                while os.read(wakeup_read, 1024):
+                    pass
+            except BlockingIOError:
+                pass
+            _reap_children(sock)
+
+        if sock in readable:
+            received = _receive(sock, max_fds=3)
+            if received is None:
+                return
+            request, fds = received
+            _send(sock, _spawn_child(request, fds))
+
+
+def _to_returncode(status):  # -> int
+    """Converts wait status into a return code, like Popen does"""
+
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _call_all(callbacks):
+    """Calls callbacks, so a failed one doesn't affect the others"""
+
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception:
+            pass
+
+
+class ForkServer(object):
+    """Client of a helper process spawning processes on its behalf
+
+    The helper is a tiny Python process started once, so spawning doesn't
+    cost forking the current process, no matter how large it is. Requests
+    are sent over a Unix socket, with standard streams of the process
+    passed as file descriptors (SCM_RIGHTS). Processes are children
+    of the helper, which reports their exit status back.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()  # guards starting and sending
+        self._condition = threading.Condition()  # guards replies and exits
+        self._sequence = itertools.count()
+        self._socket = None
+        self._server = None  # Popen of the helper process
+        self._pid = None
+        self._connected = False
+        self._replies = {}  # request id -> reply
+        self._exits = {}  # pid -> (status, rusage, reaped_at)
+        self._callbacks = {}  # pid -> callbacks called when it's reaped
+
+    @property
+    def pid(self):  # -> Union[int, None]
+        """Returns pid of the helper process, if it's started"""
+
+        if self._pid != os.getpid() or self._server is None:
+            return None
+        return self._server.pid
+
+    def start(self):
+        """Starts the helper process, unless it's running already
+
+        The helper is started on the first spawn, but it's cheaper
+        to start it early, before the current process grows.
+        """
+
+        with self._lock:
+            self._ensure_started()
+
+    def close(self):
+        """Stops the helper process
+
+        Processes spawned by it keep running, but they're not reported
+        anymore. A new helper is started on the next spawn.
+        """
+
+        with self._lock:
+            if self._socket is None or self._pid != os.getpid():
+                return
+            # NOTE(albartash): Shutting down wakes up the thread reading
+            #                  the socket, and the helper exits on EOF.
+            try:
+                self._socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._socket.close()
+            self._socket = self._server = None
+            with self._condition:
+                self._connected = False
+                self._condition.notify_all()
+
+    def _ensure_started(self):
+        """Starts the helper and the thread reading its messages"""
+
+        # NOTE(albartash): The socket is shared with the parent after fork,
+        #                  so the child process needs its own helper.
+        if self._pid != os.getpid():
+            if self._socket is not None:
+                self._socket.close()
+            self._socket = self._server = None
+            self._connected = False
+            self._replies = {}
+            self._exits = {}
+            self._callbacks = {}
+            self._pid = os.getpid()
+
+        if self._connected:
+            return
+        if self._socket is not None:
+            self._socket.close()  # The helper has exited
+            self._socket = None
+
+        client, server = socket.socketpair(socket.AF_UNIX,
+                                           socket.SOCK_STREAM)
+        try:
+            self._server = subprocess.Popen(
+                [sys.executable, '-I', '-S', os.path.abspath(__file__),
+                 str(server.fileno())],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                pass_fds=(server.fileno(),)
+            )
+        except BaseException:
+            client.close()
+            raise
+        finally:
+            server.close()
+
+        self._socket = client
+        self._connected = True
+        thread = threading.Thread(target=self._read,
+                                  args=(client, self._server),
+                                  name='python-shell-fork-server')
+        thread.daemon = True
+        thread.start()
+
+    def _read(self, sock, server):
+        """Receives replies and exit statuses sent by the helper
+
+        server is Popen of the helper, which is reaped once it exits.
+        """
+
+        try:
+            while True:
+                received = _receive(sock)
+                if received is None:
+                    break
+                message = received[0]
+                callbacks = ()
+                with self._condition:
+                    if 'id' in message:
+                        self._replies[message['id']] = message
+                    else:
+                        self._exits[message['pid']] = (
+                            message['status'], _Rusage(*message['rusage']),
+                            _clock())
+                        callbacks = self._callbacks.pop(message['pid'], ())
+                    self._condition.notify_all()
+                _call_all(callbacks)
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self._condition:
+                if self._socket is sock:
+                    self._connected = False
+                callbacks, self._callbacks = self._callbacks, {}
+                self._condition.notify_all()
+            # NOTE(albartash): Processes are not going to be reported,
+            #                  and waiting for them raises an error.
+            for pid_callbacks in callbacks.values():
+                _call_all(pid_callbacks)
+            server.wait()
+
+    def spawn(self, argv, executable=None, env=None, cwd=None,
+              fds=(0, 1, 2), process_group=False):  # -> int
+        """Spawns a process and returns its pid
+
+        fds are descriptors for stdin, stdout and stderr of the process.
+        With process_group=True, the process leads a new process group.
+        env and cwd default to the ones of the current process.
+        Raises OSError if the program can't be executed.
+        """
+
+        if env is None:
+            env = dict(os.environ)
+        else:
+            env = dict((os.fsdecode(key), os.fsdecode(value))
+                       for key, value in env.items())
+        request = {
+            'id': next(self._sequence),
+            'argv': [os.fsdecode(arg) for arg in argv],
+            'executable': (os.fsdecode(executable)
+                           if executable is not None else None),
+            'env': env,
+            'cwd': os.path.abspath(os.fsdecode(cwd) if cwd is not None
+                                   else os.curdir),
+            'process_group': bool(process_group),
+        }
+
+        with self._lock:
+            self._ensure_started()
+            try:
+                _send(self._socket, request, fds)
+            except (BrokenPipeError, ConnectionResetError):
+                raise OSError(errno.EPIPE, "Fork server has exited")
+
+        with self._condition:
+            while request['id'] not in self._replies:
+                if not self._connected:
+                    raise OSError(errno.EPIPE, "Fork server has exited")
+                self._condition.wait()
+            reply = self._replies.pop(request['id'])
+
+        if 'pid' not in reply:
+            raise OSError(reply['errno'], reply['message'])
+        return reply['pid']
+
+    def wait(self, pid, timeout=None):  # -> Union[tuple, None]
+        """Waits for the process to be reaped
+
+        Returns a tuple (status, rusage, reaped_at), or None if the process
+        is still running in timeout seconds. The status is kept until
+        release() is called.
+        """
+
+        deadline = None if timeout is None else _clock() + timeout
+        with self._condition:
+            while pid not in self._exits:
+                if not self._connected:
+                    raise OSError(errno.ECHILD, "Fork server has exited")
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - _clock()
+                    if remaining <= 0:
+                        return None
+                self._condition.wait(remaining)
+            return self._exits[pid]
+
+    def add_exit_callback(self, pid, callback):
+        """Calls callback() when the process is reaped
+
+        It's called from the thread receiving messages of the helper,
+        or immediately, if the process is reaped already.
+        """
+
+        with self._condition:
+            if pid not in self._exits and self._connected:
+                self._callbacks.setdefault(pid, []).append(callback)
+                return
+        callback()
+
+    def release(self, pid):
+        """Forgets exit status of the reaped process"""
+
+        with self._condition:
+            self._exits.pop(pid, None)
+
+
+_fork_server = None
+_fork_server_lock = threading.Lock()
+
+
+def get_fork_server():  # -> ForkServer
+    """Returns a fork server shared by all processes"""
+
+    global _fork_server
+    if _fork_server is None:
+        with _fork_server_lock:
+            if _fork_server is None:
+                _fork_server = ForkServer()
+    return _fork_server
+
+
+def _open_devnull(flags):  # -> int
+    return os.open(os.devnull, flags | getattr(os, 'O_CLOEXEC', 0))
+
+
+class ForkServerPopen(object):
+    """Popen-like wrapper for a process spawned by the fork server
+
+    It takes the same stdin, stdout and stderr values as Popen does,
+    and supports the part of its interface used by processes.
+    """
+
+    stdin = None
+    stdout = None
+    stderr = None
+    returncode = None
+    rusage = None  # resource usage, when process is reaped
+    reaped_at = None  # time when process is reaped
+
+    def __init__(self, args, executable=None, stdin=None, stdout=None,
+                 stderr=None, cwd=None, env=None, process_group=None,
+                 server=None):
+        self.args = args
+        self._server = server or get_fork_server()
+        self._wait_lock = threading.Lock()
+
+        fds = [0, 1, 2]
+        to_close = []  # descriptors which belong to the child only
+        try:
+            for number, (value, mode) in enumerate(
+                    ((stdin, 'wb'), (stdout, 'rb'), (stderr, 'rb'))):
+                if value is None:
+                    continue
+                if value == subprocess.PIPE:
+                    read_fd, write_fd = os.pipe()
+                    if mode == 'wb':
+                        fds[number], parent_fd = read_fd, write_fd
+                    else:
+                        fds[number], parent_fd = write_fd, read_fd
+                    to_close.append(fds[number])
+                    setattr(self, ('stdin', 'stdout', 'stderr')[number],
+                            io.open(parent_fd, mode))
+                elif value == subprocess.DEVNULL:
+                    fds[number] = _open_devnull(
+                        os.O_RDONLY if mode == 'wb' else os.O_WRONLY)
+                    to_close.append(fds[number])
+                elif value == subprocess.STDOUT and number == 2:
+                    fds[number] = fds[1]
+                elif isinstance(value, int):
+                    fds[number] = value
+                else:
+                    fds[number] = value.fileno()
+
+            self.pid = self._server.spawn(
+                args, executable=executable, env=env, cwd=cwd, fds=fds,
+                process_group=process_group == 0)
+        except BaseException:
+            for stream in (self.stdin, self.stdout, self.stderr):
+                if stream is not None:
+                    stream.close()
+            raise
+        finally:
+            for fd in to_close:
+                os.close(fd)
+
+    def _handle_exit(self, entry):
+        status, self.rusage, self.reaped_at = entry
+        self.returncode = _to_returncode(status)
+        self._server.release(self.pid)
+
+    def poll(self):  # -> Union[int, None]
+        """Returns return code, if the process is completed"""
+
+        if self.returncode is None and self._wait_lock.acquire(False):
+            try:
+                if self.returncode is None:
+                    entry = self._server.wait(self.pid, 0)
+                    if entry is not None:
+                        self._handle_exit(entry)
+            finally:
+                self._wait_lock.release()
+        return self.returncode
+
+    def wait(self, timeout=None):  # -> int
+        """Waits for the process to complete and returns its return code
+
+        Raises TimeoutExpired if it's still running in timeout seconds.
+        """
+
+        if self.returncode is not None:
+            return self.returncode
+
+        deadline = None if timeout is None else _clock() + timeout
+        if not self._wait_lock.acquire(
+                True, -1 if timeout is None else timeout):
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        try:
+            if self.returncode is None:
+                remaining = None
+                if deadline is not None:
+                    remaining = max(deadline - _clock(), 0)
+                entry = self._server.wait(self.pid, remaining)
+                if entry is None:
+                    raise subprocess.TimeoutExpired(self.args, timeout)
+                self._handle_exit(entry)
+        finally:
+            self._wait_lock.release()
+        return self.returncode
+
+    def add_exit_callback(self, callback):
+        """Calls callback() when the process is reaped by the server"""
+
+        if self.returncode is not None:
+            return callback()
+        self._server.add_exit_callback(self.pid, callback)
+
+    def send_signal(self, number):
+        """Sends the signal to the process, unless it's completed"""
+
+        if self.poll() is None:
+            os.kill(self.pid, number)
+
+    def terminate(self):
+        """Sends SIGTERM to the process"""
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        """Sends SIGKILL to the process"""
+        self.send_signal(signal.SIGKILL)
+
+
+if __name__ == '__main__':
+    serve(int(sys.argv[1]))
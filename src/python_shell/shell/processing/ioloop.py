@@ -0,0 +1,206 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os
+import threading
+
+from python_shell.util.version import is_python2_running
+
+from .capture import READ_SIZE
+
+if not is_python2_running():
+    import selectors
+
+
+__all__ = ('IOLoop', 'get_io_loop')
+
+
+def _close_quietly(stream):
+    try:
+        stream.close()
+    except (IOError, OSError):
+        pass
+
+
+class IOLoop(object):
+    """Reads output of processes running in background in a single thread
+
+    Every registered stream is read until EOF, and its data is passed
+    to a sink, so hundreds of processes with consumers attached to their
+    output don't need a thread per stream. Sinks are supposed to be quick
+    and must never block, as they hold up all the other streams.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._selector = None
+        self._wakeup = None  # pipe (read fd, write fd) interrupting select
+        self._pending = []  # streams to be registered by the thread
+
+    def _ensure_thread(self):
+        """Starts the thread, unless it's running in the current process"""
+
+        # NOTE(albartash): Threads don't survive fork, so the child process
+        #                  needs its own thread and selector.
+        if self._pid != os.getpid():
+            self._pending = []
+            self._thread = None
+            self._pid = os.getpid()
+
+        if self._thread is None:
+            self._selector = selectors.DefaultSelector()
+            self._wakeup = os.pipe()
+            for fd in self._wakeup:
+                os.set_blocking(fd, False)
+            self._selector.register(self._wakeup[0], selectors.EVENT_READ)
+            self._thread = threading.Thread(
+                target=self._run, name='python-shell-io')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def register(self, stream, sink, on_close=None):
+        """Reads stream in background, passing its data to sink
+
+        sink.write() is called with every chunk of data, then sink.close()
+        and on_close() are called at EOF. The stream is closed after that.
+        """
+
+        if is_python2_running():
+            # NOTE(albartash): Python 2 has no selectors, so every stream
+            #                  gets its own thread.
+            thread = threading.Thread(
+                target=self._pump, args=(stream, sink, on_close),
+                name='python-shell-io')
+            thread.daemon = True
+            thread.start()
+            return
+
+        with self._lock:
+            self._ensure_thread()
+            self._pending.append((stream, sink, on_close))
+            try:
+                os.write(self._wakeup[1], b'\0')
+            except BlockingIOError:
+                pass  # The thread is going to be woken up anyway
+
+    @property
+    def active(self):  # -> int
+        """Returns the number of streams being read"""
+
+        with self._lock:
+            if self._selector is None or self._pid != os.getpid():
+                return 0
+            # NOTE(albartash): The wakeup pipe is registered as well.
+            registered = len(self._selector.get_map()) - 1
+            return registered + len(self._pending)
+
+    @staticmethod
+    def _finish(stream, sink, on_close):
+        """Notifies sink and caller that the stream is finished"""
+
+        _close_quietly(stream)
+        try:
+            sink.close()
+        finally:
+            if on_close is not None:
+                on_close()
+
+    @classmethod
+    def _pump(cls, stream, sink, on_close):
+        """Reads a single stream until EOF, for Python 2"""
+
+        try:
+            while True:
+                data = os.read(stream.fileno(), READ_SIZE)
+                if not data:
+                    break
+                sink.write(data)
+        except (IOError, OSError):
+            pass
+        finally:
+            cls._finish(stream, sink, on_close)
+
+    def _register_pending(self):
+        """Adds streams passed to register() to the selector"""
+
+        try:
+            while os.read(self._wakeup[0], READ_SIZE):
+                pass
+        except BlockingIOError:
+            pass
+
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for stream, sink, on_close in pending:
+            self._selector.register(stream, selectors.EVENT_READ,
+                                    (sink, on_close))
+
+    def _read(self, key):
+        """Passes available data of the stream to its sink"""
+
+        sink, on_close = key.data
+        try:
+            data = os.read(key.fd, READ_SIZE)
+        except OSError:
+            data = b''
+        if data:
+            sink.write(data)
+            return
+
+        with self._lock:
+            self._selector.unregister(key.fileobj)
+        self._finish(key.fileobj, sink, on_close)
+
+    def _run(self):
+        """Reads registered streams until they're finished"""
+
+        selector = self._selector
+        while True:
+            for key, _ in selector.select():
+                if key.fd == self._wakeup[0]:
+                    self._register_pending()
+                    continue
+                try:
+                    self._read(key)
+                except Exception:
+                    # NOTE(albartash): A failed sink must not stop reading
+                    #                  other streams.
+                    pass
+
+
+_io_loop = None
+_io_loop_lock = threading.Lock()
+
+
+def get_io_loop():  # -> IOLoop
+    """Returns an IO loop shared by all processes"""
+
+    global _io_loop
+    if _io_loop is None:
+        with _io_loop_lock:
+            if _io_loop is None:
+                _io_loop = IOLoop()
+    return _io_loop
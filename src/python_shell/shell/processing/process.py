@@ -23,21 +23,57 @@ THE SOFTWARE.
 """
 
 import abc
+import atexit
+import io
+import itertools
 import os
+import signal
 import subprocess
+import sys
+import threading
+import time
+import weakref
 
+import six
 from six import with_metaclass
 
 from python_shell.exceptions import RunProcessError
 from python_shell.exceptions import UndefinedProcess
+from python_shell.shell.processing.capture import communicate
+from python_shell.shell.processing.capture import feed_input
+from python_shell.shell.processing.capture import get_tail
+from python_shell.shell.processing.capture import IdleTimeoutExpired
+from python_shell.shell.processing.capture import iter_communicate
+from python_shell.shell.processing.capture import OutputBuffer
+from python_shell.shell.processing.capture import READ_SIZE
+from python_shell.shell.processing.capture import RingBuffer
+from python_shell.shell.processing.capture import SpillBuffer
+from python_shell.shell.processing.children import close_pipes
+from python_shell.shell.processing.children import get_child_registry
+from python_shell.shell.processing.children import has_inheritable_fds
+from python_shell.shell.processing.completion import get_completion_tracker
 from python_shell.shell.processing.interfaces import IProcess
+from python_shell.shell.processing.ioloop import get_io_loop
+from python_shell.shell.processing.tee import make_consumers
+from python_shell.shell.processing.tee import Tee
+from python_shell.shell.processing.usage import ResourceUsage
+from python_shell.shell.processing.watchdog import get_watchdog
+from python_shell.util import hooks
 from python_shell.util.version import is_python2_running
 
 
-__all__ = ('Subprocess', 'Process', 'SyncProcess', 'AsyncProcess')
+__all__ = ('Subprocess', 'Process', 'SyncProcess', 'AsyncProcess',
+           'CompletedProcess', 'Append')
 
 
 _PIPE = subprocess.PIPE
+_STDOUT = subprocess.STDOUT
+
+# Strategies of spawning processes
+SPAWN_AUTO = 'auto'  # subprocess defaults (vfork, when Python supports it)
+SPAWN_POSIX = 'posix_spawn'  # os.posix_spawn, when options and fds allow it
+SPAWN_FORK = 'fork'  # classic fork/exec
+SPAWN_SERVER = 'forkserver'  # fork/exec by a helper process
 
 if is_python2_running():
     class _CalledProcessError(OSError):
@@ -58,38 +94,362 @@ if is_python2_running():
             return "Command '%s' returned non-zero exit status %d." % (
                 self.cmd, self.returncode)
 
+    class _TimeoutExpired(Exception):
+        """A stub for Python 2, where process timeouts are not supported"""
+
 else:
     _CalledProcessError = subprocess.CalledProcessError
+    _TimeoutExpired = subprocess.TimeoutExpired
+
+
+_clock = getattr(time, 'monotonic', time.time)
+_done_lock = threading.Lock()  # guards callbacks of completed processes
+_collected_processes = set()  # weak references to processes with children
+
+
+if hasattr(os, 'wait4') and not is_python2_running():
+    class _Popen(subprocess.Popen):
+        """Popen which reaps the process with wait4()
+
+        wait4() is used instead of waitpid(), so resource usage of
+        the process is collected for free. Like ForkServerPopen, it
+        overrides poll() and wait() and sets returncode itself.
+        """
+
+        rusage = None  # resource.struct_rusage, when process is reaped
+        reaped_at = None  # time when process is reaped
+
+        def __init__(self, *args, **kwargs):
+            self._wait_lock = threading.Lock()
+            super(_Popen, self).__init__(*args, **kwargs)
+
+        def _wait4(self, options):
+            """Reaps the process, unless options has WNOHANG and it runs"""
+
+            try:
+                pid, status, rusage = os.wait4(self.pid, options)
+            except ChildProcessError:
+                # NOTE(albartash): The process is reaped by someone else,
+                #                  so its status is lost, like in Popen.
+                pid, status, rusage = self.pid, 0, None
+            if pid:
+                self.rusage = rusage
+                self.reaped_at = _clock()
+                if os.WIFSIGNALED(status):
+                    self.returncode = -os.WTERMSIG(status)
+                else:
+                    self.returncode = os.WEXITSTATUS(status)
+
+        def poll(self):  # -> Union[int, None]
+            """Returns return code, if the process is completed"""
+
+            if self.returncode is None and self._wait_lock.acquire(False):
+                try:
+                    if self.returncode is None:
+                        self._wait4(os.WNOHANG)
+                finally:
+                    self._wait_lock.release()
+            return self.returncode
+
+        def wait(self, timeout=None):  # -> int
+            """Waits for the process to complete and returns its return code
+
+            Raises TimeoutExpired if it's still running in timeout seconds.
+            """
+
+            if timeout is None:
+                with self._wait_lock:
+                    if self.returncode is None:
+                        self._wait4(0)
+                return self.returncode
+
+            deadline = _clock() + timeout
+            delay = 0.0005
+            while self.poll() is None:
+                remaining = deadline - _clock()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(self.args, timeout)
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, 0.05)
+            return self.returncode
+
+else:
+    _Popen = subprocess.Popen
 
 
 class StreamIterator(object):
-    """A wrapper for retrieving data from subprocess streams"""
+    """A wrapper for retrieving data from subprocess streams
+
+    Data is read by large blocks, which are split into lines at once,
+    so iterating over lines doesn't cost a read call per line.
+    """
+
+    READ_SIZE = 64 * 1024  # default size of a block read at once
 
-    def __init__(self, stream=None):
+    def __init__(self, stream=None, read_size=None, close_at_eof=False,
+                 owner=None):
         """Initialize object with passed stream.
 
         If stream is None, that means process is undefined,
-        and iterator will just raise StopIteration.
+        and iterator will just raise StopIteration. With close_at_eof=True,
+        the stream is closed as soon as it's read to the end.
         """
 
         self._stream = stream
+        self._close_at_eof = close_at_eof
+        # NOTE(albartash): The process must not be garbage collected while
+        #                  its pipe is being read, otherwise its output
+        #                  would be discarded as abandoned one.
+        self._owner = owner
+        self._read_size = read_size or self.READ_SIZE
+        self._lines = []  # complete lines of the last read block
+        self._index = 0  # index of the next line to be returned
+        self._partial = []  # pieces of incomplete line at the end of data
+        self._eof = not stream
 
     def __iter__(self):
-        return self
+        return self._iter_lines()
+
+    def _iter_lines(self):
+        """Yields lines, which is cheaper than calling __next__ per line"""
+
+        while True:
+            lines = self._lines
+            for line in itertools.islice(lines, self._index, None):
+                self._index += 1
+                yield line
+            if not self._fill():
+                return
+
+    def _read(self, size):  # -> bytes
+        """Reads a block of at most size bytes from the stream
+
+        Returns as much data as available without waiting for more,
+        so output of running processes is not delayed.
+        """
+
+        if self._eof:
+            return b''
+        if self._close_at_eof and self._stream.closed:
+            # NOTE(albartash): The pipe has been read to the end by another
+            #                  iterator, or closed with the process.
+            self._eof = True
+            return b''
+        read = getattr(self._stream, 'read1', self._stream.read)
+        data = read(size)
+        if not data:
+            self._eof = True
+            if self._close_at_eof:
+                self._stream.close()
+        return data
+
+    def _fill(self):  # -> bool
+        """Reads lines of the next block, returns False on EOF"""
+
+        while True:
+            data = self._read(self._read_size)
+            if not data:
+                line = b''.join(self._partial)
+                self._lines = [line] if line else []
+                self._partial = []
+                self._index = 0
+                return bool(self._lines)
+
+            # NOTE(albartash): Pieces of a long line are joined only once
+            #                  its end is read, so they're not copied again
+            #                  for every block.
+            self._partial.append(data)
+            if b'\n' not in data:
+                continue
+
+            # NOTE(albartash): BytesIO.readlines() splits by b"\n" only
+            #                  and keeps line endings, like readline() does.
+            lines = io.BytesIO(b''.join(self._partial)).readlines()
+            self._partial = [] if lines[-1].endswith(b'\n') else [lines.pop()]
+            self._lines = lines
+            self._index = 0
+            return True
+
+    def _pop_pending(self):  # -> bytes
+        """Returns all data already read but not returned yet"""
+
+        pending = b''.join(self._lines[self._index:] + self._partial)
+        self._lines = []
+        self._index = 0
+        self._partial = []
+        return pending
 
     def __next__(self):
         """Returns next available line from passed stream"""
 
-        if not self._stream:
-            raise StopIteration
-
-        line = self._stream.readline()
-        if line:
-            return line
-        raise StopIteration
+        try:
+            line = self._lines[self._index]
+        except IndexError:
+            if not self._fill():
+                raise StopIteration
+            line = self._lines[0]
+        self._index += 1
+        return line
 
     next = __next__
 
+    def iter_chunks(self, size=None):
+        """Yields raw chunks of data of at most size bytes
+
+        Chunk boundaries don't match line boundaries.
+        """
+
+        if size is None:
+            size = self._read_size
+        if size <= 0:
+            raise ValueError("Size of chunks must be positive")
+        return self._iter_chunks(size)
+
+    def _iter_chunks(self, size):
+        pending = self._pop_pending()
+        for start in range(0, len(pending), size):
+            yield pending[start:start + size]
+
+        while True:
+            data = self._read(size)
+            if not data:
+                return
+            yield data
+
+    def iter_batches(self, n_lines):
+        """Yields lists of at most n_lines lines
+
+        It allows consumers to amortise per-line work.
+        """
+
+        if n_lines <= 0:
+            raise ValueError("Number of lines in batches must be positive")
+        return self._iter_batches(n_lines)
+
+    def _iter_batches(self, n_lines):
+        batch = []
+        while True:
+            if self._index >= len(self._lines) and not self._fill():
+                break
+            count = n_lines - len(batch)
+            batch.extend(self._lines[self._index:self._index + count])
+            self._index += count
+            if len(batch) >= n_lines:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+
+def _iter_file(stream):
+    """Yields blocks of data read from a file-like object"""
+
+    while True:
+        data = stream.read(READ_SIZE)
+        if not data:
+            return
+        yield data
+
+
+def _make_input(value):  # -> tuple
+    """Converts value of input option into a tuple (stdin, chunks)
+
+    stdin is passed to the spawned process, and chunks is an iterable
+    of data to be written into it, or None. Files and descriptors
+    are passed to the process as is, so their data never passes
+    through Python. Without input, stdin is /dev/null.
+    """
+
+    if value is None:
+        return Subprocess.DEVNULL, None
+    if isinstance(value, (bytes, bytearray, memoryview, six.text_type)):
+        return _PIPE, (value,)
+    if isinstance(value, six.integer_types):
+        return value, None
+
+    fileno = getattr(value, 'fileno', None)
+    if fileno is not None:
+        try:
+            fileno()
+        except (IOError, OSError, ValueError):
+            pass  # In-memory files, like io.BytesIO
+        else:
+            return value, None
+
+    if hasattr(value, 'read'):
+        return _PIPE, _iter_file(value)
+    if hasattr(value, '__aiter__'):
+        return _PIPE, value  # Supported by AsyncioProcess only
+    return _PIPE, iter(value)
+
+
+class Append(object):
+    """Path of a file the output is appended to, like ">>" does in Bash
+
+        Shell.date(stdout=Append('dates.log'))
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __repr__(self):
+        return 'Append({!r})'.format(self.path)
+
+
+def _is_path(value):  # -> bool
+    return isinstance(value, (six.string_types, bytes)) or \
+        hasattr(value, '__fspath__')
+
+
+def _open_output(value):  # -> tuple
+    """Converts value of stdout or stderr option into a tuple
+    (target, descriptor), where target is passed to the spawned process,
+    and descriptor is opened here and must be closed after spawning
+
+    Paths are opened for writing (truncated, unless wrapped in Append),
+    so the process writes into the file itself.
+    """
+
+    if isinstance(value, Append):
+        path, flags = value.path, os.O_APPEND
+    elif _is_path(value):
+        path, flags = value, os.O_TRUNC
+    else:
+        # NOTE(albartash): Data written into the file object by Python
+        #                  must precede output of the process.
+        flush = getattr(value, 'flush', None)
+        if flush is not None:
+            flush()
+        return value, None
+
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | flags, 0o666)
+    return descriptor, descriptor
+
+
+def get_tail_size(options):  # -> int
+    """Returns size of output tails kept for diagnostics
+    by a process with passed options"""
+    return options.get('tail_size', Subprocess.tail_size) or 0
+
+
+def make_output_buffer(options, name):  # -> OutputBuffer
+    """Returns a storage for captured output of the stream
+    of a process with passed options
+
+    With spill_threshold option, output larger than the threshold
+    (in bytes) is moved to a temporary file. With capture_stderr=False,
+    only the tail of stderr is kept.
+    """
+
+    if name == 'stderr' and not options.get('capture_stderr', True):
+        return RingBuffer(get_tail_size(options))
+
+    threshold = options.get('spill_threshold', Subprocess.spill_threshold)
+    if threshold is None:
+        return OutputBuffer()
+    return SpillBuffer(threshold)
+
 
 class Process(IProcess):
     """A wrapper for process
@@ -102,6 +462,23 @@ class Process(IProcess):
     _process = None  # process instance
     _args = None
     _kwargs = None
+    _stdout_buffer = None  # captured stdout, when process is completed
+    _stderr_buffer = None  # captured stderr, when process is completed
+    _process_group = False  # whether process leads its own process group
+    _deadline = None  # handle of the watchdog callback enforcing timeout
+    _timed_out = False
+    _started_at = None  # time when process is spawned
+    _resource_usage = None
+    _arguments = None  # argv of the spawned process
+    _input_chunks = None  # iterable of data to be written into stdin
+    _opened_descriptors = ()  # files opened for redirecting output
+    _exit_emitted = False
+    _tees = ()  # Tee instances passing output to consumers
+    _output_done = None  # event set when IO loop has read all output
+    _done_callbacks = None  # callbacks called when process is completed
+    _done = False  # whether the callbacks have been called
+    _exited = False  # whether the tracker has reported the exit
+    _uses_event_loop = False  # whether it's completed by asyncio loop
 
     PROCESS_IS_TERMINATED_CODE = -15
 
@@ -110,22 +487,86 @@ class Process(IProcess):
         self._args = args
         self._kwargs = kwargs
 
+    def _wait_output(self):
+        """Waits until output of the process is read by IO loop"""
+
+        if self._output_done is not None:
+            self._output_done.wait()
+
     @property
     def stderr(self):
         """Returns stderr output of process"""
 
+        self._wait_output()
+        if self._stderr_buffer is not None:
+            return StreamIterator(stream=self._stderr_buffer.open())
         return StreamIterator(
-            stream=self._process and self._process.stderr or None
+            stream=self._process and self._process.stderr or None,
+            close_at_eof=True,
+            owner=self
         )
 
     @property
     def stdout(self):
         """Returns stdout output of process"""
 
+        self._wait_output()
+        if self._stdout_buffer is not None:
+            return StreamIterator(stream=self._stdout_buffer.open())
         return StreamIterator(
-            stream=self._process and self._process.stdout or None
+            stream=self._process and self._process.stdout or None,
+            close_at_eof=True,
+            owner=self
         )
 
+    @property
+    def stdout_view(self):
+        """Returns captured stdout as a buffer, without copying it
+
+        For output spilled to disk, it's a read-only mmap.
+        If stdout has not been captured, it returns None.
+        """
+
+        if self._stdout_buffer is None:
+            return None
+        return self._stdout_buffer.view()
+
+    @property
+    def stderr_view(self):
+        """Returns captured stderr as a buffer, without copying it
+
+        For output spilled to disk, it's a read-only mmap.
+        If stderr has not been captured, it returns None.
+        """
+
+        if self._stderr_buffer is None:
+            return None
+        return self._stderr_buffer.view()
+
+    def get_output(self, limit=None):  # -> Union[tuple, None]
+        """Returns a tuple (stdout, stderr) of captured output as bytes
+
+        If output has not been captured, or it's larger than limit bytes
+        in total, it returns None. Stderr merged into stdout is empty.
+        """
+
+        buffers = [self._stdout_buffer, self._stderr_buffer]
+        if buffers[1] is None and self._kwargs.get('stderr') == _STDOUT:
+            buffers[1] = OutputBuffer()
+        if None in buffers:
+            return None
+        if limit is not None and sum(b.size for b in buffers) > limit:
+            return None
+        return tuple(buffer.getvalue() for buffer in buffers)
+
+    def release(self):
+        """Releases captured output, including temporary files"""
+
+        for buffer in (self._stdout_buffer, self._stderr_buffer):
+            if buffer is not None:
+                buffer.release()
+        self._stdout_buffer = self._stderr_buffer = None
+
     @property
     def returncode(self):  # -> Union[int, None]
         """Returns returncode of process
@@ -159,6 +600,26 @@ class Process(IProcess):
             return self.returncode == self.PROCESS_IS_TERMINATED_CODE
         return None
 
+    @property
+    def resource_usage(self):  # -> Union[ResourceUsage, None]
+        """Returns resources used by the completed process
+
+        For running or undefined process, or if the usage can't be
+        collected on this platform, it returns None.
+        """
+
+        if self._resource_usage is None and self._process:
+            rusage = getattr(self._process, 'rusage', None)
+            if rusage is not None:
+                self._resource_usage = ResourceUsage.from_rusage(
+                    rusage, self._process.reaped_at - self._started_at)
+        return self._resource_usage
+
+    @property
+    def is_timed_out(self):  # -> bool
+        """Returns whether process has been stopped because of timeout"""
+        return self._timed_out
+
     @property
     def is_undefined(self):
         """Returns whether process is undefined"""
@@ -169,23 +630,469 @@ class Process(IProcess):
 
         return [self._command] + list(map(str, args))
 
-    def terminate(self):
-        """Terminates process if it's defined"""
+    def _uses_process_group(self):  # -> bool
+        """Returns whether process is to be run in a new process group"""
+
+        return bool(self._kwargs.get(
+            'new_process_group', Subprocess.new_process_group))
+
+    def _make_spawn_kwargs(self):
+        """Builds keyword arguments for selected spawn strategy"""
+
+        strategy = self._kwargs.get('spawn', Subprocess.spawn_strategy)
+
+        if strategy == SPAWN_AUTO:
+            kwargs = {}
+        elif strategy == SPAWN_POSIX:
+            # NOTE(albartash): CPython uses posix_spawn only when it doesn't
+            #                  need to close file descriptors. It's safe
+            #                  only when no descriptor is inheritable,
+            #                  otherwise it falls back to closing them.
+            kwargs = {'close_fds': has_inheritable_fds()}
+        elif strategy == SPAWN_FORK:
+            # NOTE(albartash): preexec_fn disables both vfork and posix_spawn
+            kwargs = {'preexec_fn': _fork_preexec}
+        elif strategy == SPAWN_SERVER:
+            if is_python2_running():
+                raise ValueError("Fork server requires Python 3")
+            kwargs = {}
+        else:
+            raise ValueError("Unknown spawn strategy: {}".format(strategy))
+
+        if self._uses_process_group():
+            # NOTE(albartash): It's setpgid(), not setsid(), so the process
+            #                  keeps the controlling terminal.
+            if strategy == SPAWN_POSIX:
+                raise ValueError(
+                    "posix_spawn strategy doesn't support new process group")
+            if strategy == SPAWN_SERVER or sys.version_info >= (3, 11):
+                kwargs['process_group'] = 0
+            else:
+                kwargs['preexec_fn'] = os.setpgrp
+        return kwargs
+
+    def _make_stdin(self):
+        """Returns stdin for spawning the process
+
+        Data of input option, which is written into stdin by Python,
+        is stored as an iterable of chunks for later.
+        """
 
-        if self._process:
-            self._process.terminate()
+        value = self._kwargs.get('input', None)
+        if 'stdin' in self._kwargs:
+            if value is not None:
+                raise ValueError(
+                    "Options stdin and input cannot be used together")
+            return self._kwargs['stdin']
 
-            # NOTE(albartash): It's needed, otherwise termination can happen
-            #                  slower than next call of poll().
-            self._process.wait()
+        stdin, self._input_chunks = _make_input(value)
+        return stdin
+
+    def _make_outputs(self):  # -> tuple
+        """Returns stdout and stderr for spawning the process
+
+        Files opened for them are closed by _close_opened_descriptors().
+        """
+
+        outputs = []
+        opened = []
+        try:
+            for name in ('stdout', 'stderr'):
+                target, descriptor = _open_output(
+                    self._kwargs.get(name, Subprocess.PIPE))
+                outputs.append(target)
+                if descriptor is not None:
+                    opened.append(descriptor)
+        except BaseException:
+            for descriptor in opened:
+                os.close(descriptor)
+            raise
+        self._opened_descriptors = opened
+        return tuple(outputs)
+
+    def _close_opened_descriptors(self):
+        """Closes files opened for the process, which has its own copies"""
+
+        for descriptor in self._opened_descriptors:
+            os.close(descriptor)
+        self._opened_descriptors = ()
+
+    def _get_tail_size(self):  # -> int
+        """Returns size of output tails kept for diagnostics"""
+        return get_tail_size(self._kwargs)
+
+    def _make_buffer(self, name):
+        """Returns a storage for captured output of the stream"""
+        return make_output_buffer(self._kwargs, name)
+
+    def _make_consumers(self):  # -> Union[dict, None]
+        """Returns consumers of output passed via tee_* options
+
+        Result maps a stream name to a list of consumers, or it's None
+        when there are no consumers at all.
+        """
+
+        consumers = {}
+        for name in ('stdout', 'stderr'):
+            consumers[name] = make_consumers(
+                self._kwargs.get('tee_' + name, None))
+        if not any(consumers.values()):
+            return None
+        return consumers
+
+    def get_tails(self):  # -> tuple
+        """Returns a tuple (stdout, stderr) of output tails as bytes
+
+        Tails are the last tail_size bytes of captured output, starting
+        from a complete line. Stdout tail is returned with tail_stdout=True
+        only. None stands for a tail which is not kept.
+        """
+
+        limit = self._get_tail_size()
+        tails = []
+        for name, enabled in (
+                ('stdout', self._kwargs.get('tail_stdout', False)),
+                ('stderr', True)):
+            buffer = getattr(self, '_{}_buffer'.format(name))
+            if not limit or not enabled or buffer is None:
+                tails.append(None)
+            else:
+                tails.append(get_tail(buffer, limit))
+        return tuple(tails)
+
+    def _make_called_process_error(self, arguments):
+        """Returns an exception for the process failed with non-zero code
+
+        Tails of output are attached to it as stdout and stderr.
+        """
+
+        stdout, stderr = self.get_tails()
+        return Subprocess.CalledProcessError(
+            returncode=self._process.returncode,
+            cmd=str(arguments),
+            output=stdout,
+            stderr=stderr
+        )
+
+    def _raise_consumer_error(self):
+        """Raises exception of a failed consumer of output, if any"""
+
+        for tee in self._tees:
+            tee.raise_error()
+
+    def _make_popen_kwargs(self):
+        """Builds keyword arguments for spawning the process"""
+
+        kwargs = {
+            'stdin': self._make_stdin(),
+            'executable': self._kwargs.get('executable', None)
+        }
+        for option in ('cwd', 'env'):
+            if self._kwargs.get(option) is not None:
+                kwargs[option] = self._kwargs[option]
+        kwargs.update(self._make_spawn_kwargs())
+
+        # NOTE(albartash): Files are opened last, so they're not left
+        #                  open when other options are invalid.
+        kwargs['stdout'], kwargs['stderr'] = self._make_outputs()
+        return kwargs
+
+    def _make_run_process_error(self, arguments, kwargs, error):
+        """Returns an exception for the process failed to be run"""
+
+        return RunProcessError(
+            cmd=arguments[0],
+            process_args=arguments[1:],
+            process_kwargs=kwargs,
+            error=error
+        )
+
+    def _get_popen_class(self):
+        """Returns Popen class for selected spawn strategy"""
+
+        strategy = self._kwargs.get('spawn', Subprocess.spawn_strategy)
+        if strategy != SPAWN_SERVER:
+            return _Popen
+
+        # NOTE(albartash): It's imported here, as it's rarely used
+        from python_shell.shell.processing.forkserver import ForkServerPopen
+        return ForkServerPopen
+
+    def _popen(self, arguments):
+        """Spawns the process and returns a Popen instance"""
+
+        kwargs = self._make_popen_kwargs()
+        self._arguments = arguments
+        self._started_at = _clock()
+        try:
+            process = self._get_popen_class()(arguments, **kwargs)
+        except (OSError, ValueError) as e:
+            error = self._make_run_process_error(arguments, kwargs, e)
+            if hooks.enabled:
+                self._emit(hooks.EVENT_ERROR, exception=error)
+            raise error
+        finally:
+            self._close_opened_descriptors()
+        self._process_group = self._uses_process_group()
+        self._track_child(process)
+
+        if hooks.enabled:
+            hooks.emit(hooks.EVENT_SPAWN, command=self._command,
+                       argv=arguments, pid=process.pid,
+                       executable=kwargs['executable'])
+        return process
+
+    def _track_child(self, process):
+        """Adds the spawned process to the registry of children
+
+        If this object is garbage collected while the process is running,
+        the process is reaped in background.
+        """
+
+        get_child_registry().add(process, self._process_group)
+
+        # NOTE(albartash): It works like weakref.finalize(), which is
+        #                  missing in Python 2. References are dropped
+        #                  at exit of the interpreter, so it's never
+        #                  called then.
+        def on_collected(reference):
+            if reference in _collected_processes:
+                _collected_processes.discard(reference)
+                get_child_registry().abandon(process)
+
+        _collected_processes.add(weakref.ref(self, on_collected))
+
+    def _emit(self, name, **data):
+        """Passes an event of the process to hooks"""
+
+        hooks.emit(name, command=self._command, argv=self._arguments,
+                   pid=self._process.pid if self._process else None,
+                   **data)
+
+    def _emit_exit(self):
+        """Passes an event of completed process to hooks, only once"""
+
+        if self._exit_emitted:
+            return
+        self._exit_emitted = True
+
+        buffers = (self._stdout_buffer, self._stderr_buffer)
+        stdout_bytes, stderr_bytes = (
+            buffer.size if buffer is not None else None for buffer in buffers)
+        self._emit(hooks.EVENT_EXIT,
+                   return_code=self._process.returncode,
+                   stdout_bytes=stdout_bytes,
+                   stderr_bytes=stderr_bytes)
+
+    def _on_first_byte(self, stream):
+        """Passes an event of the first output of the process to hooks"""
+        self._emit(hooks.EVENT_FIRST_BYTE, stream=stream)
+
+    def _signal(self, signal_number):
+        """Sends the signal to the process group or to the process only"""
+
+        try:
+            if self._process_group:
+                os.killpg(self._process.pid, signal_number)
+            else:
+                self._process.send_signal(signal_number)
+        except OSError:
+            # NOTE(albartash): The process and its group have gone already
+            pass
+
+    def _schedule_deadline(self, timeout):
+        """Makes the process to be terminated in timeout seconds"""
+
+        self._deadline = get_watchdog().schedule(timeout, self._on_deadline)
+
+    def _cancel_deadline(self):
+        """Cancels termination of the process on timeout"""
+
+        if self._deadline is not None:
+            get_watchdog().cancel(self._deadline)
+            self._deadline = None
+
+    def _on_deadline(self):
+        """Starts terminating the process when its timeout has expired
+
+        It's called from the watchdog thread, so it must not block:
+        the process is killed after the grace period by another callback.
+        """
+
+        if self._process.poll() is not None:
+            return
+        self._timed_out = True
+        self._signal(signal.SIGTERM)
+        self._deadline = get_watchdog().schedule(
+            self._get_grace_period(), self._on_grace_period_expired)
+
+    def _on_grace_period_expired(self):
+        """Kills the process, if it's still running after SIGTERM"""
+
+        self._deadline = None
+        if self._process_group or self._process.poll() is None:
+            self._signal(signal.SIGKILL)
+
+    def _get_grace_period(self):  # -> float
+        """Returns time given to the process to exit after SIGTERM"""
+        return self._kwargs.get(
+            'kill_grace_period', Subprocess.kill_grace_period)
+
+    def add_done_callback(self, fn):
+        """Calls fn(process) when the process is completed
+
+        Completion of processes running in background is tracked by
+        a single thread shared by all processes, and fn is called from it,
+        so it must be quick. For completed processes, fn is called
+        immediately.
+        """
+
+        if not self._process:
+            raise UndefinedProcess
+
+        watch = False
+        with _done_lock:
+            if not self._done:
+                watch = self._done_callbacks is None
+                self._done_callbacks = self._done_callbacks or []
+                self._done_callbacks.append(fn)
+                fn = None
+
+        if fn is not None:
+            fn(self)
+            return
+        if not watch:
+            return
+
+        self._drain_output()
+        if self._process.poll() is not None:
+            self._on_exited()
         else:
+            get_completion_tracker().watch(self._process, self._on_exited)
+
+    def _drain_output(self):
+        """Starts reading output of the process in background, if needed"""
+
+    def _on_exited(self):
+        """Completes the process, once its output is read as well"""
+
+        with _done_lock:
+            self._exited = True
+            output_done = self._output_done
+            completed = output_done is None or output_done.is_set()
+        if completed:
+            self._on_completed()
+
+    def _on_output_done(self):
+        """Completes the process, if the tracker has reported its exit"""
+
+        with _done_lock:
+            completed = self._exited
+        if completed:
+            self._on_completed()
+
+    def _on_completed(self):
+        """Calls callbacks of the completed process, only once"""
+
+        with _done_lock:
+            if self._done:
+                return
+            self._done = True
+            callbacks, self._done_callbacks = self._done_callbacks or (), None
+
+        get_child_registry().discard(self._process)
+        self._cancel_deadline()
+        if hooks.enabled:
+            self._emit_exit()
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                # NOTE(albartash): Like concurrent.futures, a failed
+                #                  callback doesn't affect the others.
+                pass
+
+    def detach_stdout(self):
+        """Returns stdout pipe of the process and stops owning it
+
+        It's used for connecting the pipe to another process directly.
+        """
+
+        if not self._process:
             raise UndefinedProcess
+        stream, self._process.stdout = self._process.stdout, None
+        return stream
+
+    def terminate(self, grace_period=None):
+        """Terminates process if it's defined
+
+        SIGTERM is sent to the process (or its group, if it's run
+        in a new group), and the process is waited for. With grace_period,
+        the process still running after grace_period seconds is killed
+        with SIGKILL, as well as the rest of its group, so no child
+        processes are left behind.
+        """
+
+        if not self._process:
+            raise UndefinedProcess
+
+        self._cancel_deadline()
+        self._signal(signal.SIGTERM)
+        if grace_period is not None:
+            self._wait_for_exit(grace_period)
+            if self._process_group or self._process.returncode is None:
+                self._signal(signal.SIGKILL)
+
+        # NOTE(albartash): It's needed, otherwise termination can happen
+        #                  slower than next call of poll().
+        self._process.wait()
+        self._on_completed()
+
+    def _wait_for_exit(self, timeout):
+        """Waits at most timeout seconds for the process to exit"""
+
+        if not is_python2_running():
+            try:
+                self._process.wait(timeout=timeout)
+            except Subprocess.TimeoutExpired:
+                pass
+            return
+
+        deadline = _clock() + timeout
+        while self._process.poll() is None and _clock() < deadline:
+            time.sleep(0.01)
+
+    def close(self):
+        """Terminates the process, if it's running, and closes its pipes
+
+        The process is killed, if it's still running after
+        kill_grace_period. Captured output stays available
+        (see release()), while output which has not been read from pipes
+        yet is discarded.
+        """
+
+        if not self._process:
+            return
+        if self._process.poll() is None:
+            self.terminate(self._get_grace_period())
+        close_pipes(self._process)
+        self._wait_output()
+        self._on_completed()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def wait(self):
         """Wait until process is completed"""
 
         if self._process:
             self._process.wait()
+            self._wait_output()
+            self._on_completed()
+            self._raise_consumer_error()
         else:
             raise UndefinedProcess
 
@@ -204,35 +1111,87 @@ class SyncProcess(Process):
         """Run a process in synchronous way"""
 
         arguments = self._make_command_execution_list(self._args)
+        consumers = self._make_consumers()
+        self._process = self._popen(arguments)
 
-        kwargs = {
-            'stdout': self._kwargs.get('stdout', Subprocess.PIPE),
-            'stderr': self._kwargs.get('stderr', Subprocess.PIPE),
-            'stdin': self._kwargs.get('stdin', Subprocess.PIPE)
-        }
-
+        # NOTE(albartash): Pipes must be drained while the process is
+        #                  running, otherwise it hangs as soon as
+        #                  the pipe buffer is full.
         try:
-            self._process = subprocess.Popen(
-                arguments,
-                **kwargs
-            )
-        except (OSError, ValueError):
-            raise RunProcessError(
-                cmd=arguments[0],
-                process_args=arguments[1:],
-                process_kwargs=kwargs
+            self._stdout_buffer, self._stderr_buffer = communicate(
+                self._process,
+                timeout=self._kwargs.get('timeout', None),
+                make_buffer=self._make_buffer,
+                idle_timeout=self._kwargs.get('idle_timeout', None),
+                on_first_byte=self._on_first_byte if hooks.enabled else None,
+                input_chunks=self._input_chunks,
+                consumers=consumers
             )
+        except BaseException as e:
+            self._on_error(e)
+            raise
 
-        if is_python2_running():  # Timeout is not supported in Python 2
-            self._process.wait()
-        else:
-            self._process.wait(timeout=self._kwargs.get('timeout', None))
+        self._on_exit(arguments)
+
+    def iter_output(self):
+        """Runs the process and yields chunks of stdout as they're read
+
+        Input is written into the process at the same time, so data
+        of any size can be streamed through it. Stderr is captured.
+        If the caller stops iterating, the process is terminated.
+        """
+
+        arguments = self._make_command_execution_list(self._args)
+        consumers = self._make_consumers() or {}
+        self._process = self._popen(arguments)
+        self._stdout_buffer = OutputBuffer()  # Output is given away
+        stdout = Tee(consumers.get('stdout', ()))
+        stderr = None
+        if self._process.stderr is not None:
+            self._stderr_buffer = self._make_buffer('stderr')
+            stderr = Tee([self._stderr_buffer] + consumers.get('stderr', []))
+        self._tees = (stdout, stderr) if stderr is not None else (stdout,)
+
+        chunks = iter_communicate(
+            self._process,
+            input_chunks=self._input_chunks,
+            timeout=self._kwargs.get('timeout', None),
+            idle_timeout=self._kwargs.get('idle_timeout', None),
+            on_first_byte=self._on_first_byte if hooks.enabled else None
+        )
+        try:
+            for name, data in chunks:
+                tee = stdout if name == 'stdout' else stderr
+                if data:
+                    tee.write(data)
+                    if tee is stdout:
+                        yield data
+                else:
+                    tee.close()
+            self._raise_consumer_error()
+        except BaseException as e:
+            self._on_error(e)
+            raise
+
+        self._on_exit(arguments)
+
+    def _on_error(self, error):
+        """Stops the process failed to be communicated with"""
+
+        # NOTE(albartash): The process might run in its own group, then
+        #                  it doesn't get even Ctrl+C from the terminal.
+        self._timed_out = isinstance(error, Subprocess.TimeoutExpired)
+        self.terminate(self._get_grace_period())
+        if hooks.enabled and not isinstance(error, GeneratorExit):
+            self._emit(hooks.EVENT_ERROR, exception=error)
+
+    def _on_exit(self, arguments):
+        """Checks return code of the completed process"""
+
+        self._on_completed()
 
         if self._process.returncode and self._kwargs.get('check', True):
-            raise Subprocess.CalledProcessError(
-                returncode=self._process.returncode,
-                cmd=str(arguments)
-            )
+            raise self._make_called_process_error(arguments)
 
 
 class AsyncProcess(Process):
@@ -240,27 +1199,157 @@ class AsyncProcess(Process):
     with waiting for its completion"""
 
     def execute(self):
-        """Run a process in asynchronous way"""
+        """Run a process in asynchronous way
 
-        arguments = self._make_command_execution_list(self._args)
+        With timeout option, the process is terminated in timeout seconds
+        by the watchdog thread shared by all processes. With tee_stdout
+        or tee_stderr options, output is read by the IO loop thread shared
+        by all processes, which passes it to consumers and captures it.
+        """
 
-        kwargs = {
-            'stdout': self._kwargs.get('stdout', Subprocess.PIPE),
-            'stderr': self._kwargs.get('stderr', Subprocess.PIPE),
-            'stdin': self._kwargs.get('stdin', Subprocess.PIPE)
-        }
+        if self._kwargs.get('idle_timeout', None) is not None:
+            raise ValueError(
+                "Option idle_timeout requires waiting for the process")
 
-        try:
-            self._process = subprocess.Popen(
-                arguments,
-                **kwargs
-            )
-        except (OSError, ValueError):
-            raise RunProcessError(
-                cmd=arguments[0],
-                process_args=arguments[1:],
-                process_kwargs=kwargs
+        arguments = self._make_command_execution_list(self._args)
+        consumers = self._make_consumers()
+        self._process = self._popen(arguments)
+        if consumers is not None:
+            self._read_output(consumers)
+
+        if self._input_chunks is not None:
+            # NOTE(albartash): Input is written by a thread, so the caller
+            #                  can read output of the process meanwhile.
+            feeder = threading.Thread(
+                target=feed_input,
+                args=(self._process.stdin, self._input_chunks),
+                name='python-shell-input-{}'.format(self._process.pid)
             )
+            feeder.daemon = True
+            feeder.start()
+
+        timeout = self._kwargs.get('timeout', None)
+        if timeout is not None:
+            self._schedule_deadline(timeout)
+
+    def _drain_output(self):
+        """Passes output of the process to the IO loop, unless it's done"""
+
+        # NOTE(albartash): Nobody might read output of the process, then
+        #                  it would block on a full pipe and never complete.
+        if self._output_done is None:
+            self._read_output({'stdout': [], 'stderr': []})
+
+    def _read_output(self, consumers):
+        """Passes output of the process to the IO loop
+
+        Both streams are read, even if only one of them has consumers,
+        so the process never blocks on a full pipe. Output is captured
+        as well, and becomes available when the streams are finished.
+        """
+
+        streams = []
+        for name in ('stdout', 'stderr'):
+            stream = getattr(self._process, name)
+            if stream is not None:
+                # NOTE(albartash): The stream belongs to IO loop now
+                setattr(self._process, name, None)
+                streams.append((name, stream))
+
+        self._output_done = threading.Event()
+        if not streams:
+            self._output_done.set()
+            return
+
+        remaining = [len(streams)]
+        lock = threading.Lock()
+        tees = []
+        io_loop = get_io_loop()
+
+        def on_close(name, buffer):
+            setattr(self, '_{}_buffer'.format(name), buffer)
+            with lock:
+                remaining[0] -= 1
+                done = not remaining[0]
+            if done:
+                self._output_done.set()
+                self._on_output_done()
+
+        for name, stream in streams:
+            buffer = self._make_buffer(name)
+            tee = Tee([buffer] + consumers[name])
+            tees.append(tee)
+            io_loop.register(
+                stream, tee,
+                on_close=lambda name=name, buffer=buffer: on_close(
+                    name, buffer))
+        self._tees = tuple(tees)
+
+
+class CompletedProcess(Process):
+    """Process subclass for a process completed before
+
+    It's never run: its return code and output are passed
+    to constructor, e.g. when they are taken from a cache.
+    """
+
+    def __init__(self, command, args, returncode, stdout=b'', stderr=b''):
+        super(CompletedProcess, self).__init__(command, *args)
+        self._returncode = returncode
+        self._stdout_buffer = OutputBuffer()
+        self._stdout_buffer.write(stdout)
+        self._stderr_buffer = OutputBuffer()
+        self._stderr_buffer.write(stderr)
+
+    @property
+    def returncode(self):  # -> int
+        """Returns returncode of process"""
+        return self._returncode
+
+    @property
+    def is_finished(self):  # -> bool
+        """Returns whether process has been completed"""
+        return True
+
+    @property
+    def is_terminated(self):  # -> bool
+        """Returns whether process has been terminated"""
+        return self._returncode == self.PROCESS_IS_TERMINATED_CODE
+
+    @property
+    def is_undefined(self):
+        """Returns whether process is undefined"""
+        return False
+
+    def add_done_callback(self, fn):
+        """Calls fn(process) immediately, as the process is completed"""
+        fn(self)
+
+    def terminate(self, grace_period=None):
+        """Does nothing, as the process is completed"""
+
+    def wait(self):
+        """Does nothing, as the process is completed"""
+
+    def execute(self):
+        """Does nothing, as the process is completed"""
+
+
+def _terminate_children():
+    """Terminates children left running when the interpreter exits"""
+
+    # NOTE(albartash): Threads can't be started anymore, so children
+    #                  of collected processes are not reaped in background.
+    _collected_processes.clear()
+    if Subprocess.terminate_at_exit:
+        get_child_registry().terminate_all(Subprocess.kill_grace_period)
+
+
+atexit.register(_terminate_children)
+
+
+def _fork_preexec():
+    """Does nothing in the child process, but forces using fork"""
 
 
 class _SubprocessMeta(type):
@@ -286,3 +1375,39 @@ class Subprocess(with_metaclass(_SubprocessMeta, object)):
 
     CalledProcessError = _CalledProcessError
     PIPE = _PIPE
+    TimeoutExpired = _TimeoutExpired
+    IdleTimeoutExpired = IdleTimeoutExpired
+    STDOUT = subprocess.STDOUT
+    Append = Append
+
+    SPAWN_AUTO = SPAWN_AUTO
+    SPAWN_POSIX = SPAWN_POSIX
+    SPAWN_FORK = SPAWN_FORK
+    SPAWN_SERVER = SPAWN_SERVER
+
+    # Default spawn strategy, can be overridden per process by "spawn" option
+    spawn_strategy = SPAWN_AUTO
+
+    # Default size of captured output (in bytes) to be moved to disk,
+    # can be overridden per process by "spill_threshold" option
+    spill_threshold = None
+
+    # Whether processes are run in a new process group, so they are
+    # terminated with all their children. Such processes don't get signals
+    # from the terminal (e.g. Ctrl+C) and can't read from it. Can be
+    # overridden per process by "new_process_group" option.
+    new_process_group = False
+
+    # Default time (in seconds) given to processes to exit after SIGTERM
+    # before they are killed, can be overridden per process
+    # by "kill_grace_period" option
+    kill_grace_period = 5.0
+
+    # Whether processes still running at exit of the interpreter are
+    # terminated, like terminate() does. By default they are left running,
+    # e.g. detached commands run with wait=False.
+    terminate_at_exit = False
+
+    # Default size (in bytes) of output tails attached to errors of failed
+    # processes, can be overridden per process by "tail_size" option
+    tail_size = 8 * 1024
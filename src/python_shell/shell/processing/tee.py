@@ -0,0 +1,163 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import six
+
+from python_shell.util.streaming import DEFAULT_ENCODING
+
+
+__all__ = ('Consumer', 'Lines', 'Tee', 'make_consumers')
+
+
+class Consumer(object):
+    """Base class for consumers of process output
+
+    write() is called with every chunk of data read from the stream,
+    and close() is called once the stream is finished.
+    """
+
+    def write(self, data):
+        """Takes a chunk of data"""
+
+    def close(self):
+        """Notifies consumer that the stream is finished"""
+
+
+class Lines(Consumer):
+    """Consumer passing complete lines of output to callback
+
+        Shell.make(tee_stdout=Lines(logger.info), wait=False)
+
+    Lines are decoded and passed without line endings.
+    """
+
+    def __init__(self, callback, encoding=None, errors='replace'):
+        self._callback = callback
+        self._encoding = encoding or DEFAULT_ENCODING
+        self._errors = errors
+        self._partial = []  # pieces of incomplete line
+
+    def _emit(self, line):
+        if line.endswith(b'\r'):
+            line = line[:-1]
+        self._callback(line.decode(self._encoding, self._errors))
+
+    def write(self, data):
+        self._partial.append(data)
+        if b'\n' not in data:
+            return
+
+        lines = b''.join(self._partial).split(b'\n')
+        last = lines.pop()
+        self._partial = [last] if last else []
+        for line in lines:
+            self._emit(line)
+
+    def close(self):
+        if self._partial:
+            self._emit(b''.join(self._partial))
+            self._partial = []
+
+
+class _FileConsumer(Consumer):
+    """Consumer writing output into a file object, which is not closed"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, data):
+        self._stream.write(data)
+
+    def close(self):
+        self._stream.flush()
+
+
+class _CallbackConsumer(Consumer):
+    """Consumer passing chunks of output to callback"""
+
+    def __init__(self, callback):
+        self._callback = callback
+
+    def write(self, data):
+        self._callback(data)
+
+
+def _make_consumer(value):  # -> Consumer
+    if isinstance(value, Consumer):
+        return value
+    if hasattr(value, 'write'):
+        return _FileConsumer(value)
+    if callable(value):
+        return _CallbackConsumer(value)
+    raise TypeError("Cannot consume output with {!r}".format(value))
+
+
+def make_consumers(value):  # -> list
+    """Converts value of tee option into a list of consumers
+
+    value is a consumer or a list of them. Consumer is either an instance
+    of Consumer, or a file object (data is written into it), or a callable
+    (it's called with chunks of data).
+    """
+
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [_make_consumer(item) for item in value]
+    return [_make_consumer(value)]
+
+
+class Tee(object):
+    """Passes data of a stream to all its consumers
+
+    A failed consumer is detached, so the others still get the data,
+    and its exception is kept in error, to be raised by the caller.
+    """
+
+    error = None
+
+    def __init__(self, consumers):
+        self._consumers = list(consumers)
+
+    def _call(self, method, *args):
+        for consumer in tuple(self._consumers):
+            try:
+                getattr(consumer, method)(*args)
+            except Exception as e:
+                self._consumers.remove(consumer)
+                if self.error is None:
+                    self.error = e
+
+    def write(self, data):
+        self._call('write', data)
+
+    def close(self):
+        self._call('close')
+
+    def raise_error(self):
+        """Raises exception of the first failed consumer, if any"""
+
+        if self.error is not None:
+            six.reraise(type(self.error), self.error,
+                        getattr(self.error, '__traceback__', None))
@@ -0,0 +1,97 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import collections
+import sys
+
+
+__all__ = ('ResourceUsage',)
+
+
+# NOTE(albartash): ru_maxrss is measured in kilobytes on Linux,
+#                  but in bytes on macOS.
+_MAX_RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+class ResourceUsage(collections.namedtuple('ResourceUsage', (
+    'wall_time',  # seconds between spawning and reaping the process
+    'user_time',  # seconds of CPU time spent in user mode
+    'system_time',  # seconds of CPU time spent in kernel mode
+    'max_rss',  # maximum resident set size in bytes
+    'minor_page_faults',  # page faults served without I/O
+    'major_page_faults',  # page faults which required I/O
+    'voluntary_context_switches',  # process gave up CPU, e.g. waiting I/O
+    'involuntary_context_switches',  # process was preempted
+))):
+    """Resources used by a completed process, as reported by wait4()
+
+    Usage of processes started by the process and waited by it
+    is included as well.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_rusage(cls, rusage, wall_time):
+        """Creates an instance from resource.struct_rusage"""
+
+        return cls(
+            wall_time=wall_time,
+            user_time=rusage.ru_utime,
+            system_time=rusage.ru_stime,
+            max_rss=rusage.ru_maxrss * _MAX_RSS_UNIT,
+            minor_page_faults=rusage.ru_minflt,
+            major_page_faults=rusage.ru_majflt,
+            voluntary_context_switches=rusage.ru_nvcsw,
+            involuntary_context_switches=rusage.ru_nivcsw
+        )
+
+    @property
+    def cpu_time(self):  # -> float
+        """Returns total CPU time in seconds"""
+        return self.user_time + self.system_time
+
+    @classmethod
+    def aggregate(cls, usages):
+        """Returns total usage of many processes
+
+        Values are summed up, except max_rss, which is the maximum one.
+        So wall_time is the time spent by all the processes, which is
+        larger than elapsed time for processes run in parallel.
+        Missing usages (None) are skipped. If there are no usages at all,
+        None is returned.
+        """
+
+        total = None
+        for usage in usages:
+            if usage is None:
+                continue
+            if total is None:
+                total = usage
+                continue
+            total = cls(*(
+                max(a, b) if field == 'max_rss' else a + b
+                for field, a, b in zip(cls._fields, total, usage)
+            ))
+        return total
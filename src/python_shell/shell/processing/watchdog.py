@@ -0,0 +1,146 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+
+
+__all__ = ('Watchdog', 'get_watchdog')
+
+
+_clock = getattr(time, 'monotonic', time.time)
+
+
+class Watchdog(object):
+    """Runs scheduled callbacks in a single background thread
+
+    It's used for enforcing deadlines of processes running in background,
+    so thousands of them don't need a thread per process. Callbacks are
+    supposed to be short and must never block.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._entries = []  # heap of [when, sequence, callback]
+        self._sequence = itertools.count()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_thread(self):
+        """Starts the thread, unless it's running in the current process"""
+
+        # NOTE(albartash): Threads don't survive fork, so the child process
+        #                  needs its own thread and an empty schedule.
+        if self._pid != os.getpid():
+            self._entries = []
+            self._thread = None
+            self._pid = os.getpid()
+
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name='python-shell-watchdog')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def schedule(self, delay, callback):
+        """Calls callback in delay seconds
+
+        Returns a handle, which can be passed to cancel().
+        """
+
+        entry = [_clock() + delay, next(self._sequence), callback]
+        with self._condition:
+            self._ensure_thread()
+            heapq.heappush(self._entries, entry)
+            if self._entries[0] is entry:
+                self._condition.notify()
+        return entry
+
+    def cancel(self, handle):
+        """Cancels a scheduled callback, if it's not called yet"""
+
+        with self._condition:
+            # NOTE(albartash): The entry stays in the heap until it's due,
+            #                  which is cheaper than removing it now.
+            handle[2] = None
+
+    @property
+    def pending(self):  # -> int
+        """Returns the number of scheduled callbacks not called yet"""
+
+        with self._condition:
+            return sum(1 for entry in self._entries if entry[2] is not None)
+
+    def _pop_due(self):  # -> list
+        """Waits for scheduled callbacks and returns the ones to be called"""
+
+        with self._condition:
+            while True:
+                while self._entries and self._entries[0][2] is None:
+                    heapq.heappop(self._entries)
+                if not self._entries:
+                    self._condition.wait()
+                    continue
+
+                delay = self._entries[0][0] - _clock()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+
+                callbacks = []
+                while self._entries and self._entries[0][0] <= _clock():
+                    callback = heapq.heappop(self._entries)[2]
+                    if callback is not None:
+                        callbacks.append(callback)
+                return callbacks
+
+    def _run(self):
+        """Calls scheduled callbacks when they're due"""
+
+        while True:
+            for callback in self._pop_due():
+                try:
+                    callback()
+                except Exception:
+                    # NOTE(albartash): A failed callback must not stop
+                    #                  enforcing other deadlines.
+                    pass
+
+
+_watchdog = None
+_watchdog_lock = threading.Lock()
+
+
+def get_watchdog():  # -> Watchdog
+    """Returns a watchdog shared by all processes"""
+
+    global _watchdog
+    if _watchdog is None:
+        with _watchdog_lock:
+            if _watchdog is None:
+                _watchdog = Watchdog()
+    return _watchdog
@@ -0,0 +1,360 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os
+import select
+import subprocess
+import threading
+import time
+import uuid
+
+from six.moves import shlex_quote
+
+from python_shell.command.base import BaseCommand
+from python_shell.exceptions import SessionTerminated
+from python_shell.exceptions import ShellException
+from python_shell.shell.processing.capture import OutputBuffer
+from python_shell.shell.processing.capture import READ_SIZE
+from python_shell.shell.processing.process import StreamIterator
+from python_shell.shell.processing.process import Subprocess
+from python_shell.shell.terminal import BashTerminalIntegration
+from python_shell.util.version import is_python2_running
+
+
+__all__ = ('SessionCommand', 'ShellSession')
+
+
+# NOTE(albartash): Every command is run via "eval", so syntax errors
+#                  don't terminate the session. Stdin of the command is
+#                  closed, as the session stdin is used for commands.
+#                  Before the command, a random marker is printed to both
+#                  streams, so whatever is printed earlier is dropped.
+#                  After the command, its return code is printed to stdout
+#                  with the marker, and the marker is printed to stderr
+#                  as well, so both streams can be delimited.
+_COMMAND_TEMPLATE = (
+    "printf '%s-begin\\n' {marker}\n"
+    "printf '%s-begin\\n' {marker} >&2\n"
+    "{{ eval {script}\n"
+    "}} </dev/null\n"
+    "printf '%s:%d\\n' {marker} \"$?\"\n"
+    "printf '%s\\n' {marker} >&2\n"
+)
+
+
+class SessionCommand(BaseCommand):
+    """Result of the command run in a shell session"""
+
+    def __init__(self, command, arguments, return_code, stdout, stderr,
+                 encoding=None, encoding_errors=None):
+        self._set_encoding(encoding, encoding_errors)
+        self._command = command
+        self._arguments = arguments
+        self._return_code = return_code
+        self._stdout = stdout
+        self._stderr = stderr
+
+    @property
+    def command(self):
+        """Returns a string with the command"""
+        return self._command
+
+    @property
+    def arguments(self):
+        """Returns a string with the arguments passed to the command"""
+        return self._arguments
+
+    @property
+    def return_code(self):
+        """Returns an integer code returned by the invoked command"""
+        return self._return_code
+
+    @property
+    def output(self):
+        """Returns an iterable object with output of the command"""
+        return StreamIterator(stream=self._stdout.open())
+
+    @property
+    def errors(self):
+        """Returns an iterable object with output of the command
+           from stderr
+        """
+        return StreamIterator(stream=self._stderr.open())
+
+    def __repr__(self):
+        """Returns command's execution string"""
+        return ' '.join(filter(None, (self.command, self.arguments)))
+
+
+class _MarkedStream(object):
+    """Reads session stream until the marker of current command"""
+
+    def __init__(self, stream, terminator):
+        self._fd = stream.fileno()
+        self._terminator = terminator
+        self._data = bytearray()
+        self._scanned = 0
+        self._begin = None
+        self._marker = None
+        self.position = None  # where the marker starts, when found
+        self.end = None  # where the marker line ends, when found
+
+    def fileno(self):
+        return self._fd
+
+    def start(self, begin, marker):
+        """Prepares stream for reading output of the next command
+
+        Data preceding the begin line is dropped, which is output
+        printed after the previous command (by its background jobs).
+        """
+
+        self._begin = begin
+        self._marker = marker
+        self.position = self.end = None
+
+    def read(self):  # -> bool
+        """Reads available data and returns False on EOF"""
+
+        data = os.read(self._fd, READ_SIZE)
+        if not data:
+            return False
+        self._data.extend(data)
+
+        if self._begin is not None:
+            start = max(self._scanned - len(self._begin), 0)
+            position = self._data.find(self._begin, start)
+            self._scanned = len(self._data)
+            if position < 0:
+                return True
+            del self._data[:position + len(self._begin)]
+            self._begin = None
+            self._scanned = 0
+
+        if self.position is None:
+            start = max(self._scanned - len(self._marker), 0)
+            position = self._data.find(self._marker, start)
+            self._scanned = len(self._data)
+            if position < 0:
+                return True
+            self.position = position
+
+        end = self._data.find(self._terminator, self.position)
+        if end >= 0:
+            self.end = end + len(self._terminator)
+        return True
+
+    @property
+    def is_complete(self):
+        """Returns whether the marker has been read completely"""
+        return self.end is not None
+
+    def pop(self):
+        """Returns output of the command and its marker line"""
+
+        output = bytes(self._data[:self.position])
+        marker_line = bytes(self._data[self.position:self.end])
+        del self._data[:self.end]
+        self._scanned = 0
+        return output, marker_line
+
+
+class ShellSession(object):
+    """Long-living shell process for running many commands
+
+    All commands are run by the same Bash process, so running a command
+    doesn't spawn a new process, and the shell state (current directory,
+    variables, functions) is kept between commands.
+
+    If the session process dies (e.g. a command runs "exit"),
+    SessionTerminated is raised, and a new session process is started
+    on the next command. Its state is lost in that case.
+
+    Commands may start background jobs ("command &"). Their output
+    printed after the command is completed is dropped, but the output
+    printed while the next command runs is mixed into its output.
+    Redirect output of background jobs to keep results clean.
+    """
+
+    _process = None
+
+    def __init__(self, env=None, cwd=None):
+        self._env = env
+        self._cwd = cwd
+        self._lock = threading.Lock()
+        self._stdout = None  # _MarkedStream of the session process
+        self._stderr = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def is_alive(self):
+        """Returns whether the session process is running"""
+        return self._process is not None and self._process.poll() is None
+
+    @property
+    def pid(self):  # -> Union[int, None]
+        """Returns PID of the session process, if it's running"""
+        return self._process.pid if self.is_alive else None
+
+    def _start(self):
+        """Starts a new session process"""
+
+        self._process = subprocess.Popen(
+            [BashTerminalIntegration._shell_name, '--noprofile', '--norc'],
+            stdin=Subprocess.PIPE,
+            stdout=Subprocess.PIPE,
+            stderr=Subprocess.PIPE,
+            env=self._env,
+            cwd=self._cwd
+        )
+        self._stdout = _MarkedStream(self._process.stdout, b'\n')
+        self._stderr = _MarkedStream(self._process.stderr, b'\n')
+
+    def _kill(self):
+        """Kills the session process and releases its resources"""
+
+        process, self._process = self._process, None
+        if process is None:
+            return None
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        for stream in (process.stdin, process.stdout, process.stderr):
+            stream.close()
+        return process.returncode
+
+    def close(self):
+        """Stops the session process"""
+
+        with self._lock:
+            if self.is_alive:
+                try:
+                    self._process.stdin.close()
+                    if is_python2_running():
+                        # NOTE(albartash): Bash exits as soon as its input
+                        #                  is closed, as it's not busy.
+                        self._process.wait()
+                    else:
+                        self._process.wait(timeout=1)
+                except (OSError, Subprocess.TimeoutExpired):
+                    pass
+            self._kill()
+
+    def restart(self):
+        """Starts a new session process, dropping the shell state"""
+
+        with self._lock:
+            self._kill()
+            self._start()
+
+    def _terminated(self):
+        """Returns SessionTerminated for the died session process"""
+        return SessionTerminated(self._kill())
+
+    def _communicate(self, script, timeout):
+        """Sends script to the session process and reads its output"""
+
+        marker = uuid.uuid4().hex.encode()
+        begin = marker + b'-begin\n'
+        self._stdout.start(begin, marker + b':')
+        self._stderr.start(begin, marker + b'\n')
+
+        try:
+            self._process.stdin.write(_COMMAND_TEMPLATE.format(
+                script=shlex_quote(script),
+                marker=marker.decode()
+            ).encode())
+            self._process.stdin.flush()
+        except (IOError, OSError):
+            raise self._terminated()
+
+        deadline = None if timeout is None else time.time() + timeout
+        streams = [self._stdout, self._stderr]
+        while streams:
+            remaining = None
+            if deadline is not None:
+                remaining = max(deadline - time.time(), 0)
+
+            readable, _, _ = select.select(streams, [], [], remaining)
+            if not readable:
+                # NOTE(albartash): There's no way to interrupt the command
+                #                  only, so the whole session is killed.
+                self._kill()
+                raise Subprocess.TimeoutExpired(script, timeout)
+
+            for stream in readable:
+                if not stream.read():
+                    raise self._terminated()
+                if stream.is_complete:
+                    streams.remove(stream)
+
+        stdout, marker_line = self._stdout.pop()
+        stderr, _ = self._stderr.pop()
+        return int(marker_line[len(marker) + 1:]), stdout, stderr
+
+    def _run(self, script, command, arguments, check=True, timeout=None,
+             encoding=None, encoding_errors=None):
+        """Runs a shell script in the session and returns SessionCommand"""
+
+        with self._lock:
+            if not self.is_alive:
+                self._kill()
+                self._start()
+            return_code, stdout, stderr = self._communicate(script, timeout)
+
+        stdout_buffer, stderr_buffer = OutputBuffer(), OutputBuffer()
+        stdout_buffer.write(stdout)
+        stderr_buffer.write(stderr)
+
+        result = SessionCommand(
+            command, arguments, return_code, stdout_buffer, stderr_buffer,
+            encoding=encoding, encoding_errors=encoding_errors)
+        if check and return_code:
+            raise ShellException(result)
+        return result
+
+    def run_script(self, script, **kwargs):
+        """Runs a shell script in the session and returns SessionCommand
+
+        With check=True (default), ShellException is raised when
+        the script returns non-zero code. When timeout expires,
+        the session process is killed.
+        """
+        return self._run(script, script, '', **kwargs)
+
+    def run(self, command, *args, **kwargs):
+        """Runs a command with arguments in the session
+
+        Arguments are quoted, so they're passed to the command as is.
+        Accepts the same options as run_script.
+        """
+
+        args = tuple(map(str, args))
+        script = ' '.join(map(shlex_quote, (command,) + args))
+        return self._run(script, command, ' '.join(args), **kwargs)
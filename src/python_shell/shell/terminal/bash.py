@@ -23,8 +23,8 @@ THE SOFTWARE.
 """
 
 from python_shell.shell.terminal.base import BaseTerminalIntegration
-from python_shell.util import SyncProcess
-from python_shell.util import Subprocess
+from python_shell.shell.processing.process import SyncProcess
+from python_shell.shell.processing.process import Subprocess
 from python_shell.util.streaming import decode_stream
 
 
@@ -22,16 +22,50 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
-from python_shell.shell.processing.process import *
+from .command_index import *
+from .context import *
+from .executables import *
+from .lazy import set_lazy_attributes
 from .terminal import *
 from .version import *
 
 
+# NOTE(albartash): Some names are set lazily, which pylint doesn't see.
+# pylint: disable=undefined-all-variable
 __all__ = (
+    'CommandIndex',
+    'get_command_index',
+    'ContextLocal',
+    'find_executable',
+    'forget_executable',
     'is_python2_running',
     'get_current_terminal_name',
     'Subprocess',
     'Process',
     'SyncProcess',
-    'AsyncProcess'
+    'AsyncProcess',
+    'CompletedProcess',
+    'Append',
+    'Consumer',
+    'Lines',
+    'ResourceUsage',
+    'count_open_fds',
+    'get_child_registry'
 )
+# pylint: enable=undefined-all-variable
+
+# NOTE(albartash): Processes are not needed by modules importing utilities
+#                  only, so they're loaded on first access.
+set_lazy_attributes(globals(), {
+    'Subprocess': 'python_shell.shell.processing.process',
+    'Process': 'python_shell.shell.processing.process',
+    'SyncProcess': 'python_shell.shell.processing.process',
+    'AsyncProcess': 'python_shell.shell.processing.process',
+    'CompletedProcess': 'python_shell.shell.processing.process',
+    'Append': 'python_shell.shell.processing.process',
+    'Consumer': 'python_shell.shell.processing.tee',
+    'Lines': 'python_shell.shell.processing.tee',
+    'ResourceUsage': 'python_shell.shell.processing.usage',
+    'count_open_fds': 'python_shell.shell.processing.children',
+    'get_child_registry': 'python_shell.shell.processing.children',
+})
@@ -0,0 +1,217 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import bisect
+import json
+import os
+import threading
+
+from python_shell.util.executables import _get_directory_state
+from python_shell.util.executables import _get_path_directories
+
+
+__all__ = ('CommandIndex', 'get_command_index')
+
+
+_CACHE_VERSION = 1
+
+
+def _get_default_cache_path():
+    """Returns a path of the on-disk cache of commands index"""
+
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'python-shell', 'commands.json')
+
+
+def _iter_files(directory):
+    """Yields tuples (name, path) for files in the directory"""
+
+    scandir = getattr(os, 'scandir', None)
+    if scandir is None:  # Python 2
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                yield name, path
+        return
+
+    for entry in scandir(directory):
+        try:
+            if entry.is_file():
+                yield entry.name, entry.path
+        except OSError:
+            continue
+
+
+def _scan_directory(directory):  # -> list
+    """Returns names of executable files in the directory"""
+
+    try:
+        return [name for name, path in _iter_files(directory)
+                if os.access(path, os.X_OK)]
+    except OSError:
+        return []
+
+
+class CommandIndex(object):
+    """Index of executable commands available in $PATH
+
+    Directories are scanned only when they change, and scan results
+    are persisted to the on-disk cache, so they're reused by other
+    processes as well.
+    """
+
+    def __init__(self, cache_path=None):
+        """Initialize index
+
+        If cache_path is None, the default cache location is used.
+        If cache_path is False, the on-disk cache is disabled.
+        """
+
+        if cache_path is None:
+            cache_path = _get_default_cache_path()
+        self._cache_path = cache_path
+        self._lock = threading.Lock()
+        self._directories = None  # directory -> (state, commands)
+        self._key = None  # state of $PATH the commands were built for
+        self._commands = []  # sorted unique command names
+
+    def _load_cache(self):
+        """Loads scan results from the on-disk cache"""
+
+        self._directories = {}
+        if not self._cache_path:
+            return
+        try:
+            with open(self._cache_path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if not isinstance(data, dict) or \
+                data.get('version') != _CACHE_VERSION:
+            return
+
+        for directory, entry in data.get('directories', {}).items():
+            try:
+                self._directories[directory] = (
+                    tuple(entry['state']), list(entry['commands']))
+            except (KeyError, TypeError):
+                continue
+
+    def _save_cache(self):
+        """Saves scan results to the on-disk cache"""
+
+        if not self._cache_path:
+            return
+        data = {
+            'version': _CACHE_VERSION,
+            'directories': dict(
+                (directory, {'state': state, 'commands': commands})
+                for directory, (state, commands)
+                in self._directories.items()
+                if state is not None and os.path.isabs(directory)
+            ),
+        }
+        temporary_path = '{}.{}.tmp'.format(self._cache_path, os.getpid())
+        try:
+            cache_folder = os.path.dirname(self._cache_path)
+            if not os.path.isdir(cache_folder):
+                os.makedirs(cache_folder)
+            with open(temporary_path, 'w') as f:
+                json.dump(data, f)
+            os.rename(temporary_path, self._cache_path)
+        except (IOError, OSError):
+            pass
+
+    def refresh(self):
+        """Updates the index, scanning only changed directories"""
+
+        directories = _get_path_directories()
+        key = tuple(
+            (directory, _get_directory_state(directory))
+            for directory in directories
+        )
+
+        with self._lock:
+            if key == self._key:
+                return
+            if self._directories is None:
+                self._load_cache()
+
+            changed = False
+            for directory, state in key:
+                entry = self._directories.get(directory)
+                if entry is not None and entry[0] == state:
+                    continue
+                commands = _scan_directory(directory) if state else []
+                self._directories[directory] = (state, commands)
+                changed = True
+
+            names = set()
+            for directory in directories:
+                names.update(self._directories[directory][1])
+            self._commands = sorted(names)
+            self._key = key
+
+            if changed:
+                self._save_cache()
+
+    @property
+    def commands(self):  # -> list
+        """Returns a sorted list of available commands"""
+
+        self.refresh()
+        return self._commands
+
+    def complete(self, prefix):  # -> list
+        """Returns a sorted list of commands starting with prefix"""
+
+        commands = self.commands
+        start = bisect.bisect_left(commands, prefix)
+        end = start
+        while end < len(commands) and commands[end].startswith(prefix):
+            end += 1
+        return commands[start:end]
+
+    def __contains__(self, command_name):
+        commands = self.commands
+        position = bisect.bisect_left(commands, command_name)
+        return position < len(commands) and \
+            commands[position] == command_name
+
+
+_command_index = None
+_command_index_lock = threading.Lock()
+
+
+def get_command_index():  # -> CommandIndex
+    """Returns the command index shared by the whole process"""
+
+    global _command_index
+
+    if _command_index is None:
+        with _command_index_lock:
+            if _command_index is None:
+                _command_index = CommandIndex()
+    return _command_index
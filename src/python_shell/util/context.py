@@ -0,0 +1,67 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import threading
+
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
+
+__all__ = ('ContextLocal',)
+
+
+class ContextLocal(object):
+    """Value local to the current thread and asyncio task
+
+    contextvars are used when available, so every asyncio task sees its
+    own value. Otherwise, the value is local to the current thread only.
+
+    NOTE(albartash): Values set in a context are kept while the context
+                     is alive, so instances are supposed to be created
+                     at module level only.
+    """
+
+    def __init__(self, name, default=None):
+        self._default = default
+        if contextvars is not None:
+            self._variable = contextvars.ContextVar(name, default=default)
+        else:
+            self._local = threading.local()
+
+    def get(self):
+        """Returns the value for the current context"""
+
+        if contextvars is not None:
+            return self._variable.get()
+        return getattr(self._local, 'value', self._default)
+
+    def set(self, value):
+        """Sets the value for the current context"""
+
+        if contextvars is not None:
+            self._variable.set(value)
+        else:
+            self._local.value = value
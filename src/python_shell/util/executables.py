@@ -0,0 +1,110 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os
+
+
+__all__ = ('find_executable', 'forget_executable')
+
+
+# NOTE(albartash): Maps a command name to a tuple (key, path), where key
+#                  describes the state of $PATH directories at the moment
+#                  of lookup, and path is an absolute path to the executable
+#                  (or None, so negative lookups are cached as well).
+_executables_cache = {}
+
+
+def _get_path_directories():
+    """Returns a list of directories listed in $PATH"""
+
+    path = os.environ.get('PATH', os.defpath)
+    return [directory or os.curdir for directory in path.split(os.pathsep)]
+
+
+def _get_directory_state(directory):
+    """Returns a hashable state of directory, which changes
+    whenever the directory content changes."""
+
+    try:
+        stat = os.stat(directory)
+    except OSError:
+        return None
+    return (stat.st_dev, stat.st_ino,
+            getattr(stat, 'st_mtime_ns', stat.st_mtime))
+
+
+def _is_executable(path):
+    """Checks whether path points to an executable file"""
+
+    return os.path.isfile(path) and os.access(path, os.X_OK)
+
+
+def _lookup_executable(command_name, directories):
+    """Searches for the executable in passed directories"""
+
+    for directory in directories:
+        path = os.path.join(directory, command_name)
+        if _is_executable(path):
+            return os.path.abspath(path)
+    return None
+
+
+def find_executable(command_name):  # -> Union[str, None]
+    """Returns an absolute path to executable for command_name
+
+    The lookup is done in-process against $PATH, like "which" does.
+    Results (including negative ones) are cached until $PATH or
+    any of its directories is changed.
+    If the executable cannot be found, None is returned.
+    """
+
+    if os.sep in command_name:
+        # NOTE(albartash): Paths are relative to the current directory,
+        #                  so caching them makes no sense.
+        if _is_executable(command_name):
+            return os.path.abspath(command_name)
+        return None
+
+    directories = _get_path_directories()
+    key = tuple(map(_get_directory_state, directories))
+
+    cached = _executables_cache.get(command_name)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    path = _lookup_executable(command_name, directories)
+    _executables_cache[command_name] = (key, path)
+    return path
+
+
+def forget_executable(command_name=None):
+    """Drops cached lookup result for command_name
+
+    If command_name is None, the whole cache is dropped.
+    """
+
+    if command_name is None:
+        _executables_cache.clear()
+    else:
+        _executables_cache.pop(command_name, None)
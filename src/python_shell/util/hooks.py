@@ -0,0 +1,119 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import collections
+import threading
+import time
+
+
+__all__ = (
+    'Event',
+    'add_hook',
+    'remove_hook',
+    'emit',
+    'EVENT_RESOLVE_START',
+    'EVENT_RESOLVE_END',
+    'EVENT_SPAWN',
+    'EVENT_FIRST_BYTE',
+    'EVENT_EXIT',
+    'EVENT_ERROR',
+)
+
+
+# Names of events
+EVENT_RESOLVE_START = 'resolve_start'  # command lookup in $PATH is started
+EVENT_RESOLVE_END = 'resolve_end'  # data: executable (None if not found)
+EVENT_SPAWN = 'spawn'  # data: executable
+# NOTE(albartash): first_byte is reported for commands waited for, and not
+#                  on Python 2, where output is read at once.
+EVENT_FIRST_BYTE = 'first_byte'  # data: stream ("stdout" or "stderr")
+EVENT_EXIT = 'exit'  # data: return_code, stdout_bytes, stderr_bytes
+EVENT_ERROR = 'error'  # data: exception
+
+# NOTE(albartash): Callers check this flag before building an event,
+#                  so nothing is paid for events when there are no hooks.
+enabled = False
+
+_hooks = ()  # tuples (callback, events), replaced on every change
+_lock = threading.Lock()
+
+if hasattr(time, 'monotonic_ns'):
+    _now_ns = time.monotonic_ns
+else:
+    _clock = getattr(time, 'monotonic', time.time)
+
+    def _now_ns():  # -> int
+        return int(_clock() * 1e9)
+
+
+class Event(collections.namedtuple('Event', (
+    'name',  # one of EVENT_* constants
+    'timestamp',  # monotonic time in nanoseconds
+    'command',  # name of the command
+    'argv',  # list of the process arguments, if known
+    'pid',  # process id, if the process has been spawned
+    'data',  # dictionary with event-specific details
+))):
+    """Event of running a command, passed to hooks"""
+
+    __slots__ = ()
+
+
+def add_hook(callback, events=None):
+    """Registers callback to be called with an Event
+
+    events is a collection of event names the callback is interested in,
+    by default it gets all of them. Callbacks are called synchronously
+    in the thread running the command, and their exceptions are not
+    suppressed. Returns the callback, so it can be used as a decorator.
+    """
+
+    global _hooks, enabled
+    if events is not None:
+        events = frozenset(events)
+    with _lock:
+        _hooks = _hooks + ((callback, events),)
+        enabled = True
+    return callback
+
+
+def remove_hook(callback):
+    """Unregisters callback added with add_hook()"""
+
+    global _hooks, enabled
+    with _lock:
+        _hooks = tuple(hook for hook in _hooks if hook[0] != callback)
+        enabled = bool(_hooks)
+
+
+def emit(name, command=None, argv=None, pid=None, **data):
+    """Passes a new event to all interested hooks"""
+
+    event = None
+    for callback, events in _hooks:
+        if events is not None and name not in events:
+            continue
+        if event is None:
+            event = Event(name, _now_ns(), command, argv, pid, data)
+        callback(event)
@@ -0,0 +1,72 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import importlib
+import sys
+
+
+__all__ = ('set_lazy_attributes',)
+
+
+# NOTE(albartash): Module-level __getattr__ and __dir__ are supported
+#                  since Python 3.7 (PEP 562).
+_MODULE_GETATTR_SUPPORTED = sys.version_info >= (3, 7)
+
+
+def set_lazy_attributes(module_globals, attributes):
+    """Makes attributes of a module to be loaded on first access
+
+    attributes is a mapping of attribute name to either the name of a module
+    to import an attribute with the same name from, or a callable
+    returning the value. Loaded values are stored in module globals, so
+    they're resolved only once.
+
+    On Python versions without module __getattr__ all the attributes
+    are loaded immediately.
+    """
+
+    module_name = module_globals['__name__']
+
+    def __getattr__(name):
+        try:
+            loader = attributes[name]
+        except KeyError:
+            raise AttributeError(
+                "module '{}' has no attribute '{}'".format(module_name, name))
+        if callable(loader):
+            value = loader()
+        else:
+            value = getattr(importlib.import_module(loader), name)
+        module_globals[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(module_globals) | set(attributes))
+
+    if _MODULE_GETATTR_SUPPORTED:
+        module_globals['__getattr__'] = __getattr__
+        module_globals['__dir__'] = __dir__
+    else:
+        for name in attributes:
+            __getattr__(name)
@@ -22,10 +22,37 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
-__all__ = ('decode_stream',)
+import codecs
 
 
-def decode_stream(stream):
+__all__ = ('DEFAULT_ENCODING', 'decode_stream', 'iter_decode')
+
+
+DEFAULT_ENCODING = 'utf-8'
+
+
+def iter_decode(stream, encoding=None, errors='strict'):
+    """Decodes stream chunk by chunk and yields decoded strings
+
+    Multibyte characters split between chunks are decoded properly,
+    and the whole stream is never kept in memory.
+    """
+
+    decoder = codecs.getincrementaldecoder(encoding or DEFAULT_ENCODING)(
+        errors=errors)
+
+    chunks = getattr(stream, 'iter_chunks', None)
+    for chunk in chunks() if chunks else stream:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def decode_stream(stream, encoding=None, errors='strict'):
     """Decodes stream and returns as a single string"""
 
-    return ''.join(map(lambda s: s.decode(), stream))
+    return ''.join(iter_decode(stream, encoding=encoding, errors=errors))
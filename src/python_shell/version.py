@@ -22,13 +22,31 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
-import pkg_resources
+__all__ = ('get_version',)
 
 
-__all__ = ('get_version',)
+_DISTRIBUTION_NAME = 'python_shell'
+
+_version = None
+
+
+def _read_version():  # -> str
+    """Reads version of the installed distribution"""
+
+    try:
+        from importlib import metadata
+    except ImportError:
+        # NOTE(albartash): importlib.metadata is available since Python 3.8,
+        #                  so fall back to much slower pkg_resources.
+        import pkg_resources
+        return pkg_resources.require(_DISTRIBUTION_NAME)[0].version.strip()
+    return metadata.version(_DISTRIBUTION_NAME).strip()
 
 
 def get_version():
     """Retrieves version of the current root package"""
 
-    return pkg_resources.require('python_shell')[0].version.strip()
+    global _version
+    if _version is None:
+        _version = _read_version()
+    return _version
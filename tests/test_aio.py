@@ -0,0 +1,168 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import sys
+import time
+import unittest
+
+from python_shell.exceptions import ShellException
+from python_shell.shell import Shell
+from python_shell.util import is_python2_running
+from python_shell.util.streaming import decode_stream
+
+if not is_python2_running():
+    import asyncio
+    from python_shell.shell.processing import AsyncioProcess
+
+
+__all__ = ('AsyncioProcessTestCase', 'AsyncioCommandTestCase')
+
+
+@unittest.skipIf(is_python2_running(), "asyncio requires Python 3")
+class BaseAsyncioTestCase(unittest.TestCase):
+    """Base test case for running coroutines"""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+        # NOTE(albartash): Before Python 3.8, child processes are watched
+        #                  only for the loop attached to the watcher.
+        if sys.version_info < (3, 8):
+            asyncio.get_child_watcher().attach_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_coroutine(self, coroutine):
+        """Runs coroutine within the event loop and returns its result"""
+        return self.loop.run_until_complete(coroutine)
+
+    def read_lines(self, iterator):
+        """Reads all lines from asynchronous iterator"""
+        lines = []
+        while True:
+            try:
+                lines.append(self.run_coroutine(iterator.__anext__()))
+            except StopAsyncIteration:
+                return lines
+
+
+class AsyncioProcessTestCase(BaseAsyncioTestCase):
+    """Test case for asyncio process wrapper"""
+
+    def test_asyncio_process_completion(self):
+        """Check that process output is captured on completion"""
+        process = AsyncioProcess('echo', 'Hello')
+        self.run_coroutine(process.execute())
+
+        self.assertTrue(process.is_finished)
+        self.assertEqual(process.returncode, 0)
+        self.assertEqual(decode_stream(process.stdout), 'Hello\n')
+        self.assertEqual(self.read_lines(process.stdout), [b'Hello\n'])
+
+    def test_asyncio_process_streaming(self):
+        """Check that output of running process can be streamed"""
+        process = AsyncioProcess('printf', 'a\nb\n', wait=False)
+        self.run_coroutine(process.execute())
+
+        self.assertEqual(self.read_lines(process.stdout), [b'a\n', b'b\n'])
+        self.run_coroutine(process.wait())
+        self.assertEqual(process.returncode, 0)
+
+    def test_asyncio_process_consumers(self):
+        """Check that output is passed to consumers as it's read"""
+        chunks = []
+        process = AsyncioProcess('printf', 'a\nb\n', tee_stdout=chunks.append)
+        self.run_coroutine(process.execute())
+        self.assertEqual(b''.join(chunks), b'a\nb\n')
+        self.assertEqual(decode_stream(process.stdout), 'a\nb\n')
+
+        process = AsyncioProcess('true', tee_stdout=chunks.append,
+                                 wait=False)
+        with self.assertRaises(ValueError):
+            self.run_coroutine(process.execute())
+
+    def test_asyncio_process_fork_server(self):
+        """Check that fork server is rejected within event loop"""
+        process = AsyncioProcess('true', spawn='forkserver')
+        with self.assertRaises(ValueError):
+            self.run_coroutine(process.execute())
+
+    def test_asyncio_process_termination(self):
+        """Check that process can be terminated"""
+        process = AsyncioProcess('sleep', '10', wait=False)
+        self.run_coroutine(process.execute())
+        self.run_coroutine(process.terminate())
+        self.assertTrue(process.is_terminated)
+
+    def test_asyncio_process_cancellation(self):
+        """Check that process is killed when coroutine is cancelled"""
+        process = AsyncioProcess('sleep', '10')
+        started = time.time()
+        with self.assertRaises(asyncio.TimeoutError):
+            self.run_coroutine(asyncio.wait_for(process.execute(), 0.2))
+
+        # NOTE(albartash): Before Python 3.7, wait_for() doesn't wait
+        #                  for the cancelled coroutine to be completed.
+        self.run_coroutine(process.wait())
+        self.assertLess(time.time() - started, 5)
+        self.assertEqual(process.returncode, -9)
+
+
+class AsyncioCommandTestCase(BaseAsyncioTestCase):
+    """Test case for running commands with asyncio"""
+
+    def test_command_run_async(self):
+        """Check that command can be awaited"""
+        command = self.run_coroutine(Shell.echo('Hello', run_async=True))
+        self.assertEqual(command.return_code, 0)
+        self.assertEqual(decode_stream(command.output), 'Hello\n')
+
+    def test_command_run_async_failure(self):
+        """Check that failed command raises ShellException"""
+        with self.assertRaises(ShellException):
+            self.run_coroutine(Shell.false(run_async=True))
+
+    def test_command_run_async_timeout(self):
+        """Check that timeout of command kills the process"""
+        with self.assertRaises(asyncio.TimeoutError):
+            self.run_coroutine(
+                Shell.sleep('10', run_async=True, timeout=0.2))
+
+    def test_command_future(self):
+        """Check that futures of results are completed by the event loop"""
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(asyncio.set_event_loop, None)
+
+        result = self.run_coroutine(Shell.sh(
+            '-c', 'sleep 0.1; echo done', run_async=True, wait=False))
+        with self.assertRaises(TypeError):
+            Shell.wait_any([result])
+        self.assertIs(
+            self.run_coroutine(asyncio.wrap_future(result.future)), result)
+        self.assertEqual(decode_stream(result.output), 'done\n')
+
+        failed = self.run_coroutine(Shell.false(run_async=True, wait=False))
+        with self.assertRaises(ShellException):
+            self.run_coroutine(asyncio.wrap_future(failed.future))
@@ -0,0 +1,161 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from concurrent import futures
+
+from python_shell.exceptions import CommandDoesNotExist
+from python_shell.exceptions import ShellException
+from python_shell.shell import Shell
+from python_shell.util import is_python2_running
+from python_shell.util.streaming import decode_stream
+
+
+__all__ = ('BatchTestCase', 'CompletionTestCase')
+
+
+class BatchTestCase(unittest.TestCase):
+    """Test case for running commands in parallel"""
+
+    def test_map_ordered(self):
+        """Check that results are yielded in submission order"""
+        commands = Shell.map(Shell.echo, range(20), parallelism=4)
+        self.assertEqual(
+            [decode_stream(command.output) for command in commands],
+            ['{}\n'.format(i) for i in range(20)])
+
+    def test_map_unordered(self):
+        """Check that results are yielded as they complete"""
+        delays = [('-c', 'sleep {}; echo {}'.format(0.1 * i, i))
+                  for i in (3, 1, 2)]
+        commands = Shell.map(Shell.sh, delays, parallelism=3, ordered=False)
+        self.assertEqual(
+            [decode_stream(command.output) for command in commands],
+            ['1\n', '2\n', '3\n'])
+
+    def test_run_many_parallelism(self):
+        """Check that commands are run in parallel"""
+        started = time.time()
+        commands = list(Shell.run_many(
+            [Shell.sleep.bind(0.3) for _ in range(4)], parallelism=4))
+        self.assertLess(time.time() - started, 1.2)
+        self.assertEqual([c.return_code for c in commands], [0] * 4)
+
+    def test_run_many_fail_fast(self):
+        """Check that the first failure stops the batch"""
+        with self.assertRaises(ShellException) as context:
+            list(Shell.run_many([Shell.true, Shell.false.bind()]))
+        self.assertEqual(context.exception.command.return_code, 1)
+
+    def test_run_many_fail_fast_terminates(self):
+        """Check that commands still running are terminated on failure"""
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        pid_files = [os.path.join(folder, str(i)) for i in range(2)]
+        commands = [Shell.sh.bind('-c', 'echo $$ > {}; exec sleep 10'.format(
+            path)) for path in pid_files]
+        commands.append(Shell.sh.bind('-c', 'sleep 0.3; exit 1'))
+
+        with self.assertRaises(ShellException):
+            list(Shell.run_many(commands, parallelism=3, ordered=False))
+        for path in pid_files:
+            with open(path) as f:
+                pid = int(f.read())
+            started = time.time()
+            while time.time() - started < 5:
+                try:
+                    os.kill(pid, 0)
+                except OSError:
+                    break
+                time.sleep(0.01)
+            with self.assertRaises(OSError):
+                os.kill(pid, 0)
+
+    @unittest.skipIf(is_python2_running(), "Timeouts require Python 3")
+    def test_run_many_collect_all(self):
+        """Check that failed commands are yielded with collect-all policy"""
+        commands = Shell.run_many(
+            [Shell.true, Shell.false.bind(), Shell.sleep.bind(5)],
+            fail_fast=False,
+            timeout=0.3
+        )
+        self.assertEqual([c.return_code for c in commands], [0, 1, -15])
+
+    def test_run_many_missing_command(self):
+        """Check that missing command always stops the batch"""
+        with self.assertRaises(CommandDoesNotExist):
+            list(Shell.run_many([Shell('2echo').bind()], fail_fast=False))
+
+    def test_run_many_pipelines(self):
+        """Check that pipelines can be run in batch"""
+        pipelines = [Shell.echo.bind(i) | Shell.cat for i in range(3)]
+        self.assertEqual(
+            [decode_stream(p.output) for p in Shell.run_many(pipelines)],
+            ['0\n', '1\n', '2\n'])
+
+
+class CompletionTestCase(unittest.TestCase):
+    """Test case for waiting for commands running in background"""
+
+    def test_future(self):
+        """Check that futures are completed with results of commands"""
+        command = Shell.sh('-c', 'sleep 0.1; echo done', wait=False)
+        self.assertIs(command.future, command.future)
+        self.assertIs(command.future.result(timeout=5), command)
+        self.assertEqual(decode_stream(command.output), 'done\n')
+
+        command = Shell.sh('-c', 'echo error >&2; exit 3', wait=False)
+        with self.assertRaises(ShellException) as context:
+            command.future.result(timeout=5)
+        self.assertEqual(context.exception.stderr_tail, b'error\n')
+
+        command = Shell.false(wait=False, check=False)
+        self.assertIs(command.future.result(timeout=5), command)
+        command = Shell.true()
+        self.assertIs(command.future.result(timeout=0), command)
+
+    def test_as_completed(self):
+        """Check that results are yielded in order of completion"""
+        commands = [Shell.sh('-c', 'sleep {}; exit {}'.format(0.1 * i, i),
+                             wait=False, check=False)
+                    for i in (3, 1, 2)]
+        self.assertEqual(
+            [c.return_code for c in Shell.as_completed(commands)],
+            [1, 2, 3])
+
+        commands = [Shell.sleep(0.5, wait=False)]
+        with self.assertRaises(futures.TimeoutError):
+            list(Shell.as_completed(commands, timeout=0.1))
+
+    def test_wait_any(self):
+        """Check that the first completed command is returned"""
+        commands = [Shell.sleep(0.5, wait=False),
+                    Shell.sh('-c', 'sleep 0.1', wait=False)]
+        self.assertIs(Shell.wait_any(commands, timeout=5), commands[1])
+        self.assertIsNone(Shell.wait_any(commands[:1], timeout=0.1))
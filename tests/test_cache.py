@@ -0,0 +1,230 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from python_shell.command import ResultCache
+from python_shell.command.cache import make_key
+from python_shell.exceptions import ShellException
+from python_shell.shell import Shell
+from python_shell.util import Subprocess
+
+
+__all__ = ('ResultCacheTestCase', 'CachedCommandTestCase')
+
+
+class ResultCacheTestCase(unittest.TestCase):
+    """Test case for the cache of command results"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_get_and_put(self):
+        """Check that stored entries are returned"""
+        cache = ResultCache()
+        self.assertIsNone(cache.get('key'))
+        cache.put('key', 0, b'out', b'err')
+
+        entry = cache.get('key')
+        self.assertEqual((entry.returncode, entry.stdout, entry.stderr),
+                         (0, b'out', b'err'))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        """Check that least recently used entries are evicted"""
+        cache = ResultCache(max_entries=2)
+        cache.put('first', 0, b'', b'')
+        cache.put('second', 0, b'', b'')
+        cache.get('first')
+        cache.put('third', 0, b'', b'')
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('second'))
+        self.assertIsNotNone(cache.get('first'))
+
+    def test_size_limit(self):
+        """Check that total size of entries is limited"""
+        cache = ResultCache(max_size=10)
+        cache.put('first', 0, b'x' * 6, b'')
+        cache.put('second', 0, b'x' * 6, b'')
+        cache.put('huge', 0, b'x' * 11, b'')
+
+        self.assertIsNone(cache.get('first'))
+        self.assertIsNotNone(cache.get('second'))
+        self.assertIsNone(cache.get('huge'))
+
+    def test_ttl(self):
+        """Check that expired entries are not returned"""
+        cache = ResultCache(ttl=60)
+        cache.put('expired', 0, b'', b'', ttl=0)
+        cache.put('fresh', 0, b'', b'')
+
+        self.assertIsNone(cache.get('expired'))
+        self.assertIsNotNone(cache.get('fresh'))
+
+    def test_disk(self):
+        """Check that entries are shared via disk"""
+        key = make_key('echo', ['out'])
+        ResultCache(path=self.folder).put(key, 1, b'out', b'err')
+
+        cache = ResultCache(path=self.folder)
+        self.assertEqual(cache.get(key).stdout, b'out')
+
+        # NOTE(albartash): Files of others are kept in the folder
+        with open(os.path.join(self.folder, 'notes.txt'), 'w') as f:
+            f.write('keep')
+        cache.invalidate()
+        self.assertEqual(os.listdir(self.folder), ['notes.txt'])
+        self.assertIsNone(ResultCache(path=self.folder).get(key))
+
+    def test_disk_permissions(self):
+        """Check that cached outputs are readable by the owner only"""
+        path = os.path.join(self.folder, 'results')
+        ResultCache(path=path).put('key', 0, b'secret', b'')
+
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o700)
+        self.assertEqual(
+            os.stat(os.path.join(path, 'key')).st_mode & 0o777, 0o600)
+        self.assertEqual(os.listdir(path), ['key'])
+
+    def test_disk_ttl(self):
+        """Check that expired entries are removed from disk"""
+        ResultCache(path=self.folder).put('key', 0, b'', b'', ttl=0)
+
+        self.assertIsNone(ResultCache(path=self.folder).get('key'))
+        self.assertEqual(os.listdir(self.folder), [])
+
+    def test_make_key(self):
+        """Check that key depends on everything affecting the output"""
+        path = os.path.join(self.folder, 'input')
+        with open(path, 'w') as f:
+            f.write('first')
+
+        key = make_key('/bin/cat', [path], inputs=[path])
+        self.assertEqual(key, make_key('/bin/cat', [path], inputs=[path]))
+
+        other_keys = [
+            make_key('/bin/cat', []),
+            make_key('/bin/cat', [path], env={}),
+            make_key('/bin/cat', [path], cwd=self.folder),
+            make_key('/usr/bin/cat', [path], inputs=[path]),
+        ]
+        with open(path, 'w') as f:
+            f.write('second')
+        other_keys.append(make_key('/bin/cat', [path], inputs=[path]))
+
+        self.assertNotIn(key, other_keys)
+        self.assertEqual(len(set(other_keys)), len(other_keys))
+
+    def test_make_key_hashes(self):
+        """Check that input files can be compared by content"""
+        path = os.path.join(self.folder, 'input')
+        with open(path, 'w') as f:
+            f.write('content')
+        key = make_key('cat', [], inputs=[path], hash_inputs=True)
+
+        os.utime(path, (0, 0))
+        self.assertEqual(
+            key, make_key('cat', [], inputs=[path], hash_inputs=True))
+
+
+class CachedCommandTestCase(unittest.TestCase):
+    """Test case for running commands with cached results"""
+
+    def setUp(self):
+        self.cache = ResultCache()
+
+    def test_cached_view(self):
+        """Check that results are reused by Shell.cached()"""
+        shell = Shell.cached(cache=self.cache)
+        first = shell.date('+%s%N')
+        time.sleep(0.01)
+        second = shell.date('+%s%N')
+
+        self.assertEqual(first.text, second.text)
+        self.assertIsNot(first, second)
+        self.assertEqual(second.return_code, 0)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(Shell.last_command, second)
+
+        self.assertNotEqual(shell.date('+%s%N', cache=False).text,
+                            first.text)
+
+    def test_cache_option(self):
+        """Check that results are cached by option"""
+        first = Shell.date('+%s%N', cache=self.cache)
+        time.sleep(0.01)
+        self.assertNotEqual(Shell.date('+%s%N').text, first.text)
+        self.assertEqual(Shell.date('+%s%N', cache=self.cache).text,
+                         first.text)
+
+    def test_inputs(self):
+        """Check that changing input files invalidates results"""
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        shell = Shell.cached(cache=self.cache)
+
+        self.assertEqual(shell.cat(path).text, '')
+        self.assertEqual(shell.cat(path, cache_inputs=[path]).text, '')
+        with open(path, 'w') as f:
+            f.write('data')
+
+        self.assertEqual(shell.cat(path, cache_inputs=[path]).text, 'data')
+        self.assertEqual(shell.cat(path).text, '')  # Stale result
+
+    def test_merged_stderr(self):
+        """Check that results with merged stderr are cached separately"""
+        shell = Shell.cached(cache=self.cache)
+        script = 'echo out; echo err >&2'
+        self.assertEqual(shell.sh('-c', script).text, 'out\n')
+
+        merged = shell.sh('-c', script, stderr=Subprocess.STDOUT)
+        self.assertEqual(merged.text, 'out\nerr\n')
+        self.assertEqual(b''.join(merged.errors), b'')
+        self.assertEqual(self.cache.hits, 0)
+
+        merged = shell.sh('-c', script, stderr=Subprocess.STDOUT)
+        self.assertEqual(merged.text, 'out\nerr\n')
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_failed_command(self):
+        """Check that failed results are not cached"""
+        shell = Shell.cached(cache=self.cache)
+        with self.assertRaises(ShellException):
+            shell.false()
+        self.assertEqual(shell.false(check=False).return_code, 1)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_requires_waiting(self):
+        """Check that results of background commands are not cached"""
+        with self.assertRaises(ValueError):
+            Shell.cached(cache=self.cache).sleep('0', wait=False)
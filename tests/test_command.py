@@ -22,17 +22,26 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+import io
+import itertools
 import os
 import tempfile
 import time
 import unittest
 
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
 from python_shell.command import Command
+from python_shell.command import CommandResult
 from python_shell.exceptions import CommandDoesNotExist
+from python_shell.exceptions import ShellException
 from python_shell.util.streaming import decode_stream
 
 
-__all__ = ('CommandTestCase',)
+__all__ = ('CommandTestCase', 'CommandInputTestCase')
 
 
 class CommandTestCase(unittest.TestCase):
@@ -85,3 +94,153 @@ class CommandTestCase(unittest.TestCase):
 
         self.assertEqual(cmd.command, cmd_name)
         self.assertEqual(cmd.arguments, ' '.join(args))
+
+    def test_command_text(self):
+        """Check that decoded output is cached"""
+        command = Command('printf')('first\nsecond\n')
+        self.assertEqual(command.text, 'first\nsecond\n')
+        self.assertIs(command.text, command.text)
+        self.assertEqual(command.lines, ['first', 'second'])
+
+        command = command('third')
+        self.assertEqual(command.lines, ['third'])
+
+        command = command('a\fb\r\n\nc\x1cd\n')
+        self.assertEqual(command.lines, ['a\fb', '', 'c\x1cd'])
+        self.assertEqual(command('').lines, [])
+
+    def test_command_text_encoding(self):
+        """Check that output encoding can be configured"""
+        command = Command('printf')('\\377caf\\351',
+                                    encoding='latin-1')
+        self.assertEqual(command.text, u'\xffcaf\xe9')
+
+        command = command('\\377', encoding_errors='replace')
+        self.assertEqual(command.text, u'\ufffd')
+
+    def test_command_json(self):
+        """Check that output can be parsed as JSON"""
+        command = Command('echo')('{"key": [1, 2]}')
+        self.assertEqual(command.json(), {'key': [1, 2]})
+
+    def test_command_results(self):
+        """Check that every run of command returns its own result"""
+        command = Command('printf')
+        self.assertRaises(AttributeError, lambda: command.return_code)
+
+        first = command('first')
+        second = command('second')
+        self.assertIsInstance(first, CommandResult)
+        self.assertIsNot(first, second)
+        self.assertEqual(first.text, 'first')
+        self.assertEqual(second.text, 'second')
+        self.assertEqual(str(first), 'printf first')
+
+        self.assertIs(command.last_result, second)
+        self.assertEqual(command.text, 'second')
+        self.assertEqual(command.arguments, 'second')
+
+        other = Command('printf')('other')
+        self.assertIs(command.last_result, second)
+        self.assertIs(other._command.last_result, other)
+
+    @unittest.skipIf(contextvars is None, "Requires contextvars")
+    def test_command_results_in_contexts(self):
+        """Check that every context (e.g. asyncio task) has own results"""
+        command = Command('printf')
+        outer = command('outer')
+        context = contextvars.copy_context()
+        inner = context.run(command, 'inner')
+
+        self.assertIs(command.last_result, outer)
+        self.assertIs(context.run(lambda: command.last_result), inner)
+        self.assertIsNone(Command('printf').last_result)
+
+    def test_command_resource_usage(self):
+        """Check that command exposes resources it has used"""
+        command = Command('ls')('-l')
+        usage = command.resource_usage
+        if usage is None:
+            self.skipTest("Resource usage is not supported")
+        self.assertGreater(usage.wall_time, 0)
+        self.assertGreater(usage.max_rss, 0)
+
+    def test_context_manager(self):
+        """Check that running command is terminated by with statement"""
+        with Command('sleep')(10, wait=False) as result:
+            self.assertIsNone(result.return_code)
+        self.assertEqual(result.return_code, -15)
+
+        with Command('echo')('done') as result:
+            pass
+        self.assertEqual(result.text, 'done\n')
+
+
+class CommandInputTestCase(unittest.TestCase):
+    """Test case for passing input to commands"""
+
+    def test_no_input(self):
+        """Check that commands reading stdin don't wait without input"""
+        self.assertEqual(Command('cat')().text, '')
+
+    def test_data_input(self):
+        """Check that bytes and text are written into stdin"""
+        self.assertEqual(Command('cat')(input=b'bytes').text, 'bytes')
+        self.assertEqual(Command('cat')(input=u'text').text, 'text')
+
+    def test_iterable_input(self):
+        """Check that input larger than pipe buffer is streamed"""
+        chunks = (b'x' * 1024 for _ in range(1024))
+        self.assertEqual(Command('wc')('-c', input=chunks).text.strip(),
+                         str(1024 * 1024))
+
+    def test_file_input(self):
+        """Check that files are used as stdin"""
+        with tempfile.TemporaryFile() as f:
+            f.write(b'file')
+            f.seek(0)
+            self.assertEqual(Command('cat')(input=f).text, 'file')
+            f.seek(0)
+            self.assertEqual(Command('cat')(input=f.fileno()).text, 'file')
+
+        stream = io.BytesIO(b'memory')
+        self.assertEqual(Command('cat')(input=stream).text, 'memory')
+
+    def test_unread_input(self):
+        """Check that input is not written after the command exits"""
+        chunks = itertools.repeat(b'y' * 1024)
+        self.assertEqual(Command('head')('-c', 3, input=chunks).text, 'yyy')
+
+    def test_background_input(self):
+        """Check that input is written into commands not waited for"""
+        command = Command('cat')(input=b'background', wait=False)
+        self.assertEqual(b''.join(command.output), b'background')
+
+    def test_stdin_and_input(self):
+        """Check that stdin and input cannot be used together"""
+        with self.assertRaises(ValueError):
+            Command('cat')(input=b'', stdin=None)
+
+    def test_transform(self):
+        """Check that data is streamed through the command"""
+        chunks = (b'abc' * 1024 for _ in range(1024))
+        output = b''.join(Command('tr').transform(chunks, 'a-z', 'A-Z'))
+        self.assertEqual(output, b'ABC' * 1024 * 1024)
+
+        bound = Command('tr').bind('a-z', 'A-Z')
+        self.assertEqual(list(bound.transform([u'text'])), [b'TEXT'])
+
+    def test_transform_errors(self):
+        """Check that failures of transforming commands are raised"""
+        command = Command('sh')
+        with self.assertRaises(ShellException):
+            list(command.transform([b'data'], '-c', 'cat; exit 3'))
+        self.assertEqual(command.return_code, 3)
+
+    def test_transform_close(self):
+        """Check that the command is stopped when iteration is stopped"""
+        command = Command('cat')
+        chunks = command.transform(itertools.repeat(b'z' * 1024))
+        next(chunks)
+        chunks.close()
+        self.assertIsNotNone(command.return_code)
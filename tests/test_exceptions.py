@@ -26,6 +26,7 @@ import time
 import unittest
 
 from python_shell.command import Command
+from python_shell.command import Pipeline
 from python_shell.shell.processing.process import AsyncProcess
 from python_shell.shell.processing.process import SyncProcess
 from python_shell import exceptions
@@ -73,3 +74,34 @@ class ExceptionTestCase(unittest.TestCase):
                 self.assertEqual(error, str(e))
             else:
                 self.fail("RunProcessError was not thrown")
+
+    def test_output_tails(self):
+        """Check that tails of output are attached to ShellException"""
+
+        script = ('for i in $(seq 1000); do echo "out $i"; '
+                  'echo "error $i" >&2; done; exit 3')
+        command = Command('sh')
+        with self.assertRaises(exceptions.ShellException) as context:
+            command('-c', script, tail_size=30, tail_stdout=True,
+                    capture_stderr=False)
+
+        error = context.exception
+        self.assertEqual(error.stderr_tail, b'error 999\nerror 1000\n')
+        self.assertEqual(error.stdout_tail, b'out 998\nout 999\nout 1000\n')
+        self.assertTrue(str(error).endswith('\nerror 999\nerror 1000'))
+        self.assertEqual(command.errors_view.tobytes(),
+                         b'rror 998\nerror 999\nerror 1000\n')
+
+        with self.assertRaises(exceptions.ShellException) as context:
+            command('-c', 'exit 1', tail_size=0)
+        self.assertIsNone(context.exception.stderr_tail)
+        self.assertIsNone(context.exception.stdout_tail)
+
+    def test_pipeline_tail(self):
+        """Check that stderr tail of pipelines is attached to ShellException"""
+
+        pipeline = Pipeline(Command('sh').bind('-c', 'echo oops >&2'),
+                            Command('sh').bind('-c', 'cat; exit 2'))
+        with self.assertRaises(exceptions.ShellException) as context:
+            pipeline()
+        self.assertEqual(context.exception.stderr_tail, b'oops\n')
@@ -0,0 +1,144 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import unittest
+
+from python_shell.command import Command
+from python_shell.exceptions import CommandDoesNotExist
+from python_shell.exceptions import ShellException
+from python_shell.shell.processing.process import AsyncProcess
+from python_shell.util import hooks
+from python_shell.util import is_python2_running
+
+
+__all__ = ('HooksTestCase',)
+
+
+class HooksTestCase(unittest.TestCase):
+    """Test case for hooks of command execution"""
+
+    def setUp(self):
+        self.events = []
+        hooks.add_hook(self.events.append)
+
+    def tearDown(self):
+        hooks.remove_hook(self.events.append)
+
+    def _get_names(self):  # -> list
+        return [event.name for event in self.events]
+
+    def test_command_events(self):
+        """Check events of successful command"""
+        result = Command('echo')('hello')
+
+        names = self._get_names()
+        if is_python2_running():
+            # NOTE(albartash): Output is not read by blocks on Python 2,
+            #                  so the first byte is not reported.
+            names.insert(3, hooks.EVENT_FIRST_BYTE)
+        else:
+            first_byte = self.events.pop(3)
+            self.assertEqual(first_byte.data, {'stream': 'stdout'})
+
+        self.assertEqual(names, [
+            hooks.EVENT_RESOLVE_START,
+            hooks.EVENT_RESOLVE_END,
+            hooks.EVENT_SPAWN,
+            hooks.EVENT_FIRST_BYTE,
+            hooks.EVENT_EXIT,
+        ])
+        timestamps = [event.timestamp for event in self.events]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+        resolve_end, spawn, exit_event = self.events[1:]
+        self.assertTrue(resolve_end.data['executable'].endswith('echo'))
+        self.assertEqual(spawn.argv, ['echo', 'hello'])
+        self.assertEqual(spawn.pid, result._process._process.pid)
+        self.assertEqual(exit_event.data, {
+            'return_code': 0,
+            'stdout_bytes': len(b'hello\n'),
+            'stderr_bytes': 0,
+        })
+
+    def test_failed_command_events(self):
+        """Check events of command returned non-zero code"""
+        with self.assertRaises(ShellException):
+            Command('false')()
+
+        self.assertEqual(self._get_names()[-2:],
+                         [hooks.EVENT_EXIT, hooks.EVENT_ERROR])
+        self.assertEqual(self.events[-2].data['return_code'], 1)
+        self.assertIsInstance(self.events[-1].data['exception'],
+                              ShellException)
+
+    def test_missing_command_events(self):
+        """Check events of command which does not exist"""
+        with self.assertRaises(CommandDoesNotExist):
+            Command('random_command_for_hooks')()
+
+        self.assertEqual(self._get_names(), [
+            hooks.EVENT_RESOLVE_START,
+            hooks.EVENT_RESOLVE_END,
+            hooks.EVENT_ERROR,
+        ])
+        self.assertIsNone(self.events[1].data['executable'])
+        self.assertEqual(self.events[2].command, 'random_command_for_hooks')
+
+    def test_background_process_exit(self):
+        """Check that exit of background process is reported once"""
+        process = AsyncProcess('true')
+        process.execute()
+        process.wait()
+        process.wait()
+
+        self.assertEqual(self._get_names(),
+                         [hooks.EVENT_SPAWN, hooks.EVENT_EXIT])
+
+    def test_events_filter(self):
+        """Check that hook gets only events it's interested in"""
+        exits = []
+        hooks.add_hook(exits.append, events=[hooks.EVENT_EXIT])
+        try:
+            Command('true')()
+        finally:
+            hooks.remove_hook(exits.append)
+
+        self.assertEqual([event.name for event in exits], [hooks.EVENT_EXIT])
+        self.assertIn(hooks.EVENT_SPAWN, self._get_names())
+
+    def test_disabled_hooks(self):
+        """Check that no events are built without hooks"""
+        hooks.remove_hook(self.events.append)
+        self.assertFalse(hooks.enabled)
+
+        def _fail(*args, **kwargs):
+            raise AssertionError('Event is emitted')
+
+        emit, hooks.emit = hooks.emit, _fail
+        try:
+            Command('echo')('hello')
+            with self.assertRaises(ShellException):
+                Command('false')()
+        finally:
+            hooks.emit = emit
@@ -0,0 +1,139 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import unittest
+
+from python_shell.command import Pipeline
+from python_shell.command import PipelineResult
+from python_shell.exceptions import CommandDoesNotExist
+from python_shell.exceptions import ShellException
+from python_shell.shell import Shell
+from python_shell.util.streaming import decode_stream
+
+
+__all__ = ('PipelineTestCase',)
+
+
+class PipelineTestCase(unittest.TestCase):
+    """Test case for pipelines of commands"""
+
+    def test_pipeline_output(self):
+        """Check that output is passed through all commands"""
+        pipeline = Pipeline(Shell.printf.bind('a\nb\nab\n'),
+                            Shell.grep.bind('a'),
+                            Shell.wc.bind('-l'))()
+        self.assertEqual(decode_stream(pipeline.output).strip(), '2')
+        self.assertEqual(pipeline.return_codes, [0, 0, 0])
+        self.assertEqual(pipeline.return_code, 0)
+
+    def test_pipeline_input(self):
+        """Check that input is written into the first command"""
+        pipeline = Shell.tr.bind('a-z', 'A-Z') | Shell.rev.bind()
+        self.assertEqual(pipeline(input=b'hello\n').text, 'OLLEH\n')
+
+    def test_pipeline_results(self):
+        """Check that every run of pipeline returns its own result"""
+        pipeline = Shell.cat.bind() | Shell.wc.bind('-c')
+        self.assertRaises(AttributeError, lambda: pipeline.return_code)
+
+        first = pipeline(input=b'first')
+        second = pipeline(input=b'second!')
+        self.assertIsInstance(first, PipelineResult)
+        self.assertIsNot(first, second)
+        self.assertEqual(first.text.strip(), '5')
+        self.assertEqual(second.text.strip(), '7')
+        self.assertEqual(str(first), 'cat | wc -c')
+
+        self.assertIs(pipeline.last_result, second)
+        self.assertEqual(pipeline.text.strip(), '7')
+        self.assertEqual(pipeline.return_codes, [0, 0])
+
+    def test_pipeline_representation(self):
+        """Check pipeline string representation"""
+        pipeline = Shell.cat.bind('/etc/hosts') | Shell.wc
+        self.assertIsInstance(pipeline, Pipeline)
+        self.assertEqual(str(pipeline), 'cat /etc/hosts | wc')
+
+    def test_pipeline_return_codes(self):
+        """Check return codes of pipeline without and with pipefail"""
+        pipeline = Shell.false.bind() | Shell.cat.bind()
+        pipeline()
+        self.assertEqual(pipeline.return_codes, [1, 0])
+        self.assertEqual(pipeline.return_code, 0)
+
+        with self.assertRaises(ShellException) as context:
+            pipeline(pipefail=True)
+        self.assertEqual(str(context.exception),
+                         'Shell command "false | cat" failed '
+                         'with return code 1')
+
+    def test_pipeline_early_exit(self):
+        """Check that pipeline completes when reader exits early"""
+        pipeline = (Shell.yes.bind() | Shell.head.bind('-n', 2))()
+        self.assertEqual(decode_stream(pipeline.output), 'y\ny\n')
+        self.assertEqual(pipeline.return_code, 0)
+
+    def test_pipeline_errors(self):
+        """Check that stderr of all commands is collected"""
+        pipeline = Pipeline(Shell.ls.bind('/nofolder_pipeline'),
+                            Shell.cat.bind('/nofile_pipeline'))
+        pipeline(check=False)
+        errors = decode_stream(pipeline.errors)
+        for part in ('/nofolder_pipeline', '/nofile_pipeline'):
+            self.assertIn(part, errors)
+
+    def test_pipeline_errors_capture(self):
+        """Check that stderr is captured with options of the last command"""
+        writer = Shell.sh.bind('-c', 'head -c 100000 /dev/zero >&2')
+
+        result = (writer | Shell.cat.bind(spill_threshold=1024))()
+        self.assertTrue(result._errors_buffer.is_spilled)
+        self.assertEqual(len(result._errors_buffer.getvalue()), 100000)
+        result.release()
+
+        result = (writer | Shell.cat.bind(capture_stderr=False,
+                                          tail_size=1024))()
+        self.assertEqual(len(result._errors_buffer.getvalue()), 1024)
+
+    def test_pipeline_non_existing_command(self):
+        """Check that pipeline with missing command is not run"""
+        pipeline = Shell.yes.bind() | Shell('2echo').bind()
+        with self.assertRaises(CommandDoesNotExist):
+            pipeline()
+        self.assertIsNone(pipeline.last_result._processes)
+
+    def test_pipeline_resource_usage(self):
+        """Check that usage of all commands is aggregated"""
+        pipeline = Shell.seq.bind('1', '100000') | Shell.wc.bind('-l')
+        pipeline()
+        usage = pipeline.resource_usage
+        if usage is None:
+            self.skipTest("Resource usage is not supported")
+
+        self.assertGreater(usage.cpu_time, 0)
+        self.assertGreaterEqual(usage.wall_time, 0)
+        self.assertEqual(
+            usage.max_rss,
+            max(process.resource_usage.max_rss
+                for process in pipeline.last_result._processes))
@@ -22,16 +22,45 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+import errno
+import gc
+import io
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
 import time
 import unittest
 
+from python_shell.exceptions import RunProcessError
+from python_shell.shell.processing.capture import OutputBuffer
+from python_shell.shell.processing.capture import SpillBuffer
+from python_shell.shell.processing.children import ChildRegistry
+from python_shell.shell.processing.children import count_open_fds
+from python_shell.shell.processing.children import get_child_registry
+from python_shell.shell.processing.completion import CompletionTracker
+from python_shell.shell.processing.forkserver import ForkServer
+from python_shell.shell.processing.forkserver import ForkServerPopen
+from python_shell.shell.processing.ioloop import IOLoop
+from python_shell.shell.processing.process import _Popen
+from python_shell.shell.processing.process import Append
 from python_shell.shell.processing.process import AsyncProcess
 from python_shell.shell.processing.process import Process
 from python_shell.shell.processing.process import StreamIterator
 from python_shell.shell.processing.process import SyncProcess
 from python_shell.shell.processing.process import Subprocess
+from python_shell.shell.processing.tee import Lines
+from python_shell.shell.processing.usage import ResourceUsage
+from python_shell.shell.processing.watchdog import Watchdog
+from python_shell.util import is_python2_running
 from python_shell.util.streaming import decode_stream
 
+if not is_python2_running():
+    from unittest import mock
+
 
 class FakeBaseProcess(Process):
     """Fake Process implementation"""
@@ -93,6 +122,29 @@ class SyncProcessTestCase(unittest.TestCase):
         #                  as SyncProcess blocks main thread.
         self._test_sync_process_not_initialized()
 
+    def test_sync_process_large_output(self):
+        """Check that SyncProcess does not hang on outputs larger
+        than pipe buffer"""
+        size = 1024 * 1024
+        process = SyncProcess(
+            'sh', '-c', 'head -c {0} /dev/zero; head -c {0} /dev/zero >&2'
+            .format(size))
+        self.processes.append(process)
+        process.execute()
+
+        self.assertEqual(process.returncode, 0)
+        self.assertEqual(sum(map(len, process.stdout)), size)
+        self.assertEqual(sum(map(len, process.stderr)), size)
+
+    def test_sync_process_output_is_reusable(self):
+        """Check that captured output of SyncProcess can be read twice"""
+        process = SyncProcess('echo', 'Hello')
+        self.processes.append(process)
+        process.execute()
+
+        self.assertEqual(decode_stream(process.stdout), 'Hello\n')
+        self.assertEqual(decode_stream(process.stdout), 'Hello\n')
+
     def test_sync_process_termination(self):
         """Check that SyncProcess can be terminated properly"""
         self.skipTest("TODO")
@@ -203,3 +255,838 @@ class StreamIteratorTestCase(unittest.TestCase):
         stream = StreamIterator(stream=None)
         with self.assertRaises(StopIteration):
             next(stream)
+
+    def _make_stream(self, read_size=4):
+        """Returns iterator over a stream with lines split between blocks"""
+        return StreamIterator(stream=io.BytesIO(self.DATA),
+                              read_size=read_size)
+
+    DATA = b'first\nsecond line\n\nlast'
+
+    def test_lines(self):
+        """Check that lines are split properly regardless of block size"""
+        for read_size in (1, 4, 64 * 1024):
+            self.assertEqual(
+                list(self._make_stream(read_size)),
+                [b'first\n', b'second line\n', b'\n', b'last'])
+
+    def test_long_lines(self):
+        """Check lines spanning many blocks"""
+        data = b'a' * 100 + b'\n' + b'b' * 100
+        stream = StreamIterator(stream=io.BytesIO(data), read_size=8)
+        self.assertEqual(list(stream), [b'a' * 100 + b'\n', b'b' * 100])
+
+    def test_next_line(self):
+        """Check that lines can be retrieved one by one"""
+        stream = self._make_stream()
+        self.assertEqual(next(stream), b'first\n')
+        self.assertEqual(list(stream), [b'second line\n', b'\n', b'last'])
+
+    def test_chunks(self):
+        """Check that stream can be read by chunks"""
+        chunks = list(self._make_stream().iter_chunks(5))
+        self.assertTrue(all(len(chunk) <= 5 for chunk in chunks))
+        self.assertEqual(b''.join(chunks), self.DATA)
+
+    def test_chunks_after_lines(self):
+        """Check that already read data is not lost when reading chunks"""
+        stream = self._make_stream(read_size=64)
+        self.assertEqual(next(stream), b'first\n')
+        self.assertEqual(b''.join(stream.iter_chunks()),
+                         self.DATA[len(b'first\n'):])
+
+    def test_chunks_split_pending(self):
+        """Check that data read for lines is split into chunks of size"""
+        stream = self._make_stream(read_size=64)
+        self.assertEqual(next(stream), b'first\n')
+        chunks = list(stream.iter_chunks(4))
+        self.assertEqual(chunks, [b'seco', b'nd l', b'ine\n', b'\nlas', b't'])
+
+    def test_batches(self):
+        """Check that lines can be retrieved by batches"""
+        self.assertEqual(
+            list(self._make_stream().iter_batches(3)),
+            [[b'first\n', b'second line\n', b'\n'], [b'last']])
+
+    def test_invalid_sizes(self):
+        """Check that empty chunks and batches are rejected"""
+        stream = self._make_stream()
+        for size in (0, -1):
+            with self.assertRaises(ValueError):
+                stream.iter_chunks(size)
+            with self.assertRaises(ValueError):
+                stream.iter_batches(size)
+        self.assertEqual(next(stream), b'first\n')
+
+
+class SpawnStrategyTestCase(unittest.TestCase):
+    """Test case for strategies of spawning processes"""
+
+    def _run(self, **kwargs):
+        process = SyncProcess('echo', 'Hello', **kwargs)
+        process.execute()
+        self.assertEqual(decode_stream(process.stdout), 'Hello\n')
+
+    def test_spawn_strategies(self):
+        """Check that processes can be run with every strategy"""
+        for strategy in (Subprocess.SPAWN_AUTO,
+                         Subprocess.SPAWN_POSIX,
+                         Subprocess.SPAWN_FORK):
+            self._run(spawn=strategy)
+
+    def test_unknown_spawn_strategy(self):
+        """Check that unknown strategy is rejected"""
+        with self.assertRaises(ValueError):
+            self._run(spawn='unknown')
+
+    @unittest.skipUnless(hasattr(os, 'posix_spawn'),
+                         "posix_spawn is not supported")
+    def test_posix_spawn_is_used(self):
+        """Check that posix_spawn strategy uses os.posix_spawn"""
+
+        with mock.patch('os.posix_spawn', wraps=os.posix_spawn) as spawn:
+            self._run(spawn=Subprocess.SPAWN_POSIX, executable='/bin/echo')
+            self.assertEqual(spawn.call_count, 1)
+
+            self._run(spawn=Subprocess.SPAWN_FORK)
+            self.assertEqual(spawn.call_count, 1)
+
+    @unittest.skipUnless(hasattr(os, 'posix_spawn'),
+                         "posix_spawn is not supported")
+    def test_posix_spawn_inheritable_fds(self):
+        """Check that inheritable descriptors aren't leaked to children"""
+
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, read_fd)
+        os.set_inheritable(write_fd, True)
+        try:
+            process = SyncProcess('ls', '/proc/self/fd',
+                                  spawn=Subprocess.SPAWN_POSIX,
+                                  executable='/bin/ls')
+            process.execute()
+        finally:
+            os.close(write_fd)
+        fds = decode_stream(process.stdout).split()
+        self.assertNotIn(str(write_fd), fds)
+
+        with mock.patch('os.posix_spawn', wraps=os.posix_spawn) as spawn:
+            self._run(spawn=Subprocess.SPAWN_POSIX, executable='/bin/echo')
+            self.assertEqual(spawn.call_count, 1)
+
+    @unittest.skipUnless(hasattr(os, 'posix_spawn'),
+                         "posix_spawn is not supported")
+    def test_default_spawn_strategy(self):
+        """Check that default strategy can be changed globally"""
+
+        original = Subprocess.spawn_strategy
+        Subprocess.spawn_strategy = Subprocess.SPAWN_POSIX
+        try:
+            with mock.patch('os.posix_spawn', wraps=os.posix_spawn) as spawn:
+                self._run(executable='/bin/echo')
+                self.assertEqual(spawn.call_count, 1)
+        finally:
+            Subprocess.spawn_strategy = original
+
+
+@unittest.skipIf(is_python2_running(), "Fork server requires Python 3")
+class ForkServerTestCase(unittest.TestCase):
+    """Test case for spawning processes by the fork server"""
+
+    def test_spawn(self):
+        """Check that processes spawned by the server work as usual"""
+        folder = tempfile.mkdtemp()
+        try:
+            process = SyncProcess(
+                'sh', '-c', 'pwd; echo $NAME; cat; echo error >&2',
+                input=b'input\n', cwd=folder, env={'NAME': 'value'},
+                spawn=Subprocess.SPAWN_SERVER)
+            process.execute()
+        finally:
+            shutil.rmtree(folder)
+
+        self.assertEqual(decode_stream(process.stdout).split('\n')[1:],
+                         ['value', 'input', ''])
+        self.assertEqual(decode_stream(process.stderr), 'error\n')
+        self.assertEqual(process.returncode, 0)
+        self.assertIsNotNone(process.resource_usage)
+
+        process = SyncProcess('sh', '-c', 'exit 3', check=False,
+                              spawn=Subprocess.SPAWN_SERVER)
+        process.execute()
+        self.assertEqual(process.returncode, 3)
+
+    def test_missing_program(self):
+        """Check that errors of executing programs are raised"""
+        process = SyncProcess('/missing/program',
+                              spawn=Subprocess.SPAWN_SERVER)
+        with self.assertRaises(RunProcessError) as context:
+            process.execute()
+        self.assertEqual(context.exception.error.errno, errno.ENOENT)
+
+    def test_termination(self):
+        """Check that processes spawned by the server can be terminated"""
+        process = AsyncProcess('sleep', '10', spawn=Subprocess.SPAWN_SERVER)
+        process.execute()
+        self.assertFalse(process.is_finished)
+        process.terminate()
+        self.assertTrue(process.is_terminated)
+
+        process = SyncProcess('sleep', '10', timeout=0.1,
+                              spawn=Subprocess.SPAWN_SERVER)
+        with self.assertRaises(Subprocess.TimeoutExpired):
+            process.execute()
+
+    def test_server_restart(self):
+        """Check that a new server is started when the old one has gone"""
+        server = ForkServer()
+        self.addCleanup(server.close)
+        process = ForkServerPopen(['sleep', '10'], server=server)
+        old_pid = server.pid
+        os.kill(old_pid, signal.SIGKILL)
+
+        with self.assertRaises(OSError):
+            process.wait(timeout=5)
+        os.kill(process.pid, signal.SIGKILL)
+
+        process = ForkServerPopen(['true'], server=server)
+        self.assertEqual(process.wait(timeout=5), 0)
+        self.assertNotEqual(server.pid, old_pid)
+
+        # NOTE(albartash): Zombies can be signalled, so the old server
+        #                  is reaped once it can't.
+        started = time.time()
+        while time.time() - started < 5:
+            try:
+                os.kill(old_pid, 0)
+            except OSError:
+                break
+            time.sleep(0.01)
+        with self.assertRaises(OSError):
+            os.kill(old_pid, 0)
+
+    def test_server_death(self):
+        """Check that requests to the killed server fail instead of hanging"""
+        server = ForkServer()
+        self.addCleanup(server.close)
+        process = ForkServerPopen(['sleep', '10'], server=server)
+        errors = []
+
+        def spawn():
+            try:
+                server.spawn(['true'])
+            except OSError as e:
+                errors.append(e)
+
+        os.kill(server.pid, signal.SIGSTOP)
+        thread = threading.Thread(target=spawn)
+        thread.start()
+        thread.join(0.1)  # The request is sent, but never answered
+        os.kill(server.pid, signal.SIGKILL)
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(errors), 1)
+        with self.assertRaises(OSError):
+            server.wait(process.pid)
+        os.kill(process.pid, signal.SIGKILL)
+
+    @unittest.skipUnless(os.path.isdir('/proc/self/cwd'), "Requires /proc")
+    def test_server_directory(self):
+        """Check that the server keeps its directory"""
+        server = ForkServer()
+        self.addCleanup(server.close)
+        folder = tempfile.mkdtemp()
+        try:
+            process = ForkServerPopen(['true'], server=server, cwd=folder)
+            self.assertEqual(process.wait(timeout=5), 0)
+            self.assertEqual(
+                os.readlink('/proc/{}/cwd'.format(server.pid)), os.getcwd())
+        finally:
+            shutil.rmtree(folder)
+
+    def test_close(self):
+        """Check that the server exits once it's closed"""
+        server = ForkServer()
+        server.start()
+        helper = server._server
+        server.close()
+        self.assertEqual(helper.wait(timeout=5), 0)
+        self.assertIsNone(server.pid)
+
+        process = ForkServerPopen(['true'], server=server)
+        self.assertEqual(process.wait(timeout=5), 0)
+        server.close()
+
+
+class CompletionTestCase(unittest.TestCase):
+    """Test case for notifying about completed processes"""
+
+    def _check_tracker(self, tracker):
+        processes = [subprocess.Popen(['sleep', str(0.05 * (i % 4))])
+                     for i in range(20)]
+        completed = []
+        done = threading.Event()
+
+        def on_completed(process):
+            completed.append(process.pid)
+            if len(completed) == len(processes):
+                done.set()
+
+        for process in processes:
+            tracker.watch(process, lambda p=process: on_completed(p))
+        self.assertTrue(done.wait(5))
+        self.assertEqual(sorted(completed),
+                         sorted(process.pid for process in processes))
+        self.assertTrue(all(process.returncode == 0
+                            for process in processes))
+        self.assertEqual(tracker.active, 0)
+
+    def test_pidfd(self):
+        """Check that processes are tracked via pidfd or waitid"""
+        self._check_tracker(CompletionTracker())
+
+    @unittest.skipUnless(hasattr(os, 'pidfd_open'), "pidfd is not supported")
+    def test_pidfd_reused_pid(self):
+        """Check that reaped processes are not tracked by reused pids"""
+        reaped = subprocess.Popen(['true'])
+        reaped.wait()
+        other = subprocess.Popen(['sleep', '10'])
+        self.addCleanup(other.wait)
+        self.addCleanup(other.kill)
+
+        pidfd_open = os.pidfd_open
+
+        def open_reused(pid, *args):
+            return pidfd_open(other.pid if pid == reaped.pid else pid, *args)
+
+        done = threading.Event()
+        with mock.patch('os.pidfd_open', side_effect=open_reused):
+            tracker = CompletionTracker()
+            tracker.watch(reaped, done.set)
+            self.assertTrue(done.wait(5))
+        self.assertEqual(tracker.active, 0)
+
+    def test_waitid(self):
+        """Check that processes are tracked via waitid without pidfd"""
+        tracker = CompletionTracker()
+        tracker._use_pidfd = False
+        self._check_tracker(tracker)
+
+    def test_done_callback(self):
+        """Check that callbacks are called once the process completes"""
+        calls = []
+        done = threading.Event()
+        process = AsyncProcess('sh', '-c', 'sleep 0.1; exit 2', check=False)
+        process.execute()
+        process.add_done_callback(calls.append)
+        process.add_done_callback(lambda _: 1 / 0)
+        process.add_done_callback(lambda _: done.set())
+
+        self.assertTrue(done.wait(5))
+        self.assertEqual(calls, [process])
+        self.assertEqual(process.returncode, 2)
+
+        process.wait()
+        process.add_done_callback(calls.append)
+        self.assertEqual(calls, [process, process])
+
+    @unittest.skipIf(is_python2_running(), "Fork server requires Python 3")
+    def test_fork_server(self):
+        """Check that the fork server notifies about its processes"""
+        done = threading.Event()
+        process = AsyncProcess('sleep', '0.1', spawn=Subprocess.SPAWN_SERVER)
+        process.execute()
+        process.add_done_callback(lambda _: done.set())
+        self.assertTrue(done.wait(5))
+        self.assertEqual(process.returncode, 0)
+
+
+class LifecycleTestCase(unittest.TestCase):
+    """Test case for releasing processes and their descriptors"""
+
+    def test_context_manager(self):
+        """Check that leaving with block terminates the process"""
+        registry = get_child_registry()
+        with AsyncProcess('sleep', '10') as process:
+            process.execute()
+            self.assertIn(process._process.pid, registry.pids)
+        self.assertTrue(process.is_terminated)
+        self.assertNotIn(process._process.pid, registry.pids)
+        self.assertTrue(process._process.stdout.closed)
+
+    def test_pipes_closed_at_eof(self):
+        """Check that pipes are closed once output is read to the end"""
+        fds = count_open_fds()
+        if fds is None:
+            self.skipTest("Open descriptors can't be listed")
+        process = AsyncProcess('echo', 'output')
+        process.execute()
+        process.wait()
+        self.assertEqual(list(process.stdout), [b'output\n'])
+        self.assertEqual(list(process.stderr), [])
+        self.assertEqual(list(process.stdout), [])
+        self.assertEqual(count_open_fds(), fds)
+
+    def test_abandoned_process(self):
+        """Check that processes nobody waits for are reaped in background"""
+        process = AsyncProcess('sh', '-c', 'sleep 0.1; echo output')
+        process.execute()
+        pid = process._process.pid
+        del process
+        gc.collect()
+
+        started = time.time()
+        while pid in get_child_registry().pids and time.time() - started < 5:
+            time.sleep(0.01)
+        self.assertNotIn(pid, get_child_registry().pids)
+        with self.assertRaises(OSError):  # No child processes
+            os.waitpid(pid, os.WNOHANG)
+
+    def test_terminate_all(self):
+        """Check that all children are terminated, or killed if stubborn"""
+        registry = ChildRegistry()
+        polite = subprocess.Popen(['sleep', '10'])
+        stubborn = subprocess.Popen(
+            ['sh', '-c', 'trap "" TERM; echo ready; sleep 10'],
+            stdout=subprocess.PIPE, preexec_fn=os.setsid)
+        stubborn.stdout.readline()  # The signal is ignored now
+        registry.add(polite)
+        registry.add(stubborn, process_group=True)
+        self.assertEqual(registry.count, 2)
+
+        started = time.time()
+        registry.terminate_all(0.3)
+        self.assertLess(time.time() - started, 3)
+        self.assertEqual(polite.returncode, -signal.SIGTERM)
+        self.assertEqual(stubborn.returncode, -signal.SIGKILL)
+        self.assertEqual(registry.count, 0)
+
+    def test_terminate_at_exit(self):
+        """Check that children are terminated at exit only if requested"""
+        script = ("from python_shell.util import AsyncProcess, Subprocess; "
+                  "Subprocess.terminate_at_exit = {}; "
+                  "process = AsyncProcess('sleep', '10'); "
+                  "process.execute(); "
+                  "print(process._process.pid)")
+
+        pid = int(subprocess.check_output(
+            [sys.executable, '-c', script.format(False)]))
+        self.assertTrue(_is_running(pid))
+        os.kill(pid, signal.SIGKILL)
+
+        pid = int(subprocess.check_output(
+            [sys.executable, '-c', script.format(True)]))
+        self.assertFalse(_is_running(pid))
+
+
+def _is_running(pid):  # -> bool
+    """Returns whether process with pid is running (and not a zombie)"""
+
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except (IOError, OSError):
+        pass
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+@unittest.skipIf(is_python2_running(), "Timeouts require Python 3")
+class TimeoutTestCase(unittest.TestCase):
+    """Test case for process timeouts and termination"""
+
+    def setUp(self):
+        self.tmp_folder = tempfile.mkdtemp()
+        self.pid_file = os.path.join(self.tmp_folder, 'pid')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_folder)
+
+    def _read_child_pid(self):  # -> int
+        """Waits for a child process to write its pid and returns it"""
+
+        for _ in range(100):
+            if os.path.exists(self.pid_file):
+                with open(self.pid_file) as f:
+                    content = f.read().strip()
+                if content:
+                    return int(content)
+            time.sleep(0.05)
+        self.fail('Child process has not been started')
+
+    def _wait_until_stopped(self, pid):  # -> bool
+        """Waits a bit for the process to be stopped"""
+
+        for _ in range(50):
+            if not _is_running(pid):
+                return True
+            time.sleep(0.05)
+        return False
+
+    def test_timeout_kills_process_group(self):
+        """Check that child processes are terminated on timeout"""
+        process = SyncProcess(
+            'sh', '-c', 'sleep 30 & echo $! > {}; wait'.format(self.pid_file),
+            timeout=0.5, new_process_group=True)
+        with self.assertRaises(Subprocess.TimeoutExpired):
+            process.execute()
+
+        self.assertTrue(process.is_timed_out)
+        self.assertEqual(process.returncode, -15)
+        self.assertTrue(self._wait_until_stopped(self._read_child_pid()))
+
+    def test_idle_timeout(self):
+        """Check that process producing no output is stopped"""
+        process = SyncProcess('sh', '-c', 'echo start; sleep 30',
+                              idle_timeout=0.3)
+        started_at = time.time()
+        with self.assertRaises(Subprocess.IdleTimeoutExpired):
+            process.execute()
+        self.assertLess(time.time() - started_at, 5)
+        self.assertTrue(process.is_timed_out)
+
+    def test_idle_timeout_is_reset_by_output(self):
+        """Check that idle timeout is counted from the last output"""
+        process = SyncProcess(
+            'sh', '-c', 'for i in 1 2 3 4 5 6; do echo $i; sleep 0.1; done',
+            idle_timeout=0.5)
+        process.execute()
+        self.assertEqual(process.returncode, 0)
+        self.assertFalse(process.is_timed_out)
+
+    def test_termination_escalation(self):
+        """Check that process ignoring SIGTERM is killed"""
+        process = AsyncProcess('sh', '-c', "trap '' TERM; sleep 30",
+                               new_process_group=True)
+        process.execute()
+        time.sleep(0.2)  # let the shell set the trap
+
+        started_at = time.time()
+        process.terminate(grace_period=0.3)
+        self.assertLess(time.time() - started_at, 5)
+        self.assertEqual(process.returncode, -9)
+
+    def test_termination_without_process_group(self):
+        """Check that process is run in the current process group"""
+        process = AsyncProcess('sleep', '30')
+        process.execute()
+        self.assertEqual(os.getpgid(process._process.pid), os.getpgrp())
+        process.terminate()
+        self.assertEqual(process.returncode, -15)
+
+    def test_new_process_group(self):
+        """Check that new process group is created in the same session"""
+        for strategy in (Subprocess.SPAWN_AUTO, Subprocess.SPAWN_FORK,
+                         Subprocess.SPAWN_SERVER):
+            process = AsyncProcess('sleep', '30', new_process_group=True,
+                                   spawn=strategy)
+            process.execute()
+            pid = process._process.pid
+            self.assertEqual(os.getpgid(pid), pid)
+            self.assertEqual(os.getsid(pid), os.getsid(0))
+            process.terminate()
+            self.assertEqual(process.returncode, -15)
+
+        with self.assertRaises(ValueError):
+            AsyncProcess('true', new_process_group=True,
+                         spawn=Subprocess.SPAWN_POSIX).execute()
+
+    def test_async_process_deadline(self):
+        """Check that background process is terminated by watchdog"""
+        process = AsyncProcess(
+            'sh', '-c', 'sleep 30 & echo $! > {}; wait'.format(self.pid_file),
+            timeout=0.3, new_process_group=True)
+        process.execute()
+        self.assertNotEqual(os.getpgid(process._process.pid), os.getpgrp())
+
+        process.wait()
+        self.assertTrue(process.is_timed_out)
+        self.assertEqual(process.returncode, -15)
+        self.assertTrue(self._wait_until_stopped(self._read_child_pid()))
+
+    def test_idle_timeout_requires_waiting(self):
+        """Check that idle timeout is rejected for background processes"""
+        with self.assertRaises(ValueError):
+            AsyncProcess('true', idle_timeout=1).execute()
+
+
+class WatchdogTestCase(unittest.TestCase):
+    """Test case for scheduling callbacks in background"""
+
+    def test_callbacks_order(self):
+        """Check that callbacks are called in order of their deadlines"""
+        watchdog = Watchdog()
+        calls = []
+        done = threading.Event()
+
+        watchdog.schedule(0.2, lambda: (calls.append(2), done.set()))
+        watchdog.schedule(0.1, lambda: calls.append(1))
+        cancelled = watchdog.schedule(0.05, lambda: calls.append(0))
+        watchdog.cancel(cancelled)
+        self.assertEqual(watchdog.pending, 2)
+
+        self.assertTrue(done.wait(5))
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(watchdog.pending, 0)
+
+    def test_failed_callback(self):
+        """Check that failed callback doesn't stop the watchdog"""
+        watchdog = Watchdog()
+        done = threading.Event()
+
+        watchdog.schedule(0, lambda: 1 / 0)
+        watchdog.schedule(0.05, done.set)
+        self.assertTrue(done.wait(5))
+
+
+class SpillBufferTestCase(unittest.TestCase):
+    """Test case for storage spilling output to disk"""
+
+    def _make_buffer(self, threshold, chunks):
+        buffer = SpillBuffer(threshold)
+        for chunk in chunks:
+            buffer.write(chunk)
+        buffer.close()
+        return buffer
+
+    def test_data_below_threshold(self):
+        """Check that small data is kept in memory"""
+        buffer = self._make_buffer(10, [b'abc', b'def'])
+        self.assertFalse(buffer.is_spilled)
+        self.assertEqual(buffer.getvalue(), b'abcdef')
+        self.assertEqual(buffer.view().tobytes(), b'abcdef')
+
+    def test_data_above_threshold(self):
+        """Check that large data is moved to disk and mapped"""
+        buffer = self._make_buffer(4, [b'abc\n', b'def\n', b'ghi'])
+        self.assertTrue(buffer.is_spilled)
+        self.assertEqual(buffer.size, 11)
+        self.assertEqual(buffer.view()[4:7], b'def')
+        self.assertEqual(buffer.getvalue(), b'abc\ndef\nghi')
+        self.assertEqual(list(StreamIterator(stream=buffer.open())),
+                         [b'abc\n', b'def\n', b'ghi'])
+
+        buffer.release()
+        self.assertFalse(buffer.is_spilled)
+
+    def test_process_spill_threshold(self):
+        """Check that process output can be spilled to disk"""
+        process = SyncProcess('seq', 1, 10000, spill_threshold=1024)
+        process.execute()
+        view = process.stdout_view
+        self.assertEqual(view[-6:], b'10000\n')
+        self.assertEqual(sum(1 for _ in process.stdout), 10000)
+        self.assertEqual(process.stderr_view.tobytes(), b'')
+
+        del view
+        process.release()
+        self.assertIsNone(process.stdout_view)
+
+
+@unittest.skipUnless(hasattr(os, 'wait4') and not is_python2_running(),
+                     "wait4 is not supported")
+class ResourceUsageTestCase(unittest.TestCase):
+    """Test case for resources used by processes"""
+
+    def test_sync_process_usage(self):
+        """Check that usage is collected for completed process"""
+        process = SyncProcess(
+            'sh', '-c', 'i=0; while [ $i -lt 20000 ]; do i=$((i+1)); done')
+        self.assertIsNone(process.resource_usage)
+        process.execute()
+
+        usage = process.resource_usage
+        self.assertIsInstance(usage, ResourceUsage)
+        self.assertGreater(usage.cpu_time, 0)
+        self.assertGreaterEqual(usage.wall_time, usage.user_time)
+        self.assertGreater(usage.max_rss, 1024)
+        self.assertGreater(usage.minor_page_faults, 0)
+        self.assertIs(process.resource_usage, usage)
+
+    def test_async_process_usage(self):
+        """Check that usage is available when process is completed"""
+        process = AsyncProcess('sleep', '0.2')
+        process.execute()
+        self.assertIsNone(process.resource_usage)
+
+        process.wait()
+        usage = process.resource_usage
+        self.assertGreaterEqual(usage.wall_time, 0.2)
+        self.assertLess(usage.cpu_time, usage.wall_time)
+
+    def test_popen_return_codes(self):
+        """Check that processes reaped with wait4 get proper return codes"""
+        process = _Popen(['sh', '-c', 'exit 3'])
+        self.assertEqual(process.wait(timeout=5), 3)
+        self.assertIsNotNone(process.rusage)
+
+        process = _Popen(['sleep', '10'])
+        with self.assertRaises(subprocess.TimeoutExpired):
+            process.wait(timeout=0.05)
+        self.assertIsNone(process.poll())
+        process.terminate()
+        self.assertEqual(process.wait(), -signal.SIGTERM)
+        self.assertEqual(process.poll(), -signal.SIGTERM)
+
+    def test_usage_aggregation(self):
+        """Check that usage of many processes is summed up"""
+        first = ResourceUsage(1.0, 0.5, 0.25, 100, 10, 1, 5, 2)
+        second = ResourceUsage(2.0, 1.5, 0.75, 50, 20, 2, 10, 4)
+
+        total = ResourceUsage.aggregate([first, None, second])
+        self.assertEqual(
+            total, ResourceUsage(3.0, 2.0, 1.0, 100, 30, 3, 15, 6))
+        self.assertEqual(total.cpu_time, 3.0)
+        self.assertIsNone(ResourceUsage.aggregate([None]))
+
+
+class RedirectionTestCase(unittest.TestCase):
+    """Test case for redirecting output of processes"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'output')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _run(self, script, **kwargs):  # -> SyncProcess
+        process = SyncProcess('sh', '-c', script, **kwargs)
+        process.execute()
+        return process
+
+    def _read(self):  # -> bytes
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def test_path(self):
+        """Check that output is written into files by paths"""
+        process = self._run('echo out; echo err >&2',
+                            stdout=self.path, stderr=Append(self.path))
+        self.assertEqual(list(process.stdout), [])
+        self.assertEqual(self._read(), b'out\nerr\n')
+
+        self._run('echo again', stdout=self.path)
+        self.assertEqual(self._read(), b'again\n')
+
+        self._run('echo appended', stdout=Append(self.path))
+        self.assertEqual(self._read(), b'again\nappended\n')
+
+    def test_file_object(self):
+        """Check that output is written into file objects"""
+        with open(self.path, 'w') as f:
+            f.write('python\n')
+            self._run('echo process', stdout=f)
+        self.assertEqual(self._read(), b'python\nprocess\n')
+
+    def test_descriptor(self):
+        """Check that output is written into file descriptors"""
+        descriptor = os.open(self.path, os.O_WRONLY | os.O_CREAT)
+        try:
+            self._run('echo descriptor', stdout=descriptor)
+        finally:
+            os.close(descriptor)
+        self.assertEqual(self._read(), b'descriptor\n')
+
+    def test_merge_stderr(self):
+        """Check that stderr can be merged into stdout"""
+        process = self._run('echo out; echo err >&2',
+                            stderr=Subprocess.STDOUT)
+        self.assertEqual(decode_stream(process.stdout), 'out\nerr\n')
+        self.assertEqual(list(process.stderr), [])
+
+    def test_missing_folder(self):
+        """Check that opening files errors are raised"""
+        with self.assertRaises((IOError, OSError)):
+            self._run('true', stdout=os.path.join(self.path, 'missing'))
+
+
+class TeeTestCase(unittest.TestCase):
+    """Test case for passing output of processes to consumers"""
+
+    SCRIPT = 'echo first; echo error >&2; printf last'
+
+    def test_sync(self):
+        """Check that output is passed to all consumers and captured"""
+        lines = []
+        chunks = []
+        stream = io.BytesIO()
+        process = SyncProcess('sh', '-c', self.SCRIPT,
+                              tee_stdout=[Lines(lines.append), stream],
+                              tee_stderr=chunks.append)
+        process.execute()
+
+        self.assertEqual(lines, ['first', 'last'])
+        self.assertEqual(stream.getvalue(), b'first\nlast')
+        self.assertEqual(b''.join(chunks), b'error\n')
+        self.assertEqual(decode_stream(process.stdout), 'first\nlast')
+        self.assertEqual(decode_stream(process.stderr), 'error\n')
+
+    def test_async(self):
+        """Check that output of background processes is read by IO loop"""
+        lines = []
+        processes = [
+            AsyncProcess('sh', '-c', 'echo $0; sleep 0.1', str(i),
+                         tee_stdout=Lines(lines.append))
+            for i in range(20)
+        ]
+        for process in processes:
+            process.execute()
+        for process in processes:
+            process.wait()
+
+        self.assertEqual(sorted(lines, key=int),
+                         [str(i) for i in range(20)])
+        self.assertEqual(decode_stream(processes[3].stdout), '3\n')
+        self.assertEqual(processes[3].stdout_view.tobytes(), b'3\n')
+
+    def test_failed_consumer(self):
+        """Check that failed consumer is detached and its error raised"""
+        lines = []
+
+        def fail(data):
+            raise ValueError(data)
+
+        process = SyncProcess('sh', '-c', self.SCRIPT,
+                              tee_stdout=[fail, Lines(lines.append)])
+        with self.assertRaises(ValueError):
+            process.execute()
+        self.assertEqual(lines, ['first', 'last'])
+
+        process = AsyncProcess('echo', 'background', tee_stderr=fail,
+                               stderr=Subprocess.STDOUT, tee_stdout=fail)
+        process.execute()
+        with self.assertRaises(ValueError):
+            process.wait()
+        self.assertEqual(decode_stream(process.stdout), 'background\n')
+
+    def test_invalid_consumer(self):
+        """Check that consumers are checked before running the process"""
+        with self.assertRaises(TypeError):
+            SyncProcess('true', tee_stdout=42).execute()
+
+    def test_lines(self):
+        """Check that lines are assembled from chunks"""
+        lines = []
+        consumer = Lines(lines.append)
+        for chunk in (b'a', b'b\r\nc', b'\n\n', b'\xd0', b'\x96'):
+            consumer.write(chunk)
+        consumer.close()
+        self.assertEqual(lines, ['ab', 'c', '', u'\u0416'])
+
+    def test_io_loop(self):
+        """Check that IO loop reads streams until they're finished"""
+        io_loop = IOLoop()
+        closed = threading.Event()
+        read_fd, write_fd = os.pipe()
+        buffer = OutputBuffer()
+
+        io_loop.register(os.fdopen(read_fd, 'rb'), buffer, closed.set)
+        os.write(write_fd, b'data')
+        os.close(write_fd)
+        self.assertTrue(closed.wait(5))
+        self.assertEqual(buffer.getvalue(), b'data')
+        self.assertEqual(io_loop.active, 0)
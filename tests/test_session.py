@@ -0,0 +1,116 @@
+"""
+MIT License
+
+Copyright (c) 2020 Alex Sokolov
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os
+import time
+import unittest
+
+from python_shell.exceptions import SessionTerminated
+from python_shell.exceptions import ShellException
+from python_shell.shell import ShellSession
+from python_shell.util import Subprocess
+from python_shell.util import is_python2_running
+from python_shell.util.streaming import decode_stream
+
+
+__all__ = ('ShellSessionTestCase',)
+
+
+class ShellSessionTestCase(unittest.TestCase):
+    """Test case for persistent shell session"""
+
+    def setUp(self):
+        self.session = ShellSession()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_run_command(self):
+        """Check that command arguments are passed as is"""
+        command = self.session.run('echo', 'a  b', '$HOME')
+        self.assertEqual(command.return_code, 0)
+        self.assertEqual(decode_stream(command.output), 'a  b $HOME\n')
+        self.assertEqual(str(command), 'echo a  b $HOME')
+
+    def test_state_is_kept(self):
+        """Check that shell state is kept between commands"""
+        self.session.run('cd', '/')
+        self.session.run_script('export TEST_VAR=1; f() { echo "f$1"; }')
+        command = self.session.run_script('pwd; echo $TEST_VAR; f 2')
+        self.assertEqual(decode_stream(command.output), '/\n1\nf2\n')
+
+    def test_processes_are_not_spawned(self):
+        """Check that all commands are run by the same process"""
+        self.session.run('true')
+        pid = self.session.pid
+        command = self.session.run_script('echo $$')
+        self.assertEqual(decode_stream(command.output), '{}\n'.format(pid))
+
+    def test_binary_output(self):
+        """Check that binary output is delimited properly"""
+        size = 1024 * 1024
+        command = self.session.run('head', '-c', size, '/dev/urandom')
+        self.assertEqual(sum(map(len, command.output)), size)
+
+        command = self.session.run('printf', 'a\\0b\\nc')
+        self.assertEqual(b''.join(command.output), b'a\0b\nc')
+
+    def test_errors(self):
+        """Check stderr output and failures"""
+        with self.assertRaises(ShellException) as context:
+            self.session.run('ls', '/nofolder_session')
+        self.assertIn('/nofolder_session',
+                      decode_stream(context.exception.command.errors))
+
+        command = self.session.run_script('if then', check=False)
+        self.assertEqual(command.return_code, 2)
+        self.assertTrue(self.session.is_alive)
+
+    def test_session_recovery(self):
+        """Check that session is restarted after its process dies"""
+        self.session.run('cd', '/')
+        with self.assertRaises(SessionTerminated) as context:
+            self.session.run('exit', 3)
+        self.assertEqual(context.exception.return_code, 3)
+        self.assertFalse(self.session.is_alive)
+
+        command = self.session.run('pwd')
+        self.assertEqual(decode_stream(command.output),
+                         '{}\n'.format(os.getcwd()))
+
+    def test_background_jobs(self):
+        """Check that late output of background jobs is dropped"""
+        self.session.run_script('(sleep 0.1; echo late; echo late >&2) &')
+        time.sleep(0.3)
+        command = self.session.run_script('echo next; echo error >&2')
+        self.assertEqual(decode_stream(command.output), 'next\n')
+        self.assertEqual(decode_stream(command.errors), 'error\n')
+
+    @unittest.skipIf(is_python2_running(), "Timeout requires Python 3")
+    def test_timeout(self):
+        """Check that session is killed on timeout"""
+        with self.assertRaises(Subprocess.TimeoutExpired):
+            self.session.run('sleep', 5, timeout=0.2)
+        self.assertFalse(self.session.is_alive)
+        self.assertEqual(self.session.run('true').return_code, 0)
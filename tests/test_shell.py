@@ -22,6 +22,11 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+import gc
+import os
+import shutil
+import tempfile
+import threading
 import time
 import unittest
 
@@ -29,9 +34,8 @@ import unittest
 from python_shell.exceptions import CommandDoesNotExist
 from python_shell.exceptions import ShellException
 from python_shell.shell import Shell
-from python_shell.shell.terminal import TERMINAL_INTEGRATION_MAP
 from python_shell.util.streaming import decode_stream
-from python_shell.util.terminal import get_current_terminal_name
+from python_shell.util import get_command_index
 
 
 __all__ = ('ShellTestCase',)
@@ -42,16 +46,21 @@ class ShellTestCase(unittest.TestCase):
 
     def test_own_fields(self):
         """Check Shell own fields to be accessible"""
-        for field in ('last_command',):
+        for field in ('last_command', 'run_many', 'map', 'as_completed',
+                      'wait_any', 'cached'):
             self.assertIsNotNone(getattr(Shell, field))
+            self.assertIn(field, dir(Shell))
 
     def test_shell_non_zero_return_code(self):
         """Check the case when Shell command returns non-zero code"""
         with self.assertRaises(ShellException) as context:
             Shell.mkdir('/tmp')
-        self.assertEqual(str(context.exception),
+        message, tail = str(context.exception).split('\n', 1)
+        self.assertEqual(message,
                          'Shell command "mkdir /tmp" failed '
                          'with return code 1')
+        self.assertIn('File exists', tail)
+        self.assertIn(b'File exists', context.exception.stderr_tail)
 
     def test_last_command(self):
         """Check "last_command" property to be working"""
@@ -75,11 +84,11 @@ class ShellTestCase(unittest.TestCase):
 
     def test_dir_shell(self):
         """Check usage of dir(Shell)"""
-        name = get_current_terminal_name()
-        commands = TERMINAL_INTEGRATION_MAP[name]().available_commands
-        self.assertLess(0, len(commands))
+        commands = get_command_index().commands
+        self.assertIn('ls', commands)
         commands_dir = dir(Shell)
-        self.assertEqual(sorted(commands + ['last_command']), commands_dir)
+        self.assertEqual(
+            sorted(set(commands + list(Shell.__own_fields__))), commands_dir)
 
     def test_shell_for_non_identifier_command(self):
         """Check ability to call Shell for non-identifier-like commands"""
@@ -88,3 +97,57 @@ class ShellTestCase(unittest.TestCase):
         with self.assertRaises(CommandDoesNotExist):
             command()
         self.assertEqual(Shell.last_command.command, command_name)
+
+    def test_command_named_as_own_field(self):
+        """Check that commands shadowed by own fields are available"""
+        command = Shell('map')
+        self.assertEqual(command.command, 'map')
+        self.assertIsNot(command, Shell.map)
+        with self.assertRaises(CommandDoesNotExist):
+            Shell.cached()('cached')()
+
+    def test_command_objects_are_reused(self):
+        """Check that Shell does not build a new command on each access"""
+        self.assertIs(Shell.ls, Shell.ls)
+        self.assertIs(Shell('ls'), Shell.ls)
+
+    def test_concurrent_commands(self):
+        """Check that commands run from many threads don't interfere"""
+        errors = []
+
+        def _run(thread_id):
+            for i in range(25):
+                token = '{}-{}'.format(thread_id, i)
+                result = Shell.printf(token)
+                if result.text != token:
+                    errors.append((token, 'result', result.text))
+                if Shell.last_command is not result:
+                    errors.append((token, 'last_command', Shell.last_command))
+                if Shell.printf.text != token:
+                    errors.append((token, 'command', Shell.printf.text))
+
+        threads = [threading.Thread(target=_run, args=(thread_id,))
+                   for thread_id in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+
+    def test_abandoned_command(self):
+        """Check that garbage collected background command keeps running"""
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join(folder, 'done')
+            Shell.sh('-c', 'sleep 0.5; echo hi; echo done > {}'.format(path),
+                     wait=False)
+            Shell.sh('-c', 'true')
+            gc.collect()
+
+            started = time.time()
+            while not os.path.exists(path) and time.time() - started < 5:
+                time.sleep(0.05)
+            self.assertTrue(os.path.exists(path))
+        finally:
+            shutil.rmtree(folder)
@@ -22,15 +22,29 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+import os
+import shutil
+import stat
+import subprocess
 import sys
+import tempfile
+import time
 import unittest
 
 from python_shell.shell.terminal import TERMINAL_INTEGRATION_MAP
+from python_shell.util import CommandIndex
+from python_shell.util import command_index
+from python_shell.util import find_executable
+from python_shell.util import forget_executable
 from python_shell.util import is_python2_running
 from python_shell.util import get_current_terminal_name
+from python_shell.util.lazy import set_lazy_attributes
+from python_shell.util.streaming import decode_stream
+from python_shell.util.streaming import iter_decode
 
 
-__all__ = ('UtilTestCase',)
+__all__ = ('UtilTestCase', 'ExecutablesTestCase', 'CommandIndexTestCase',
+           'LazyImportTestCase', 'StreamingTestCase')
 
 
 class UtilTestCase(unittest.TestCase):
@@ -44,3 +58,220 @@ class UtilTestCase(unittest.TestCase):
         """Check that getting current terminal name works"""
         self.assertIn(get_current_terminal_name(),
                       TERMINAL_INTEGRATION_MAP.keys())
+
+
+def _make_executable(folder, name):
+    """Creates an executable file in the folder"""
+    path = os.path.join(folder, name)
+    with open(path, 'w') as f:
+        f.write('#!/bin/sh\n')
+    os.chmod(path, stat.S_IRWXU)
+    return path
+
+
+class ExecutablesTestCase(unittest.TestCase):
+    """Test case for executables lookup"""
+
+    def setUp(self):
+        self.tmp_folder = tempfile.mkdtemp()
+        self.original_path = os.environ.get('PATH', '')
+        os.environ['PATH'] = os.pathsep.join(
+            (self.tmp_folder, self.original_path))
+
+    def tearDown(self):
+        os.environ['PATH'] = self.original_path
+        shutil.rmtree(self.tmp_folder)
+        forget_executable()
+
+    def _make_executable(self, name):
+        """Creates an executable file in temporary folder"""
+        return _make_executable(self.tmp_folder, name)
+
+    def test_find_existing_executable(self):
+        """Check that existing executable is resolved to absolute path"""
+        path = find_executable('ls')
+        self.assertTrue(os.path.isabs(path))
+        self.assertEqual(os.path.basename(path), 'ls')
+
+    def test_find_non_existing_executable(self):
+        """Check that non-existing executable is not resolved"""
+        self.assertIsNone(find_executable('random_{}'.format(time.time())))
+
+    def test_find_executable_by_path(self):
+        """Check that executable can be resolved by its path"""
+        path = self._make_executable('test_exec')
+        self.assertEqual(find_executable(path), path)
+
+    def test_negative_lookup_is_invalidated(self):
+        """Check that cached negative lookup is dropped on PATH changes"""
+        name = 'test_exec_{:.0f}'.format(time.time())
+        self.assertIsNone(find_executable(name))
+
+        # NOTE(albartash): Ensure directory mtime is changed even on
+        #                  filesystems with coarse timestamps.
+        path = self._make_executable(name)
+        os.utime(self.tmp_folder, (0, 0))
+        self.assertEqual(find_executable(name), path)
+
+    def test_removed_executable_is_invalidated(self):
+        """Check that cached lookup is dropped when executable is removed"""
+        name = 'test_exec_{:.0f}'.format(time.time())
+        self._make_executable(name)
+        self.assertIsNotNone(find_executable(name))
+
+        os.remove(os.path.join(self.tmp_folder, name))
+        os.utime(self.tmp_folder, (0, 0))
+        self.assertIsNone(find_executable(name))
+
+
+class CommandIndexTestCase(unittest.TestCase):
+    """Test case for index of available commands"""
+
+    def setUp(self):
+        self.tmp_folder = tempfile.mkdtemp()
+        self.cache_folder = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.cache_folder, 'cache', 'index')
+        self.original_path = os.environ.get('PATH', '')
+        os.environ['PATH'] = os.pathsep.join(
+            (self.tmp_folder, self.original_path))
+
+    def tearDown(self):
+        os.environ['PATH'] = self.original_path
+        shutil.rmtree(self.tmp_folder)
+        shutil.rmtree(self.cache_folder)
+
+    def _make_executable(self, name):
+        """Creates an executable file in temporary folder"""
+        return _make_executable(self.tmp_folder, name)
+
+    def test_commands(self):
+        """Check that commands from PATH are indexed"""
+        index = CommandIndex(cache_path=False)
+        self.assertIn('ls', index.commands)
+        self.assertIn('ls', index)
+        self.assertEqual(index.commands, sorted(set(index.commands)))
+
+    def test_index_refresh(self):
+        """Check that changed directories are scanned again"""
+        index = CommandIndex(cache_path=False)
+        name = 'test_exec_{:.0f}'.format(time.time())
+        self.assertNotIn(name, index)
+
+        self._make_executable(name)
+        os.utime(self.tmp_folder, (0, 0))
+        self.assertIn(name, index)
+
+    def test_complete(self):
+        """Check lookup of commands by prefix"""
+        for name in ('test_prefix_a', 'test_prefix_b', 'test_prefiy'):
+            self._make_executable(name)
+        index = CommandIndex(cache_path=False)
+        self.assertEqual(index.complete('test_prefix_'),
+                         ['test_prefix_a', 'test_prefix_b'])
+        self.assertEqual(index.complete('test_prefiz'), [])
+
+    def test_persistent_cache(self):
+        """Check that scan results are reused by another index"""
+        self._make_executable('test_cached')
+        CommandIndex(cache_path=self.cache_path).refresh()
+        self.assertTrue(os.path.exists(self.cache_path))
+
+        def _fail_scan(directory):
+            raise AssertionError(
+                'Directory {} was scanned again'.format(directory))
+
+        # NOTE(albartash): PATH is not changed since the first index was
+        #                  built, so no directory must be scanned again.
+        original_scan = command_index._scan_directory
+        command_index._scan_directory = _fail_scan
+        try:
+            index = CommandIndex(cache_path=self.cache_path)
+            self.assertIn('test_cached', index)
+            self.assertIn('ls', index)
+        finally:
+            command_index._scan_directory = original_scan
+
+    def test_broken_cache(self):
+        """Check that malformed cache file is ignored"""
+        self._make_executable('test_cached')
+        os.makedirs(os.path.dirname(self.cache_path))
+        with open(self.cache_path, 'w') as f:
+            f.write('{"broken": ')
+        self.assertIn('test_cached', CommandIndex(cache_path=self.cache_path))
+
+
+class LazyImportTestCase(unittest.TestCase):
+    """Test case for lazy loading of package attributes"""
+
+    def test_lazy_attributes(self):
+        """Check that attributes are loaded once on first access"""
+        calls = []
+
+        def _load():
+            calls.append(None)
+            return 'value'
+
+        module_globals = {'__name__': 'test_module'}
+        set_lazy_attributes(module_globals, {
+            'callable_attribute': _load,
+            'path': 'os',
+        })
+        if '__getattr__' in module_globals:
+            self.assertEqual(calls, [])
+            self.assertIn('path', module_globals['__dir__']())
+            getattr_ = module_globals['__getattr__']
+            self.assertEqual(getattr_('callable_attribute'), 'value')
+            self.assertIs(getattr_('path'), os.path)
+            self.assertRaises(AttributeError, getattr_, 'missing')
+
+        self.assertEqual(module_globals['callable_attribute'], 'value')
+        self.assertIs(module_globals['path'], os.path)
+        self.assertEqual(len(calls), 1)
+
+    @unittest.skipIf(sys.version_info < (3, 7),
+                     "Lazy attributes require module __getattr__")
+    def test_import_is_lightweight(self):
+        """Check that heavy modules are not loaded on package import"""
+        heavy_modules = ('pkg_resources', 'asyncio', 'concurrent.futures',
+                         'tempfile', 'python_shell.shell.session')
+        output = subprocess.check_output([
+            sys.executable, '-c',
+            'import sys, python_shell; '
+            'print(" ".join(sorted(sys.modules)))'
+        ], universal_newlines=True)
+        loaded_modules = set(output.split())
+        for module in heavy_modules:
+            self.assertNotIn(module, loaded_modules)
+
+    @unittest.skipIf(sys.version_info < (3, 7),
+                     "Lazy attributes require module __getattr__")
+    def test_lazy_package_attributes(self):
+        """Check that lazy attributes of the package are resolved"""
+        import python_shell
+        from python_shell.shell.session import ShellSession
+
+        self.assertIs(python_shell.ShellSession, ShellSession)
+        self.assertIsInstance(python_shell.__version__, str)
+        self.assertIn('ShellSession', dir(python_shell))
+
+
+class StreamingTestCase(unittest.TestCase):
+    """Test case for decoding streams"""
+
+    def test_multibyte_characters_between_chunks(self):
+        """Check that characters split between chunks are decoded"""
+        data = u'\u041f\u0440\u0438\u0432\u0435\u0442 \U0001f600'
+        encoded = data.encode('utf-8')
+        chunks = [encoded[i:i + 1] for i in range(len(encoded))]
+
+        self.assertEqual(decode_stream(chunks), data)
+        self.assertEqual(''.join(iter_decode(iter(chunks))), data)
+
+    def test_decoding_errors(self):
+        """Check that decoding errors policy is applied"""
+        chunks = [b'a\xff', b'b']
+        with self.assertRaises(UnicodeDecodeError):
+            decode_stream(chunks)
+        self.assertEqual(decode_stream(chunks, errors='ignore'), 'ab')
+        self.assertEqual(decode_stream(chunks, encoding='latin-1'),
+                         u'a\xffb')